@@ -4,10 +4,10 @@ import os
 from loguru import logger
 import matplotlib.pyplot as plt
 from enum import Enum
-from exchange.getFundingInfo import (
-    getBinanceFundingInfoBySombol,
-    getBitgetFundingInfoBySombol,
-)
+from exchange.getFundingInfo import getFundingInfoCache
+from lib.tickFile import readTickFile, getTickFilePath
+from lib.spreadEngine import DEFAULT_FEE_RATE
+from exchange.instrumentCatalog import getInstrumentCatalog
 import matplotlib.font_manager as fm
 
 # 设置字体路径
@@ -29,6 +29,140 @@ plt.rcParams["font.sans-serif"] = ["SimHei"]  # 指定默认字体
 # plt.rcParams["axes.unicode_minus"] = False  # 解决保存图像是负号'-'显示为方块的问题
 
 
+def parquetReader(
+    exchange: str,
+    channel: str,
+    symbol: str,
+    columns: list[str] | None = None,
+    rootDir: str = "./data/parquet",
+):
+    """
+    读取ParquetSink保存的行情，只读取需要的列
+    :param columns: 需要的列，None为全部
+    :return: DataFrame，不存在时返回None
+    """
+    path = f"{rootDir}/exchange={exchange}/channel={channel}"
+    if not os.path.exists(path):
+        logger.error(f"Path {path} does not exist.")
+        return
+    df = pd.read_parquet(
+        path,
+        columns=columns,
+        filters=[("symbol", "==", symbol)],
+    )
+    return df
+
+
+def tickFileReader(
+    exchange: str,
+    channel: str,
+    symbol: str,
+    date: str | None = None,
+    rootDir: str = "./data/tick",
+):
+    """
+    读取TickFileSink保存的二进制行情
+    :param date: 日期YYYYMMDD，指定时返回该文件的内存映射，不复制数据；None时按日期顺序拼接全部文件
+    :return: numpy结构化数组，不存在时返回None
+    """
+    if date is not None:
+        file = getTickFilePath(rootDir, exchange, channel, symbol, date)
+        if not os.path.exists(file):
+            logger.error(f"File {file} does not exist.")
+            return
+        return readTickFile(file)
+    path = f"{rootDir}/{exchange}/{channel}/{symbol}"
+    if not os.path.exists(path):
+        logger.error(f"Path {path} does not exist.")
+        return
+    arrays = [
+        readTickFile(f"{path}/{file}")
+        for file in sorted(os.listdir(path))
+        if file.endswith(".tick")
+    ]
+    if not arrays:
+        return
+    return np.concatenate(arrays)
+
+
+def _getFundingBound(exchange: str, symbol: str):
+    """获取资金费率上下限，没有时返回None"""
+    if exchange == "binance":
+        fundingInfo = getFundingInfoCache("binance").get(symbol)
+        if fundingInfo is None:
+            return -0.003, 0.003
+        return (
+            fundingInfo["adjustedFundingRateFloor"],
+            fundingInfo["adjustedFundingRateCap"],
+        )
+    if exchange == "bitget":
+        fundingInfo = getFundingInfoCache("bitget").get(symbol)
+        if fundingInfo is None:
+            return None
+        return fundingInfo["minFundingRate"], fundingInfo["maxFundingRate"]
+    if exchange == "bybit":
+        fundingInfo = getFundingInfoCache("bybit").get(symbol)
+        if fundingInfo is None:
+            return None
+        return (
+            float(fundingInfo["lowerFundingRate"]),
+            float(fundingInfo["upperFundingRate"]),
+        )
+    return None
+
+
+def tickDataReader(exchange: str, symbol: str, rootDir: str = "./data"):
+    """
+    读取handler保存的统一格式Tick，各交易所使用相同的列名，接收时需调用handler.useTickOutput
+    :param exchange: 交易所
+    :param symbol: BTCUSDT形式的symbol
+    :return: 按100ms聚合的DataFrame，不存在时返回None
+    """
+    file = f"{rootDir}/{exchange}/tick/{symbol}.csv"
+    if not os.path.exists(file):
+        logger.error(f"File {file} does not exist.")
+        return
+    df = pd.read_csv(
+        file,
+        usecols=[
+            "timestamp",
+            "bidPx",
+            "bidSz",
+            "askPx",
+            "askSz",
+            "indexPrice",
+            "fundingRate",
+            "nextFundingTime",
+            "minFundingRate",
+            "maxFundingRate",
+        ],
+    )
+    df["timestamp"] = (df["timestamp"].astype(int) / 100).astype(int)
+    df = df.groupby("timestamp").agg(
+        {
+            "fundingRate": "mean",
+            "nextFundingTime": "median",
+            "indexPrice": "mean",
+            "askPx": "mean",
+            "askSz": "mean",
+            "bidPx": "mean",
+            "bidSz": "mean",
+            "minFundingRate": "mean",
+            "maxFundingRate": "mean",
+        }
+    )
+    if df["minFundingRate"].isna().all():
+        fundingBound = _getFundingBound(exchange, symbol)
+        if fundingBound is None:
+            raise ValueError(
+                f"Funding info for symbol {symbol} not found in {exchange} funding info."
+            )
+        df["minFundingRate"], df["maxFundingRate"] = fundingBound
+    df.ffill(inplace=True)
+    df.dropna(inplace=True)
+    return df
+
+
 def bitgetDataReader(symbol):
     renameDict = {
         "ts": "timestamp",
@@ -61,7 +195,7 @@ def bitgetDataReader(symbol):
     )
     df.ffill(inplace=True)
     df.dropna(inplace=True)
-    fundingMinMax = getBitgetFundingInfoBySombol(symbol)
+    fundingMinMax = getFundingInfoCache("bitget").get(symbol)
     if fundingMinMax is not None:
         df["minFundingRate"] = fundingMinMax["minFundingRate"]
         df["maxFundingRate"] = fundingMinMax["maxFundingRate"]
@@ -131,7 +265,7 @@ def binanceDataReader(symbol):
     )
     df.ffill(inplace=True)
     df.dropna(inplace=True)
-    fundingMinMax = getBinanceFundingInfoBySombol(symbol)
+    fundingMinMax = getFundingInfoCache("binance").get(symbol)
     if fundingMinMax is not None:
         df["minFundingRate"] = fundingMinMax["adjustedFundingRateFloor"]
         df["maxFundingRate"] = fundingMinMax["adjustedFundingRateCap"]
@@ -141,11 +275,53 @@ def binanceDataReader(symbol):
     return df
 
 
+def bybitDataReader(symbol):
+    renameDict = {
+        "ts": "timestamp",
+        "fundingRate": "fundingRate",
+        "nextFundingTime": "nextFundingTime",
+        "indexPrice": "indexPrice",
+        "ask1Price": "askPx",
+        "ask1Size": "askSz",
+        "bid1Price": "bidPx",
+        "bid1Size": "bidSz",
+    }
+    file = f"./data/bybit/tickers/{symbol}.csv"
+    if not os.path.exists(file):
+        logger.error(f"File {file} does not exist.")
+        return
+    df = pd.read_csv(file, usecols=list(renameDict.keys()))
+    df.rename(columns=renameDict, inplace=True)
+    df["timestamp"] = (df["timestamp"].astype(int) / 100).astype(int)
+    df = df.groupby("timestamp").agg(
+        {
+            "fundingRate": "mean",
+            "nextFundingTime": "median",
+            "indexPrice": "mean",
+            "askPx": "mean",
+            "askSz": "mean",
+            "bidPx": "mean",
+            "bidSz": "mean",
+        }
+    )
+    df.ffill(inplace=True)
+    df.dropna(inplace=True)
+    fundingBound = _getFundingBound("bybit", symbol)
+    if fundingBound is None:
+        raise ValueError(
+            f"Funding info for symbol {symbol} not found in Bybit funding info."
+        )
+    df["minFundingRate"], df["maxFundingRate"] = fundingBound
+    return df
+
+
 def okxDataReader(symbol):
-    symbol = symbol.strip("USDT") + "-USDT"
-    fundingRateFile = f"./data/okx/funding-rate/{symbol}-SWAP.csv"
-    indexPriceFile = f"./data/okx/index-tickers/{symbol}.csv"
-    tickersFile = f"./data/okx/tickers/{symbol}-SWAP.csv"
+    catalog = getInstrumentCatalog()
+    instId = catalog.toNative("okx", symbol)
+    indexId = catalog.toIndexId("okx", symbol)
+    fundingRateFile = f"./data/okx/funding-rate/{instId}.csv"
+    indexPriceFile = f"./data/okx/index-tickers/{indexId}.csv"
+    tickersFile = f"./data/okx/tickers/{instId}.csv"
 
     if not os.path.exists(fundingRateFile):
         logger.error(f"File {fundingRateFile} does not exist.")
@@ -222,7 +398,9 @@ def okxDataReader(symbol):
 
 
 def analyzeData(
-    dfDict: dict[str, pd.DataFrame], feeRate: float = 0.00025, extendFlag: bool = True
+    dfDict: dict[str, pd.DataFrame],
+    feeRate: float = DEFAULT_FEE_RATE,
+    extendFlag: bool = True,
 ):
     if len(dfDict) != 2:
         logger.error("df数量不等于2，无法分析")
@@ -688,18 +866,31 @@ class Exchange(Enum):
     BITGET = "bitget"
     BINANCE = "binance"
     OKX = "okx"
+    BYBIT = "bybit"
 
 
 def analyze(
-    symbol: str, exchange1: Exchange, exchange2: Exchange, extendFlag: bool = True
+    symbol: str,
+    exchange1: Exchange,
+    exchange2: Exchange,
+    extendFlag: bool = True,
+    tickFlag: bool = False,
 ):
+    """
+    :param tickFlag: 是否读取统一格式的Tick数据，否则读取各交易所原始数据
+    """
     exchangeDict = {
         Exchange.BITGET: bitgetDataReader,
         Exchange.BINANCE: binanceDataReader,
         Exchange.OKX: okxDataReader,
+        Exchange.BYBIT: bybitDataReader,
     }
-    df1 = exchangeDict[exchange1](symbol)
-    df2 = exchangeDict[exchange2](symbol)
+    if tickFlag:
+        df1 = tickDataReader(exchange1.value, symbol)
+        df2 = tickDataReader(exchange2.value, symbol)
+    else:
+        df1 = exchangeDict[exchange1](symbol)
+        df2 = exchangeDict[exchange2](symbol)
     if df1 is not None and df2 is not None:
         df, exchange_1, exchange_2 = analyzeData(
             {exchange1.value: df1, exchange2.value: df2},
@@ -3,17 +3,60 @@ import sys
 import os
 import json
 import random
+import re
+import time
+from collections import deque
 from loguru import logger
-import requests
 
 sys.path.append(os.path.dirname(__file__) + "/..")
 from lib.baseWebsocket import ExchangeWebsocket
+from lib.orderBook import OrderBook
+from lib.reconnect import Backoff
+from lib.restClient import getRestClient
 from websockets.protocol import State
 
+FUTURES_DEPTH_URL = "https://fapi.binance.com/fapi/v1/depth"
+SPOT_DEPTH_URL = "https://api.binance.com/api/v3/depth"
+# 深度stream，<symbol>@depth[@100ms]为增量深度，<symbol>@depth20[@100ms]等为有限档全量深度
+DEPTH_STREAM_PATTERN = re.compile(r"^(\w+)@depth(\d+)?(@\d+ms)?$")
+
 
 class Binance(ExchangeWebsocket):
+    exchangeName = "binance"
+    requestOpField = "method"
+    requestArgsField = "params"
+    subscribeOp = "SUBSCRIBE"
+    unsubscribeOp = "UNSUBSCRIBE"
+    maxArgsPerRequest = 200
+    eventStreamDict = {
+        "bookTicker": "bookTicker",
+        "markPriceUpdate": "markPrice",
+        "depthUpdate": "depth",
+    }
+    streamSuffixes = ("@1s", "@100ms", "@250ms", "@500ms")  # stream的更新频率后缀
+
     def __init__(self, url: str, needLogin: bool, *args, **kwargs):
         super().__init__(url, needLogin, *args, **kwargs)
+        # 订单簿，订阅<symbol>@depth@100ms等增量深度或<symbol>@depth20等有限档深度后自动维护
+        self.depthLimit = kwargs.get("depthLimit", 1000)  # 快照档位数量
+        self.depthSnapshotUrl = kwargs.get(
+            "depthSnapshotUrl",
+            FUTURES_DEPTH_URL if "fstream" in url else SPOT_DEPTH_URL,
+        )
+        self.depthBufferSize = kwargs.get("depthBufferSize", 1000)
+        self.depthSyncTimeout = kwargs.get("depthSyncTimeout", 10)
+        self.depthRetryInterval = kwargs.get("depthRetryInterval", 1)
+        self.depthRetryMaxDelay = kwargs.get("depthRetryMaxDelay", 30)
+        # 每次同步的最大尝试次数，失败后等待depthSyncCooldown秒
+        self.depthMaxRetries = kwargs.get("depthMaxRetries", 5)
+        self.depthSyncCooldown = kwargs.get("depthSyncCooldown", 60)
+        self.orderBookDict: dict[str, OrderBook] = {}
+        self.depthBufferDict: dict[str, deque] = {}  # 未同步时缓存的增量
+        self.depthSyncTaskDict: dict[str, asyncio.Task] = {}  # 正在同步的symbol
+        self.depthSyncFailTimeDict: dict[str, float] = {}  # 同步失败的时间
+        self.diffDepthDict: dict[str, str] = {}  # 订阅了增量深度的symbol -> stream
+        self.partialDepthDict: dict[str, str] = {}  # 订阅了有限档深度的symbol -> stream
+        self.spot = "fstream" not in url  # 现货连接的有限档深度推送格式与合约不同
 
     async def keepAlive(self):
         """保持连接"""
@@ -24,37 +67,285 @@ class Binance(ExchangeWebsocket):
                 # 发送ping frame
                 await self.ws.ping()
 
-    async def processRecv(self):
-        while True:
-            if self.ws and self.ws.state == State.OPEN:
+    async def _isHeartbeat(self, recvMsg) -> bool:
+        if recvMsg == "ping":
+            await self.ws.pong()
+            return True
+        return False
+
+    @staticmethod
+    def _isSpotPartialDepth(recvMsg) -> bool:
+        """现货有限档深度的推送只有lastUpdateId、bids与asks，没有事件类型与symbol"""
+        return (
+            isinstance(recvMsg, dict)
+            and "lastUpdateId" in recvMsg
+            and "e" not in recvMsg
+        )
+
+    def _getSpotPartialDepthSymbol(self) -> str | None:
+        """现货有限档深度的推送无法区分symbol，每条连接最多订阅一个，由订阅还原symbol"""
+        if not self.spot or len(self.partialDepthDict) != 1:
+            return None
+        return next(iter(self.partialDepthDict))
+
+    def _getRecvTopic(self, recvMsg):
+        # 推送中没有stream名称，根据事件类型和symbol还原
+        if self._isSpotPartialDepth(recvMsg):
+            symbol = self._getSpotPartialDepthSymbol()
+            return None if symbol is None else self.partialDepthDict[symbol]
+        if isinstance(recvMsg, list):
+            if recvMsg and recvMsg[0].get("e") == "markPriceUpdate":
+                return "!markPrice@arr"
+            return None
+        event = recvMsg.get("e") if isinstance(recvMsg, dict) else None
+        if event not in self.eventStreamDict:
+            return None
+        if event == "depthUpdate":
+            symbol = recvMsg["s"]
+            stream = self.partialDepthDict.get(symbol) or self.diffDepthDict.get(symbol)
+            if stream is not None:
+                return stream
+        stream = f"{recvMsg['s'].lower()}@{self.eventStreamDict[event]}"
+        if stream not in self.subscriptionDict:
+            for suffix in self.streamSuffixes:
+                if stream + suffix in self.subscriptionDict:
+                    return stream + suffix
+        return stream
+
+    def _getRecvChannel(self, recvMsg):
+        if isinstance(recvMsg, list):
+            recvMsg = recvMsg[0] if recvMsg else {}
+        return recvMsg.get("e") if isinstance(recvMsg, dict) else None
+
+    def _getEventTime(self, recvMsg):
+        if isinstance(recvMsg, list):
+            recvMsg = recvMsg[0]
+        return recvMsg.get("E")
+
+    def _getUpdateId(self, recvMsg):
+        if isinstance(recvMsg, list):
+            return recvMsg[0].get("E") if recvMsg else None
+        if not isinstance(recvMsg, dict):
+            return None
+        # bookTicker使用订单簿更新id，其他事件使用事件时间
+        return recvMsg.get("u", recvMsg.get("E"))
+
+    def _getSequence(self, recvMsg):
+        if isinstance(recvMsg, list):
+            return (recvMsg[0]["E"], None) if recvMsg else None
+        if not isinstance(recvMsg, dict):
+            return None
+        if self._isSpotPartialDepth(recvMsg):
+            return recvMsg["lastUpdateId"], None
+        if (
+            recvMsg.get("e") == "depthUpdate"
+            and recvMsg["s"] not in self.partialDepthDict
+        ):
+            # 合约深度用pu衔接上一条的u，现货深度用U衔接上一条的u+1
+            if "pu" in recvMsg:
+                return recvMsg["u"], recvMsg["pu"]
+            return recvMsg["u"], recvMsg["U"] - 1
+        # bookTicker的u与其他事件的E只保证递增，只能发现乱序
+        seq = recvMsg.get("u", recvMsg.get("E"))
+        return None if seq is None else (seq, None)
+
+    def getOrderBook(self, symbol: str) -> OrderBook | None:
+        """获取已同步的订单簿，symbol为大写，未同步时返回None"""
+        book = self.orderBookDict.get(symbol)
+        if book is None or not book.synced:
+            return None
+        return book
+
+    def _recordRequest(self, requestMsg: dict):
+        """更新订阅表，同时记录深度stream的类型，取消订阅时停止同步并删除订单簿"""
+        super()._recordRequest(requestMsg)
+        op = requestMsg.get(self.requestOpField)
+        for stream in requestMsg.get(self.requestArgsField) or ():
+            match = DEPTH_STREAM_PATTERN.match(stream)
+            if match is None:
+                continue
+            symbol = match.group(1).upper()
+            depthDict = self.partialDepthDict if match.group(2) else self.diffDepthDict
+            if op == self.subscribeOp:
+                if (
+                    self.spot
+                    and depthDict is self.partialDepthDict
+                    and self.partialDepthDict
+                    and symbol not in self.partialDepthDict
+                ):
+                    logger.error(
+                        f"现货有限档深度的推送中没有symbol，每条连接只能维护一个，{stream}不维护订单簿"
+                    )
+                    continue
+                depthDict[symbol] = stream
+            elif op == self.unsubscribeOp and depthDict.get(symbol) == stream:
+                del depthDict[symbol]
+                self._dropOrderBook(symbol)
+
+    def _dropOrderBook(self, symbol: str):
+        task = self.depthSyncTaskDict.pop(symbol, None)
+        if task is not None:
+            task.cancel()
+        self.orderBookDict.pop(symbol, None)
+        self.depthBufferDict.pop(symbol, None)
+        self.depthSyncFailTimeDict.pop(symbol, None)
+
+    @staticmethod
+    def _isDepthContinuous(book: OrderBook, recvMsg: dict) -> bool:
+        """合约的增量用pu与上一条的u衔接，现货的增量用U与上一条的u+1衔接"""
+        if "pu" in recvMsg:
+            return recvMsg["pu"] == book.updateId
+        return recvMsg["U"] == book.updateId + 1
+
+    @staticmethod
+    def _isDepthStale(recvMsg: dict, lastUpdateId: int) -> bool:
+        """增量是否已包含在快照中，合约丢弃u < lastUpdateId，现货丢弃u <= lastUpdateId"""
+        if "pu" in recvMsg:
+            return recvMsg["u"] < lastUpdateId
+        return recvMsg["u"] <= lastUpdateId
+
+    @staticmethod
+    def _isDepthAligned(recvMsg: dict, lastUpdateId: int) -> bool:
+        """
+        第一条增量是否与快照衔接
+        合约需满足U <= lastUpdateId <= u，现货需满足U <= lastUpdateId + 1 <= u
+        """
+        if "pu" in recvMsg:
+            return recvMsg["U"] <= lastUpdateId <= recvMsg["u"]
+        return recvMsg["U"] <= lastUpdateId + 1 <= recvMsg["u"]
+
+    async def _updateOrderBook(self, recvMsg):
+        if self._isSpotPartialDepth(recvMsg):
+            symbol = self._getSpotPartialDepthSymbol()
+            if symbol is None:
+                return
+            book = self.orderBookDict.get(symbol)
+            if book is None:
+                book = self.orderBookDict[symbol] = OrderBook(symbol)
+            book.applySnapshot(
+                recvMsg["bids"], recvMsg["asks"], recvMsg["lastUpdateId"]
+            )
+            book.synced = True
+            return
+        if not isinstance(recvMsg, dict) or recvMsg.get("e") != "depthUpdate":
+            return
+        symbol = recvMsg["s"]
+        if symbol in self.partialDepthDict:
+            # 有限档深度每次推送全量，直接替换
+            book = self.orderBookDict.get(symbol)
+            if book is None:
+                book = self.orderBookDict[symbol] = OrderBook(symbol)
+            book.applySnapshot(recvMsg["b"], recvMsg["a"], recvMsg["u"], recvMsg["E"])
+            book.synced = True
+            return
+        if symbol not in self.diffDepthDict:
+            # 已取消订阅后仍在途的推送
+            return
+        book = self.orderBookDict.get(symbol)
+        if book is None:
+            book = self.orderBookDict[symbol] = OrderBook(symbol)
+        if book.synced:
+            if self._isDepthContinuous(book, recvMsg):
+                book.applyDelta(recvMsg["b"], recvMsg["a"], recvMsg["u"], recvMsg["E"])
+                return
+            if recvMsg["u"] <= book.updateId:
+                # 重复的增量
+                return
+            logger.warning(
+                "{} 订单簿增量不连续 updateId={} U={} u={}，重新同步".format(
+                    symbol, book.updateId, recvMsg["U"], recvMsg["u"]
+                )
+            )
+            book.synced = False
+        buffer = self.depthBufferDict.get(symbol)
+        if buffer is None:
+            buffer = self.depthBufferDict[symbol] = deque(maxlen=self.depthBufferSize)
+        buffer.append(recvMsg)
+        if symbol not in self.depthSyncTaskDict and (
+            time.time() - self.depthSyncFailTimeDict.get(symbol, 0)
+            > self.depthSyncCooldown
+        ):
+            self.depthSyncTaskDict[symbol] = asyncio.create_task(
+                self._syncOrderBook(symbol)
+            )
+
+    async def _syncOrderBook(self, symbol: str):
+        """
+        按币安的流程同步订单簿：
+        1. 同步期间缓存收到的增量
+        2. 获取快照，丢弃已包含在快照中的增量
+        3. 第一条增量需与快照衔接（见_isDepthAligned），否则快照过旧，重新获取
+        4. 依次应用缓存的增量，之后的增量需要连续，不连续时重新同步
+        最多尝试depthMaxRetries次，失败后等待depthSyncCooldown秒再由新的增量触发同步
+        """
+        book = self.orderBookDict[symbol]
+        buffer = self.depthBufferDict[symbol]
+        backoff = Backoff(self.depthRetryInterval, self.depthRetryMaxDelay)
+        try:
+            for attempt in range(self.depthMaxRetries):
+                if attempt:
+                    await asyncio.sleep(backoff.nextDelay())
                 try:
-                    recv = await self.ws.recv()
-                    if recv == "ping":
-                        await self.ws.pong()
-                        continue
-                    await self._processRecv(recv)
+                    snapshot = await getRestClient().fetch(
+                        self.depthSnapshotUrl,
+                        {"symbol": symbol, "limit": self.depthLimit},
+                    )
                 except Exception as e:
-                    logger.error(e)
-
-            await asyncio.sleep(self.processRecvInterval)
+                    logger.error(f"{symbol} 获取订单簿快照失败: {e}")
+                    continue
+                lastUpdateId = snapshot["lastUpdateId"]
+                # 等待增量追上快照
+                waited = 0.0
+                while (
+                    not buffer or self._isDepthStale(buffer[-1], lastUpdateId)
+                ) and waited < self.depthSyncTimeout:
+                    await asyncio.sleep(0.05)
+                    waited += 0.05
+                while buffer and self._isDepthStale(buffer[0], lastUpdateId):
+                    buffer.popleft()
+                if not buffer or not self._isDepthAligned(buffer[0], lastUpdateId):
+                    logger.debug(f"{symbol} 订单簿快照与增量无法衔接，重新获取快照")
+                    continue
+                book.applySnapshot(snapshot["bids"], snapshot["asks"], lastUpdateId)
+                first = buffer[0]
+                book.applyDelta(first["b"], first["a"], first["u"], first["E"])
+                for i in range(1, len(buffer)):
+                    recvMsg = buffer[i]
+                    if not self._isDepthContinuous(book, recvMsg):
+                        break
+                    book.applyDelta(
+                        recvMsg["b"], recvMsg["a"], recvMsg["u"], recvMsg["E"]
+                    )
+                else:
+                    buffer.clear()
+                    book.synced = True
+                    self.depthSyncFailTimeDict.pop(symbol, None)
+                    logger.info(f"{symbol} 订单簿同步完成 updateId={book.updateId}")
+                    return
+                logger.debug(f"{symbol} 缓存的订单簿增量不连续，重新获取快照")
+            logger.error(
+                f"{symbol} 订单簿同步{self.depthMaxRetries}次失败，"
+                f"{self.depthSyncCooldown}秒后重试"
+            )
+            buffer.clear()
+            self.depthSyncFailTimeDict[symbol] = time.time()
+        finally:
+            if self.depthSyncTaskDict.get(symbol) is asyncio.current_task():
+                del self.depthSyncTaskDict[symbol]
 
-    async def subscribe(self, args: list[str]):
-        """这里需要以列表的形式输入订阅channel"""
-        op = "SUBSCRIBE"
-        params = {
+    def _buildRequest(self, op: str, args: list[str]) -> dict:
+        return {
             "method": op,
             "params": args,
             "id": random.randint(1, 10000),  # 请求 ID，需唯一
         }
-        await self.addRequest(params)
 
 
 def getAllBinanceSymbols():
     """获取所有币安交易对"""
     url = "https://api.binance.com/api/v3/exchangeInfo"
     try:
-        response = requests.get(url)
-        data = response.json()
+        data = getRestClient().get(url)
         symbols = [s["symbol"] for s in data["symbols"] if s["quoteAsset"] == "USDT"]
         return symbols
     except Exception as e:
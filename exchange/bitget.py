@@ -2,33 +2,65 @@ import asyncio
 import sys
 import os
 import json
-import requests
+from loguru import logger
 
 sys.path.append(os.path.dirname(__file__) + "/..")
 from lib.baseWebsocket import ExchangeWebsocket
+from lib.restClient import getRestClient
 
 
 class Bitget(ExchangeWebsocket):
+    exchangeName = "bitget"
+    requestOpField = "op"
+    requestArgsField = "args"
+    maxArgsPerRequest = 50
+
     def __init__(self, url, needLogin, *args, **kwargs):
         super().__init__(url, needLogin, *args, **kwargs)
 
-    async def subscribe(self, args: list[dict]):
-        op = "subscribe"
-        params = {"op": op, "args": args}
-        await self.addRequest(params)
+    def _getRecvTopic(self, recvMsg):
+        if isinstance(recvMsg, dict) and "data" in recvMsg:
+            return self._getArgKey(recvMsg["arg"])
+        return None
+
+    def _getRecvChannel(self, recvMsg):
+        if isinstance(recvMsg, dict) and "data" in recvMsg:
+            return recvMsg["arg"]["channel"]
+        return None
+
+    def _getEventTime(self, recvMsg):
+        # 外层ts为推送时间，data中的ts为行情时间
+        return recvMsg.get("ts", recvMsg["data"][0].get("ts"))
+
+    def _getUpdateId(self, recvMsg):
+        if not isinstance(recvMsg, dict) or "data" not in recvMsg:
+            return None
+        data = recvMsg["data"][0]
+        if "seq" in data:
+            return int(data["seq"])
+        # ticker等channel没有序号，同一毫秒内可能有多次更新，用内容区分
+        return int(data["ts"]), hash(tuple(map(str, data.values())))
+
+    def _getSequence(self, recvMsg):
+        if not isinstance(recvMsg, dict) or "data" not in recvMsg:
+            return None
+        data = recvMsg["data"][0]
+        if "seq" in data:
+            return int(data["seq"]), None
+        # 推送中没有序号，使用行情时间，只能发现乱序
+        return int(data["ts"]), None
 
 
 def getAllBitgetSymbols() -> list[str]:
     api_url = (
         "https://api.bitget.com/api/v2/mix/market/contracts?productType=usdt-futures"
     )
-    response = requests.get(api_url)
-    if response.status_code == 200:
-        data = response.json()
+    try:
+        data = getRestClient().get(api_url)
         symbols = [item["symbol"] for item in data["data"]]
         return symbols
-    else:
-        print(f"Error fetching symbols: {response.status_code}")
+    except Exception as e:
+        logger.error(f"Error fetching Bitget symbols: {e}")
         return []
 
 
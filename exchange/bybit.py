@@ -5,10 +5,19 @@ import json
 
 sys.path.append(os.path.dirname(__file__) + "/..")
 from lib.baseWebsocket import ExchangeWebsocket
+from lib.sequenceTracker import SNAPSHOT
 from websockets.protocol import State
 
 
 class Bybit(ExchangeWebsocket):
+    exchangeName = "bybit"
+    requestOpField = "op"
+    requestArgsField = "args"
+    # 打包订阅中存在未知订阅时整包都不会推送，默认不合并，确认订阅均有效时可调大（最大10）
+    maxArgsPerRequest = 1
+    # tickers在snapshot之后只推送变化的字段，在处理时合并，不能被丢弃或替换
+    incrementalPayloads = True
+
     def __init__(self, url: str, needLogin: bool, *args, **kwargs):
         super().__init__(url, needLogin, *args, **kwargs)
 
@@ -20,20 +29,40 @@ class Bybit(ExchangeWebsocket):
             if self.ws and self.ws.state == State.OPEN:
                 await self.ws.send(json.dumps({"op": "ping"}))
 
-    async def subscribe(self, args):
-        params = {"op": "subscribe", "args": args}
-        await self.addRequest(params)
+    async def _isHeartbeat(self, recvMsg) -> bool:
+        # ping的响应形如{"success":true,"ret_msg":"pong",...,"op":"ping"}，无需反序列化
+        return '"op":"ping"' in recvMsg
 
-    async def processRecv(self):
-        while True:
-            if self.ws and self.ws.state == State.OPEN:
-                recv = await self.ws.recv()
-                if "op" in json.loads(recv).keys():
-                    if json.loads(recv)["op"] == "ping":
-                        continue
-                await self._processRecv(recv)
+    def _getRecvTopic(self, recvMsg):
+        if isinstance(recvMsg, dict):
+            return recvMsg.get("topic")
+        return None
+
+    def _getRecvChannel(self, recvMsg):
+        if isinstance(recvMsg, dict) and "topic" in recvMsg:
+            return recvMsg["topic"].split(".")[0]
+        return None
+
+    def _getEventTime(self, recvMsg):
+        return recvMsg.get("ts")
+
+    def _getUpdateId(self, recvMsg):
+        if not isinstance(recvMsg, dict) or "topic" not in recvMsg:
+            return None
+        return recvMsg.get("cs", recvMsg.get("ts"))
 
-            await asyncio.sleep(self.processRecvInterval)
+    def _getSequence(self, recvMsg):
+        if not isinstance(recvMsg, dict) or "topic" not in recvMsg:
+            return None
+        data = recvMsg.get("data")
+        if isinstance(data, dict) and "u" in data:
+            # 订单簿使用更新id，其他topic使用cs或ts，只保证递增
+            seq = data["u"]
+        else:
+            seq = recvMsg.get("cs", recvMsg.get("ts"))
+        if seq is None:
+            return None
+        return seq, SNAPSHOT if recvMsg.get("type") == "snapshot" else None
 
 
 if __name__ == "__main__":
@@ -1,131 +1,216 @@
-import requests
 import json
 import time
 import os
+import sys
+import threading
 from loguru import logger
 
-# 获取okx所有币种的资金费率信息
-# 保存结果到data/fundingInfo/okxfundingInfo.json
-# okxSavePath = "data/fundingInfo/okxfundingInfo.json"
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.restClient import getRestClient
+from lib.reconnect import Backoff
 
+# 各交易所的资金费率信息，通过getFundingInfoCache查询
+# 缓存文件保存在data/fundingInfo/{exchange}FundingInfo.json
 
-def _getBinanceFundingInfo():
-    url = "https://fapi.binance.com//fapi/v1/fundingInfo"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        return data
-    else:
-        logger.error(f"HTTP Error: {response.status_code}")
-        return None
 
+def _saveFundingInfo(savePath, fundingInfoData, timestamp=None):
+    """先写入临时文件再替换，读取方不会读到写了一半的文件"""
+    os.makedirs(os.path.dirname(savePath) or ".", exist_ok=True)
+    tmpPath = f"{savePath}.{os.getpid()}.tmp"
+    with open(tmpPath, "w") as f:
+        fundingInfo = {
+            "timestamp": int(time.time() if timestamp is None else timestamp),
+            "data": fundingInfoData,
+        }
+        json.dump(fundingInfo, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpPath, savePath)
 
-def updateBinanceFundingInfo(binanceSavePath):
-    fundingInfoData = _getBinanceFundingInfo()
-    if fundingInfoData:
-        # 保存到文件
-        if not os.path.exists(os.path.dirname(binanceSavePath)):
-            os.makedirs(os.path.dirname(binanceSavePath))
-        with open(binanceSavePath, "w") as f:
-            fundingInfo = {
-                "timestamp": int(time.time()),
-                "data": fundingInfoData,
-            }
-            json.dump(fundingInfo, f, indent=4)
-        logger.info("Binance funding info updated successfully.")
-        return fundingInfoData
-    else:
-        logger.error("Failed to update Binance funding info.")
-        return None
 
-
-def getBinanceFundingInfo(binanceSavePath):
-    if not os.path.exists(os.path.dirname(binanceSavePath)):
-        os.makedirs(os.path.dirname(binanceSavePath))
-    if not os.path.exists(binanceSavePath):
-        updateBinanceFundingInfo(binanceSavePath)
-    else:
-        with open(binanceSavePath, "r") as f:
-            fundingInfo = json.load(f)
-            if time.time() - fundingInfo["timestamp"] < 86400:
-                return fundingInfo["data"]
-            else:
-                logger.info("Funding info is outdated, updating...")
-                return updateBinanceFundingInfo(binanceSavePath)
-    return None
-
-
-def getBinanceFundingInfoBySombol(symbol):
-    binanceSavePath = "data/fundingInfo/binanceFundingInfo.json"
-    fundingInfo = getBinanceFundingInfo(binanceSavePath)
-    if fundingInfo:
-        for item in fundingInfo:
-            if item["symbol"] == symbol:
-                return item
-    logger.error(f"Symbol {symbol} not found in Binance funding info.")
-    return None
+def _getBinanceFundingInfo():
+    url = "https://fapi.binance.com/fapi/v1/fundingInfo"
+    try:
+        return getRestClient().get(url)
+    except Exception as e:
+        logger.error(f"HTTP Error: {e}")
+        return None
 
 
 def _getBitgetFundingInfo():
     url = f"https://api.bitget.com/api/v2/mix/market/current-fund-rate?productType=usdt-futures"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        return data["data"]
-    else:
-        logger.error(f"HTTP Error: {response.status_code}")
-        return None
-
-
-def updateBitgetFundingInfo(bitgetSavePath):
-    fundingInfoData = _getBitgetFundingInfo()
-    if fundingInfoData:
-        # 保存到文件
-        if not os.path.exists(os.path.dirname(bitgetSavePath)):
-            os.makedirs(os.path.dirname(bitgetSavePath))
-        with open(bitgetSavePath, "w") as f:
-            fundingInfo = {
-                "timestamp": int(time.time()),
-                "data": fundingInfoData,
-            }
-            json.dump(fundingInfo, f, indent=4)
-        logger.info("Bitget funding info updated successfully.")
-        return fundingInfoData
-    else:
-        logger.error("Failed to update Bitget funding info.")
+    try:
+        return getRestClient().get(url)["data"]
+    except Exception as e:
+        logger.error(f"HTTP Error: {e}")
         return None
 
 
-def getBitgetFundingInfo(bitgetSavePath):
-    if not os.path.exists(os.path.dirname(bitgetSavePath)):
-        os.makedirs(os.path.dirname(bitgetSavePath))
-    if not os.path.exists(bitgetSavePath):
-        updateBitgetFundingInfo(bitgetSavePath)
-    else:
-        with open(bitgetSavePath, "r") as f:
-            fundingInfo = json.load(f)
-            if time.time() - fundingInfo["timestamp"] < 86400:
-                return fundingInfo["data"]
-            else:
-                logger.info("Funding info is outdated, updating...")
-                return updateBitgetFundingInfo(bitgetSavePath)
-    return None
-
-
-def getBitgetFundingInfoBySombol(symbol):
-    bitgetSavePath = "data/fundingInfo/bitgetFundingInfo.json"
-    fundingInfo = getBitgetFundingInfo(bitgetSavePath)
-    if fundingInfo:
-        for item in fundingInfo:
-            if item["symbol"] == symbol:
-                return item
-    logger.error(f"Symbol {symbol} not found in Bitget funding info.")
-    return None
+def _getBybitFundingInfo():
+    url = "https://api.bybit.com/v5/market/instruments-info"
+    params = {"category": "linear", "limit": 1000}
+    data = []
+    while True:
+        try:
+            result = getRestClient().get(url, params)["result"]
+        except Exception as e:
+            logger.error(f"HTTP Error: {e}")
+            return None
+        data.extend(result["list"])
+        # 分页获取
+        if not result.get("nextPageCursor"):
+            return data
+        params["cursor"] = result["nextPageCursor"]
+
+
+class FundingInfoCache:
+    def __init__(
+        self,
+        exchange: str,
+        savePath: str,
+        fetchFunc,
+        ttl: float = 86400,
+        retryBaseDelay: float = 60,
+        retryMaxDelay: float = 3600,
+    ):
+        """
+        按symbol索引的资金费率信息，第一次使用时从文件加载，之后在内存中查询
+        过期后在后台线程中重新获取，获取期间继续返回旧数据，获取完成后整体替换索引
+        获取失败后按指数退避等待，期间的查询不再触发获取
+        :param exchange: 交易所名称
+        :param savePath: 文件缓存路径
+        :param fetchFunc: 从交易所获取信息的函数，返回列表，失败时返回None
+        :param ttl: 有效期（秒）
+        :param retryBaseDelay: 第一次获取失败后的等待时间（秒）
+        :param retryMaxDelay: 获取失败后等待时间的最大值（秒）
+        """
+        self.exchange = exchange
+        self.savePath = savePath
+        self.fetchFunc = fetchFunc
+        self.ttl = ttl
+        self.index: dict[str, dict] | None = None  # symbol -> 信息
+        self.timestamp = 0.0  # 数据获取的时间
+        self.lock = threading.Lock()  # 保证同时只有一个线程获取
+        self.refreshThread: threading.Thread | None = None
+        self.threadLock = threading.Lock()  # 保证同时只启动一个后台获取线程
+        self.retryBackoff = Backoff(retryBaseDelay, retryMaxDelay, jitter=False)
+        self.nextRetryTime = 0.0  # 获取失败后，在此时间之前不在后台重新获取
+        self.stopEvent = threading.Event()
+
+    def _setData(self, fundingInfoData, timestamp):
+        # 替换引用，读取方不需要加锁
+        self.index = {item["symbol"]: item for item in fundingInfoData}
+        self.timestamp = timestamp
+
+    def _load(self):
+        """从文件加载，文件不存在或无法读取时同步获取"""
+        with self.lock:
+            if self.index is not None:
+                return
+            try:
+                with open(self.savePath, "r") as f:
+                    fundingInfo = json.load(f)
+                self._setData(fundingInfo["data"], fundingInfo["timestamp"])
+                return
+            except (OSError, ValueError, KeyError):
+                pass
+            self._refreshLocked()
+            if self.index is None:
+                self.index = {}
+
+    def _refreshLocked(self) -> bool:
+        fundingInfoData = self.fetchFunc()
+        if not fundingInfoData:
+            delay = self.retryBackoff.nextDelay()
+            self.nextRetryTime = time.time() + delay
+            logger.error(
+                f"Failed to update {self.exchange} funding info, retry in {delay:.0f}s."
+            )
+            return False
+        timestamp = time.time()
+        _saveFundingInfo(self.savePath, fundingInfoData, timestamp)
+        self._setData(fundingInfoData, timestamp)
+        self.retryBackoff.reset()
+        self.nextRetryTime = 0.0
+        logger.info(f"{self.exchange} funding info updated successfully.")
+        return True
+
+    def refresh(self) -> bool:
+        """立即重新获取，已有线程在获取时等待其完成"""
+        with self.lock:
+            return self._refreshLocked()
+
+    def _refreshInBackground(self):
+        with self.threadLock:
+            if self.refreshThread is not None and self.refreshThread.is_alive():
+                return
+            if time.time() < self.nextRetryTime:
+                return
+            self.refreshThread = threading.Thread(target=self.refresh, daemon=True)
+            self.refreshThread.start()
+
+    def isExpired(self) -> bool:
+        return time.time() - self.timestamp >= self.ttl
+
+    def get(self, symbol: str) -> dict | None:
+        """查询symbol的信息，没有时返回None"""
+        if self.index is None:
+            self._load()
+        if self.isExpired():
+            self._refreshInBackground()
+        return self.index.get(symbol)
+
+    def all(self) -> list[dict]:
+        if self.index is None:
+            self._load()
+        if self.isExpired():
+            self._refreshInBackground()
+        return list(self.index.values())
+
+    def start(self, interval: float | None = None):
+        """
+        启动定期刷新的后台线程，用于长期运行的进程
+        :param interval: 刷新间隔（秒），None时使用ttl
+        """
+        interval = self.ttl if interval is None else interval
+
+        def run():
+            while not self.stopEvent.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"{self.exchange} funding info refresh failed: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        self.stopEvent.set()
+
+
+fundingInfoRootDir = "data/fundingInfo"
+_fundingInfoFetchDict = {
+    "binance": _getBinanceFundingInfo,
+    "bitget": _getBitgetFundingInfo,
+    "bybit": _getBybitFundingInfo,
+}
+_fundingInfoCacheDict: dict[str, FundingInfoCache] = {}
+_fundingInfoCacheLock = threading.Lock()
+
+
+def getFundingInfoCache(exchange: str) -> FundingInfoCache:
+    """进程内共用的FundingInfoCache，exchange为binance/bitget/bybit"""
+    cache = _fundingInfoCacheDict.get(exchange)
+    if cache is None:
+        with _fundingInfoCacheLock:
+            cache = _fundingInfoCacheDict.get(exchange)
+            if cache is None:
+                cache = _fundingInfoCacheDict[exchange] = FundingInfoCache(
+                    exchange,
+                    f"{fundingInfoRootDir}/{exchange}FundingInfo.json",
+                    _fundingInfoFetchDict[exchange],
+                )
+    return cache
 
 
 if __name__ == "__main__":
-    # binanceSavePath = "data/fundingInfo/binanceFundingInfo.json"
-    # print(getBinanceFundingInfoBySombol("SUSDT"))
-    bitgetSavePath = "data/fundingInfo/bitgetFundingInfo.json"
-    # print(getBinanceFundingInfoBySombol("BTCUSDT"))
-    print(getBitgetFundingInfoBySombol("BTCUSDT"))
+    print(getFundingInfoCache("bitget").get("BTCUSDT"))
@@ -1,40 +1,226 @@
-import json
+import atexit
+import multiprocessing.util
 import os
+import sys
 from loguru import logger
-import time
-import math
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.decoder import loads, decodeRecord, normalizeRecord
+from lib.latency import currentRecv
+from lib.backgroundWriter import BackgroundWriter, CsvSink
+from lib.parquetSink import ParquetSink
+from lib.tickFile import TickFileSink
+from lib.barAggregator import BarAggregator
+from lib.quoteBoard import QuoteBoard
+from lib.spreadEngine import SpreadEngine
+from exchange.schema import BinanceBookTicker, Tick
+
+
+def _registerClose(obj):
+    """进程退出时关闭写线程，写入剩余的行"""
+    atexit.register(obj.close)
+    # multiprocessing的子进程退出时不执行atexit
+    _finalizerList.append(
+        multiprocessing.util.Finalize(obj, obj.close, exitpriority=10)
+    )
+
+
+def _startWriter():
+    """
+    创建本进程的后台写线程，退出时写入剩余的行，行情默认保存为csv
+    调用过useParquetSink时同时创建本进程的parquet写线程
+    """
+    global writer, sink
+    writer = BackgroundWriter()
+    writer.start()
+    _registerClose(writer)
+    sink = CsvSink(writer)
+    if _parquetSinkKwargs is not None:
+        _startParquetSink()
+
+
+def _startParquetSink():
+    global sink
+    sink = ParquetSink(**_parquetSinkKwargs)
+    sink.start()
+    _registerClose(sink)
+
+
+def _restartWriterAfterFork():
+    """
+    fork出的子进程继承了父进程写线程的队列、缓存的行与文件缓冲，但没有写线程
+    取消继承的退出处理并丢弃这些状态后重新创建，避免子进程退出时重复写入父进程的行
+    """
+    for finalizer in _finalizerList:
+        finalizer.cancel()
+    _finalizerList.clear()
+    atexit.unregister(writer.close)
+    writer.discard()
+    if isinstance(sink, ParquetSink):
+        atexit.unregister(sink.close)
+        sink.discard()
+    _startWriter()
+
+
+# 每个进程共用的后台写线程与行情的保存方式
+writer: BackgroundWriter
+sink: CsvSink | ParquetSink
+_parquetSinkKwargs: dict | None = None  # useParquetSink的参数，fork后按相同参数重新创建
+_finalizerList: list[multiprocessing.util.Finalize] = []  # 本进程注册的退出处理
+_startWriter()
+# multiprocessing以fork方式创建的子进程中没有父进程的写线程，需要重新创建
+multiprocessing.util.register_after_fork(
+    _startWriter, lambda _: _restartWriterAfterFork()
+)
+
+
+def useParquetSink(**kwargs) -> ParquetSink:
+    """
+    改为保存为parquet文件，需要安装pyarrow，需在开始接收行情前调用
+    在主进程中调用时，之后fork出的子进程也保存为parquet，各自有自己的写线程
+    :param kwargs: ParquetSink的参数
+    """
+    global _parquetSinkKwargs
+    _parquetSinkKwargs = kwargs
+    _startParquetSink()
+    return sink
+
+
+# 高频channel的逐条二进制行情，默认不保存
+tickSink: TickFileSink | None = None
+
+
+def useTickFiles(**kwargs) -> TickFileSink:
+    """
+    额外将binance bookTicker与okx tickers的每条行情写入内存映射的二进制文件
+    :param kwargs: TickFileSink的参数
+    """
+    global tickSink
+    tickSink = TickFileSink(**kwargs)
+    atexit.register(tickSink.close)
+    return tickSink
+
+
+def _saveRow(
+    exchange: str, channel: str, symbol: str, header, values, types, timestamp=None
+):
+    """
+    保存一行行情，实际写入在后台线程中进行
+    在连接的处理协程中调用时，写入后统计该连接接收->落盘的延迟
+    :param timestamp: 事件时间(毫秒)，parquet按该时间分区
+    """
+    sink.writeRow(
+        exchange, channel, symbol, header, values, types, timestamp, currentRecv.get()
+    )
+
+
+# 是否额外保存各交易所统一格式的Tick，保存在{exchange}/tick/{symbol}，默认不保存
+saveTick = False
+
+
+def useTickOutput():
+    """
+    额外保存统一格式的Tick，供dataProcess.tickDataReader读取，需在开始接收行情前调用
+    与各channel的原始行情同时保存，写入量约为原来的两倍
+    """
+    global saveTick
+    saveTick = True
+
+
+# 共享内存报价板，默认不使用
+quoteBoard: QuoteBoard | None = None
+
+
+def useQuoteBoard(name: str = "quoteBoard") -> QuoteBoard | None:
+    """
+    将每条Tick写入已由主进程创建的共享内存报价板
+    :param name: 共享内存名称
+    :return: 报价板，不存在时返回None
+    """
+    global quoteBoard
+    try:
+        quoteBoard = QuoteBoard(name)
+    except FileNotFoundError:
+        logger.error(f"quote board {name} does not exist")
+        return None
+    atexit.register(quoteBoard.close)
+    return quoteBoard
+
+
+# 同一进程内接收多个交易所时使用的实时价差计算，默认不使用
+spreadEngine: SpreadEngine | None = None
+
+
+def useSpreadEngine(**kwargs) -> SpreadEngine:
+    """
+    将每条Tick送入实时价差计算
+    :param kwargs: SpreadEngine的参数
+    """
+    global spreadEngine
+    spreadEngine = SpreadEngine(**kwargs)
+    return spreadEngine
+
+
+def _saveTick(
+    exchange: str,
+    channel: str,
+    record,
+    timestamp=None,
+    save: bool = True,
+    publish: bool = True,
+):
+    """
+    将记录转换为统一的Tick，写入报价板并保存
+    :param save: 是否保存
+    :param publish: 是否写入报价板与实时价差计算
+    """
+    save = save and saveTick
+    publish = publish and (quoteBoard is not None or spreadEngine is not None)
+    if not save and not publish:
+        return
+    tick = normalizeRecord(exchange, channel, record, timestamp)
+    if tick is None:
+        return
+    if publish:
+        if quoteBoard is not None:
+            quoteBoard.update(tick)
+        if spreadEngine is not None:
+            spreadEngine.update(tick)
+    if save:
+        _saveRow(
+            exchange,
+            "tick",
+            tick.symbol,
+            Tick.fieldNames(),
+            tick.values(),
+            Tick.types,
+            tick.timestamp,
+        )
 
 
 def okxSingleMsgHandler(msg: str | dict):
     # logger.debug(msg)
     try:
         if isinstance(msg, str):
-            msg = json.loads(msg)
+            msg = loads(msg)
         if "event" in msg.keys():
             return
         channel = msg["arg"]["channel"]
-        data = msg["data"][0]
-        if not os.path.exists(f"data/okx/{channel}/"):
-            os.makedirs(f"data/okx/{channel}/")
-        saveFile = f"data/okx/{channel}/{msg['arg']['instId']}.csv"
-        if channel == "funding-rate":
-            if not os.path.exists(saveFile):
-                with open(saveFile, "a+") as f:
-                    f.write(f"{','.join(data.keys())}\n")
-            with open(saveFile, "a+") as f:
-                f.write(f"{','.join(str(data[col]) for col in data.keys())}\n")
-        if channel == "index-tickers":
-            if not os.path.exists(saveFile):
-                with open(saveFile, "a+") as f:
-                    f.write(f"{','.join(data.keys())}\n")
-            with open(saveFile, "a+") as f:
-                f.write(f"{','.join(str(data[col]) for col in data.keys())}\n")
-        if channel == "tickers":
-            if not os.path.exists(saveFile):
-                with open(saveFile, "a+") as f:
-                    f.write(f"{','.join(data.keys())}\n")
-            with open(saveFile, "a+") as f:
-                f.write(f"{','.join(str(data[col]) for col in data.keys())}\n")
+        record = decodeRecord("okx", channel, msg["data"][0])
+        if record is None:
+            return
+        if tickSink is not None:
+            tickSink.write("okx", channel, msg["arg"]["instId"], record, record.ts)
+        _saveRow(
+            "okx",
+            channel,
+            msg["arg"]["instId"],
+            record.fieldNames(),
+            record.values(),
+            record.types,
+            record.ts,
+        )
+        _saveTick("okx", channel, record)
     except Exception as e:
         logger.error(msg)
         logger.error(e)
@@ -44,94 +230,154 @@ def bitgetSingleMsgHandler(msg: str | dict):
     # logger.debug(msg)
     try:
         if isinstance(msg, str):
-            msg = json.loads(msg)
+            msg = loads(msg)
         if "event" in msg.keys():
             return
         channel = msg["arg"]["channel"]
-        data = msg["data"][0]
-        if not os.path.exists(f"data/bitget/{channel}/"):
-            os.makedirs(f"data/bitget/{channel}/")
-        saveFile = f"data/bitget/{channel}/{msg['arg']['instId']}.csv"
-        if channel == "ticker":
-            if not os.path.exists(saveFile):
-                with open(saveFile, "a+") as f:
-                    f.write(f"{','.join(data.keys())}\n")
-            with open(saveFile, "a+") as f:
-                f.write(f"{','.join(str(data[col]) for col in data.keys())}\n")
+        record = decodeRecord("bitget", channel, msg["data"][0])
+        if record is None:
+            return
+        _saveRow(
+            "bitget",
+            channel,
+            msg["arg"]["instId"],
+            record.fieldNames(),
+            record.values(),
+            record.types,
+            record.ts,
+        )
+        _saveTick("bitget", channel, record)
     except Exception as e:
         logger.error(msg)
         logger.error(e)
 
 
-bookTickerCacheDict: dict[str, list[dict]] = {}
-latestTimestamp: int = int(math.floor(time.time() * 1000))
+# 聚合后bookTicker各字段的类型，与updateBookTickerCache的输出一致
+aggregatedBookTickerTypes = (str, str, float, float, float, float, int, int)
+# binance bookTicker按symbol聚合的窗口长度(毫秒)
+bookTickerWindowMs = 100
+bookTickerAggregator = BarAggregator(("b", "B", "a", "A", "E"), bookTickerWindowMs)
 
 
-def aggregateBookTickerCache(listCache: list[dict]):
+def updateBookTickerCache(record: BinanceBookTicker):
+    """
+    加入一条bookTicker，该symbol的窗口关闭时返回聚合结果
+    买卖价为窗口内最新值，挂单量为窗口内均值，T/E为窗口内最后一条的时间
+    """
+    bar = bookTickerAggregator.update(
+        record.s, record.T, (record.b, record.B, record.a, record.A, record.E)
+    )
+    if bar is None:
+        return None
     # e,s,b,B,a,A,T,E
-    aggregatedData = {
+    return {
         "e": "bookTicker",
-        "s": listCache[-1]["s"],
-        "b": listCache[-1]["b"],
-        "B": sum(float(item["B"]) for item in listCache) / len(listCache),
-        "a": listCache[-1]["a"],
-        "A": sum(float(item["A"]) for item in listCache) / len(listCache),
-        "T": listCache[-1]["T"],
-        "E": listCache[-1]["E"],
+        "s": bar.key,
+        "b": bar.last[0],
+        "B": bar.mean[1],
+        "a": bar.last[2],
+        "A": bar.mean[3],
+        "T": bar.lastTime,
+        "E": bar.last[4],
     }
-    return aggregatedData
-
-
-def updateBookTickerCache(msg: dict):
-    global bookTickerCacheDict
-    global latestTimestamp
-    symbol = msg["s"]
-    msgTimeToSeconds = int(msg["T"]) // 100 * 100
-    if symbol not in bookTickerCacheDict:
-        bookTickerCacheDict[symbol] = []
-    if msgTimeToSeconds > latestTimestamp:
-        latestTimestamp = msgTimeToSeconds
-        if len(bookTickerCacheDict[symbol]) == 0:
-            bookTickerCacheDict[symbol].append(msg)
-            return None
-        else:
-            # Aggregate the cached data
-            aggData = aggregateBookTickerCache(bookTickerCacheDict[symbol])
-            # Clear the cache for this symbol
-            bookTickerCacheDict[symbol] = [msg]
-            return aggData
+
+
+# bybit tickers每个symbol合并后的完整数据，先推送snapshot，之后只推送变化的字段
+bybitTickerStateDict: dict[str, dict] = {}
+
+
+def updateBybitTickerState(msg: dict) -> dict | None:
+    """
+    将snapshot或delta合并到该symbol的状态中
+    :return: 合并后的完整数据，尚未收到snapshot时返回None
+    """
+    data = msg["data"]
+    symbol = data["symbol"]
+    if msg.get("type") == "snapshot":
+        state = bybitTickerStateDict[symbol] = dict(data)
     else:
-        bookTickerCacheDict[symbol].append(msg)
-        return None
+        state = bybitTickerStateDict.get(symbol)
+        if state is None:
+            # 重新订阅前的delta，等待下一个snapshot
+            return None
+        state.update(data)
+    state["ts"] = msg.get("ts")
+    return state
+
+
+def bybitSingleMsgHandler(msg: str | dict):
+    # logger.debug(msg)
+    try:
+        if isinstance(msg, str):
+            msg = loads(msg)
+        if "op" in msg.keys():
+            logger.debug(msg)
+            return
+        channel = msg["topic"].split(".")[0]
+        if channel != "tickers":
+            logger.debug(msg)
+            return
+        state = updateBybitTickerState(msg)
+        if state is None:
+            return
+        record = decodeRecord("bybit", channel, state)
+        _saveRow(
+            "bybit",
+            channel,
+            record.symbol,
+            record.fieldNames(),
+            record.values(),
+            record.types,
+            record.ts,
+        )
+        _saveTick("bybit", channel, record)
+    except Exception as e:
+        logger.error(msg)
+        logger.error(e)
 
 
 def binanceSingleMsgHandler(msg: str | dict):
     try:
         if isinstance(msg, str):
-            msg = json.loads(msg)
+            msg = loads(msg)
         if "e" not in msg.keys():
             return
         event = msg["e"]
+        record = decodeRecord("binance", event, msg)
+        if record is None:
+            logger.debug(msg)
+            return
         symbol = msg["s"]
-        if not os.path.exists(f"data/binance/{event}/"):
-            os.makedirs(f"data/binance/{event}/")
-        saveFile = f"data/binance/{event}/{symbol}.csv"
         if event == "bookTicker":
-            data = updateBookTickerCache(msg)
+            if tickSink is not None:
+                tickSink.write("binance", event, symbol, record, record.T)
+            # 报价板使用每条原始数据，保存的Tick使用聚合后的数据
+            _saveTick("binance", event, record, save=False)
+            data = updateBookTickerCache(record)
             if data is not None:
-                if not os.path.exists(saveFile):
-                    with open(saveFile, "a+") as f:
-                        f.write(f"{','.join(data.keys())}\n")
-                with open(saveFile, "a+") as f:
-                    f.write(f"{','.join(str(data[col]) for col in data.keys())}\n")
+                _saveRow(
+                    "binance",
+                    event,
+                    symbol,
+                    data.keys(),
+                    data.values(),
+                    aggregatedBookTickerTypes,
+                    data["T"],
+                )
+                _saveTick(
+                    "binance", event, BinanceBookTicker.fromDict(data), publish=False
+                )
         elif event == "markPriceUpdate":
-            if not os.path.exists(saveFile):
-                with open(saveFile, "a+") as f:
-                    f.write(f"{','.join(msg.keys())}\n")
-            with open(saveFile, "a+") as f:
-                f.write(f"{','.join(str(msg[col]) for col in msg.keys())}\n")
-        else:
-            logger.debug(msg)
+            _saveRow(
+                "binance",
+                event,
+                symbol,
+                record.fieldNames(),
+                record.values(),
+                record.types,
+                record.E,
+            )
+            _saveTick("binance", event, record)
     except Exception as e:
         logger.error(msg)
         logger.error(e)
@@ -0,0 +1,357 @@
+import json
+import os
+import sys
+import time
+from loguru import logger
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.restClient import getRestClient, runConcurrently
+from exchange.getFundingInfo import getFundingInfoCache
+
+# 统一的合约信息，symbol为各交易所通用的写法（如BTCUSDT），nativeId为交易所的合约id（如okx的BTC-USDT-SWAP）
+
+
+class Instrument:
+    __slots__ = (
+        "exchange",
+        "symbol",
+        "nativeId",
+        "indexId",
+        "baseCcy",
+        "quoteCcy",
+        "tickSize",
+        "contractSize",
+        "fundingInterval",
+    )
+
+    def __init__(
+        self,
+        exchange: str,
+        symbol: str,
+        nativeId: str,
+        indexId: str,
+        baseCcy: str,
+        quoteCcy: str,
+        tickSize: float,
+        contractSize: float = 1.0,
+        fundingInterval: float | None = None,
+    ):
+        """
+        :param indexId: 指数价格的id，okx为BTC-USDT，其他交易所与nativeId相同
+        :param tickSize: 最小价格变动
+        :param contractSize: 一张合约对应的币数量
+        :param fundingInterval: 资金费率结算间隔（小时），未知时为None
+        """
+        self.exchange = exchange
+        self.symbol = symbol
+        self.nativeId = nativeId
+        self.indexId = indexId
+        self.baseCcy = baseCcy
+        self.quoteCcy = quoteCcy
+        self.tickSize = tickSize
+        self.contractSize = contractSize
+        self.fundingInterval = fundingInterval
+
+    def toDict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def fromDict(cls, data: dict) -> "Instrument":
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def __repr__(self):
+        return f"Instrument({self.exchange} {self.symbol} {self.nativeId})"
+
+
+def _fetchOkxInstruments() -> list[Instrument]:
+    url = "https://www.okx.com/api/v5/public/instruments"
+    data = getRestClient().get(url, {"instType": "SWAP"})["data"]
+    instrumentList = []
+    for item in data:
+        # 只保留可交易的合约，预上线(preopen)与暂停(suspend)的不订阅
+        if item["settleCcy"] != "USDT" or item.get("state") != "live":
+            continue
+        # instFamily为BTC-USDT，同时是指数价格的id
+        baseCcy, quoteCcy = item["instFamily"].split("-")
+        instrumentList.append(
+            Instrument(
+                "okx",
+                baseCcy + quoteCcy,
+                item["instId"],
+                item["instFamily"],
+                baseCcy,
+                quoteCcy,
+                float(item["tickSz"]),
+                float(item["ctVal"]),
+            )
+        )
+    return instrumentList
+
+
+def _fetchBinanceInstruments() -> list[Instrument]:
+    url = "https://fapi.binance.com/fapi/v1/exchangeInfo"
+    data = getRestClient().get(url)["symbols"]
+    # 只有资金费率间隔调整过的合约在fundingInfo中，其他为8小时
+    fundingInfoCache = getFundingInfoCache("binance")
+    instrumentList = []
+    for item in data:
+        if item["contractType"] != "PERPETUAL" or item["quoteAsset"] != "USDT":
+            continue
+        # 已下架的合约仍在exchangeInfo中，状态为SETTLING或CLOSE
+        if item.get("status") != "TRADING":
+            continue
+        tickSize = next(
+            float(f["tickSize"])
+            for f in item["filters"]
+            if f["filterType"] == "PRICE_FILTER"
+        )
+        fundingInfo = fundingInfoCache.get(item["symbol"])
+        instrumentList.append(
+            Instrument(
+                "binance",
+                item["symbol"],
+                item["symbol"],
+                item["symbol"],
+                item["baseAsset"],
+                item["quoteAsset"],
+                tickSize,
+                1.0,
+                fundingInfo["fundingIntervalHours"] if fundingInfo else 8,
+            )
+        )
+    return instrumentList
+
+
+def _fetchBitgetInstruments() -> list[Instrument]:
+    url = "https://api.bitget.com/api/v2/mix/market/contracts"
+    data = getRestClient().get(url, {"productType": "usdt-futures"})["data"]
+    instrumentList = []
+    for item in data:
+        if item.get("symbolStatus") != "normal":
+            continue
+        fundInterval = item.get("fundInterval")
+        instrumentList.append(
+            Instrument(
+                "bitget",
+                item["symbol"],
+                item["symbol"],
+                item["symbol"],
+                item["baseCoin"],
+                item["quoteCoin"],
+                int(item["priceEndStep"]) * 10 ** -int(item["pricePlace"]),
+                1.0,
+                float(fundInterval) if fundInterval else None,
+            )
+        )
+    return instrumentList
+
+
+def _fetchBybitInstruments() -> list[Instrument]:
+    # bybit的合约信息与资金费率信息来自同一接口，获取时同时更新资金费率缓存
+    fundingInfoCache = getFundingInfoCache("bybit")
+    if not fundingInfoCache.refresh():
+        raise ValueError("failed to fetch bybit instruments")
+    data = fundingInfoCache.all()
+    instrumentList = []
+    for item in data:
+        if item["contractType"] != "LinearPerpetual" or item["quoteCoin"] != "USDT":
+            continue
+        if item.get("status") != "Trading":
+            continue
+        instrumentList.append(
+            Instrument(
+                "bybit",
+                item["symbol"],
+                item["symbol"],
+                item["symbol"],
+                item["baseCoin"],
+                item["quoteCoin"],
+                float(item["priceFilter"]["tickSize"]),
+                1.0,
+                # fundingInterval单位为分钟
+                item["fundingInterval"] / 60 if item.get("fundingInterval") else None,
+            )
+        )
+    return instrumentList
+
+
+_fetchFuncDict = {
+    "okx": _fetchOkxInstruments,
+    "binance": _fetchBinanceInstruments,
+    "bitget": _fetchBitgetInstruments,
+    "bybit": _fetchBybitInstruments,
+}
+
+
+def fetchInstruments(exchange: str) -> list[Instrument]:
+    """从交易所获取最新的合约信息，失败时抛出异常"""
+    return _fetchFuncDict[exchange]()
+
+
+def _defaultNativeId(exchange: str, symbol: str) -> str:
+    """目录中没有的symbol（如已下架）按命名规则转换"""
+    if exchange == "okx":
+        return f"{symbol.removesuffix('USDT')}-USDT-SWAP"
+    return symbol
+
+
+class InstrumentCatalog:
+    def __init__(self, instruments=(), timestamp: float = 0.0):
+        """
+        各交易所的合约信息，按(交易所, symbol)与(交易所, nativeId)双向索引
+        :param instruments: Instrument列表
+        :param timestamp: 获取的时间
+        """
+        self.timestamp = timestamp
+        self.instrumentDict: dict[tuple[str, str], Instrument] = {}
+        self.nativeDict: dict[tuple[str, str], Instrument] = {}
+        for instrument in instruments:
+            self.add(instrument)
+
+    def add(self, instrument: Instrument):
+        self.instrumentDict[(instrument.exchange, instrument.symbol)] = instrument
+        self.nativeDict[(instrument.exchange, instrument.nativeId)] = instrument
+
+    def __len__(self):
+        return len(self.instrumentDict)
+
+    def __contains__(self, key: tuple[str, str]):
+        return key in self.instrumentDict
+
+    def get(self, exchange: str, symbol: str) -> Instrument | None:
+        return self.instrumentDict.get((exchange, symbol))
+
+    def fromNative(self, exchange: str, nativeId: str) -> Instrument | None:
+        return self.nativeDict.get((exchange, nativeId))
+
+    def toNative(self, exchange: str, symbol: str) -> str:
+        instrument = self.instrumentDict.get((exchange, symbol))
+        if instrument is None:
+            return _defaultNativeId(exchange, symbol)
+        return instrument.nativeId
+
+    def toIndexId(self, exchange: str, symbol: str) -> str:
+        instrument = self.instrumentDict.get((exchange, symbol))
+        if instrument is None:
+            return _defaultNativeId(exchange, symbol).removesuffix("-SWAP")
+        return instrument.indexId
+
+    def toSymbol(self, exchange: str, nativeId: str) -> str:
+        instrument = self.nativeDict.get((exchange, nativeId))
+        if instrument is None:
+            return nativeId.removesuffix("-SWAP").replace("-", "")
+        return instrument.symbol
+
+    def instruments(self, exchange: str | None = None) -> list[Instrument]:
+        return [
+            instrument
+            for instrument in self.instrumentDict.values()
+            if exchange is None or instrument.exchange == exchange
+        ]
+
+    def symbols(self, exchange: str) -> list[str]:
+        return [instrument.symbol for instrument in self.instruments(exchange)]
+
+    def commonSymbols(self, *exchanges: str) -> list[str]:
+        """在所有指定交易所都有合约的symbol"""
+        symbolSet = None
+        for exchange in exchanges:
+            exchangeSymbolSet = set(self.symbols(exchange))
+            symbolSet = (
+                exchangeSymbolSet
+                if symbolSet is None
+                else symbolSet & exchangeSymbolSet
+            )
+        return sorted(symbolSet or ())
+
+    def save(self, path: str):
+        """先写入临时文件再替换"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmpPath = f"{path}.{os.getpid()}.tmp"
+        with open(tmpPath, "w") as f:
+            json.dump(
+                {
+                    "timestamp": self.timestamp,
+                    "data": [instrument.toDict() for instrument in self.instruments()],
+                },
+                f,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, path)
+
+    @classmethod
+    def load(cls, path: str) -> "InstrumentCatalog":
+        with open(path, "r") as f:
+            catalog = json.load(f)
+        return cls(
+            (Instrument.fromDict(item) for item in catalog["data"]),
+            catalog["timestamp"],
+        )
+
+    @classmethod
+    def build(
+        cls, exchanges: tuple[str, ...] = ("okx", "binance", "bitget", "bybit")
+    ) -> "InstrumentCatalog":
+        """并发从各交易所获取，获取失败的交易所没有合约信息"""
+
+        def fetch(exchange):
+            try:
+                return _fetchFuncDict[exchange]()
+            except Exception as e:
+                logger.error(f"Error fetching {exchange} instruments: {e}")
+                return []
+
+        resultList = runConcurrently(
+            *(lambda exchange=exchange: fetch(exchange) for exchange in exchanges)
+        )
+        return cls(
+            (instrument for result in resultList for instrument in result), time.time()
+        )
+
+
+instrumentCatalogPath = "data/instruments.json"
+_catalog: InstrumentCatalog | None = None
+
+
+def getInstrumentCatalog(
+    path: str | None = None, ttl: float = 86400, refresh: bool = False
+) -> InstrumentCatalog:
+    """
+    进程内共用的合约目录，优先从文件加载，文件不存在或过期时从交易所获取并保存
+    获取失败时使用过期的文件
+    """
+    global _catalog
+    if _catalog is not None and not refresh:
+        return _catalog
+    path = instrumentCatalogPath if path is None else path
+    cached = None
+    if os.path.exists(path):
+        try:
+            cached = InstrumentCatalog.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Error loading instrument catalog {path}: {e}")
+    if cached is not None and not refresh and time.time() - cached.timestamp < ttl:
+        _catalog = cached
+        return _catalog
+    catalog = InstrumentCatalog.build()
+    if cached is not None:
+        # 获取失败的交易所沿用过期的合约信息
+        fetchedSet = {instrument.exchange for instrument in catalog.instruments()}
+        for instrument in cached.instruments():
+            if instrument.exchange not in fetchedSet:
+                catalog.add(instrument)
+        if not fetchedSet:
+            logger.warning("Failed to fetch instruments, using outdated catalog.")
+            catalog.timestamp = cached.timestamp
+    if len(catalog):
+        catalog.save(path)
+    _catalog = catalog
+    return _catalog
+
+
+if __name__ == "__main__":
+    catalog = getInstrumentCatalog(refresh=True)
+    for exchange in _fetchFuncDict:
+        print(exchange, len(catalog.symbols(exchange)))
+    print(catalog.get("okx", "TUSDT"), catalog.toNative("okx", "TUSDT"))
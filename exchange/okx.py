@@ -1,14 +1,24 @@
-import asyncio
 import sys
 import os
-import requests
+import time
+from loguru import logger
 
 sys.path.append(os.path.dirname(__file__) + "/..")
 from lib.baseWebsocket import ExchangeWebsocket
+from lib.orderBook import OrderBook
+from lib.restClient import getRestClient
+from lib.sequenceTracker import SNAPSHOT
 from exchange.okxLogin import getLoginParams
 
 
 class Okx(ExchangeWebsocket):
+    exchangeName = "okx"
+    requestOpField = "op"
+    requestArgsField = "args"
+    maxArgsPerRequest = 100
+    # 订单簿channel，books5与bbo-tbt每次推送全量，其他先推送快照再推送增量
+    bookChannels = ("books", "books5", "bbo-tbt", "books-l2-tbt", "books50-l2-tbt")
+
     def __init__(
         self,
         url: str,
@@ -23,28 +33,108 @@ class Okx(ExchangeWebsocket):
         self.apikey = apikey
         self.secret = secret
         self.passphrase = passphrase
+        self.orderBookDict: dict[tuple[str, str], OrderBook] = {}  # (channel, instId)
 
     async def login(self, *args, **kwargs):
         loginParams = getLoginParams("login", self.apikey, self.secret, self.passphrase)
         await self.ws.send(loginParams)
 
-    async def subscribe(self, args: list[dict]):
-        op = "subscribe"
-        params = {"op": op, "args": args}
-        await self.addRequest(params)
+    def _getRecvTopic(self, recvMsg):
+        if isinstance(recvMsg, dict) and "data" in recvMsg:
+            return self._getArgKey(recvMsg["arg"])
+        return None
+
+    def _getRecvChannel(self, recvMsg):
+        if isinstance(recvMsg, dict) and "data" in recvMsg:
+            return recvMsg["arg"]["channel"]
+        return None
+
+    def _getEventTime(self, recvMsg):
+        return recvMsg["data"][0].get("ts")
+
+    def _getUpdateId(self, recvMsg):
+        if not isinstance(recvMsg, dict) or "data" not in recvMsg:
+            return None
+        data = recvMsg["data"][0]
+        return int(data["seqId"] if "seqId" in data else data["ts"])
+
+    def _getSequence(self, recvMsg):
+        if not isinstance(recvMsg, dict) or "data" not in recvMsg:
+            return None
+        data = recvMsg["data"][0]
+        action = recvMsg.get("action")
+        if action is not None and "seqId" in data:
+            # 增量订单簿用prevSeqId衔接上一条的seqId
+            if action == "snapshot":
+                return data["seqId"], SNAPSHOT
+            return data["seqId"], data.get("prevSeqId")
+        if "seqId" in data:
+            return data["seqId"], None
+        # 其他channel只有时间戳，只能发现乱序
+        return (int(data["ts"]), None) if "ts" in data else None
+
+    def getOrderBook(self, instId: str, channel: str = "books") -> OrderBook | None:
+        """获取已同步的订单簿，未同步时返回None"""
+        book = self.orderBookDict.get((channel, instId))
+        if book is None or not book.synced:
+            return None
+        return book
+
+    async def _updateOrderBook(self, recvMsg):
+        if not isinstance(recvMsg, dict) or "data" not in recvMsg:
+            return
+        arg = recvMsg["arg"]
+        channel = arg["channel"]
+        if channel not in self.bookChannels:
+            return
+        key = (channel, arg["instId"])
+        book = self.orderBookDict.get(key)
+        if book is None:
+            book = self.orderBookDict[key] = OrderBook(arg["instId"])
+        isUpdate = recvMsg.get("action") == "update"
+        for data in recvMsg["data"]:
+            seqId = data.get("seqId")
+            timestamp = int(data["ts"])
+            if isUpdate:
+                if not book.synced:
+                    # 等待重新订阅后的快照
+                    return
+                prevSeqId = data.get("prevSeqId")
+                if prevSeqId is not None and prevSeqId != book.updateId:
+                    await self._resyncOrderBook(
+                        arg,
+                        book,
+                        f"seqId不连续 prevSeqId={prevSeqId} seqId={book.updateId}",
+                    )
+                    return
+                book.applyDelta(data["bids"], data["asks"], seqId, timestamp)
+            else:
+                book.applySnapshot(data["bids"], data["asks"], seqId, timestamp)
+                book.synced = True
+            checksum = data.get("checksum")
+            if checksum is not None and book.checksum() != checksum:
+                await self._resyncOrderBook(arg, book, "checksum不一致")
+                return
+
+    async def _resyncOrderBook(self, arg: dict, book: OrderBook, reason: str):
+        """清空订单簿并重新订阅，交易所会重新推送快照"""
+        logger.warning(f"{book.symbol} {arg['channel']} 订单簿{reason}，重新订阅")
+        book.clear()
+        topic = self._getArgKey(arg)
+        if topic in self.subscriptionDict:
+            await self._resubscribe([topic], time.time())
 
 
 def getAllOkxSymbols() -> list[str]:
     api_url = "https://www.okx.com/api/v5/public/instruments?instType=SWAP"
-    response = requests.get(api_url)
-    if response.status_code == 200:
-        data = response.json()
+    try:
+        data = getRestClient().get(api_url)
         symbols = [
             item["instId"] for item in data["data"] if item["settleCcy"] == "USDT"
         ]
         return symbols
-    else:
-        print(f"Error fetching symbols: {response.status_code}")
+    except Exception as e:
+        logger.error(f"Error fetching OKX symbols: {e}")
         return []
 
 
@@ -0,0 +1,313 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.decoder import Record, registerRecord, registerNormalizer
+
+# 各交易所已知channel的字段与类型，字段顺序即保存时的列顺序
+
+
+@registerRecord("binance", "bookTicker")
+class BinanceBookTicker(Record):
+    __slots__ = ("e", "u", "s", "b", "B", "a", "A", "T", "E")
+    types = (str, int, str, float, float, float, float, int, int)
+
+
+@registerRecord("binance", "markPriceUpdate")
+class BinanceMarkPrice(Record):
+    __slots__ = ("e", "E", "s", "p", "i", "P", "r", "T")
+    types = (str, int, str, float, float, float, float, int)
+
+
+@registerRecord("okx", "tickers")
+class OkxTicker(Record):
+    __slots__ = (
+        "instType",
+        "instId",
+        "last",
+        "lastSz",
+        "askPx",
+        "askSz",
+        "bidPx",
+        "bidSz",
+        "open24h",
+        "high24h",
+        "low24h",
+        "volCcy24h",
+        "vol24h",
+        "sodUtc0",
+        "sodUtc8",
+        "ts",
+    )
+    types = (str, str) + (float,) * 13 + (int,)
+
+
+@registerRecord("okx", "funding-rate")
+class OkxFundingRate(Record):
+    __slots__ = (
+        "instType",
+        "instId",
+        "method",
+        "formulaType",
+        "fundingRate",
+        "nextFundingRate",
+        "fundingTime",
+        "nextFundingTime",
+        "minFundingRate",
+        "maxFundingRate",
+        "interestRate",
+        "impactValue",
+        "premium",
+        "settState",
+        "settFundingRate",
+        "ts",
+    )
+    types = (
+        str,
+        str,
+        str,
+        str,
+        float,
+        float,
+        int,
+        int,
+        float,
+        float,
+        float,
+        float,
+        float,
+        str,
+        float,
+        int,
+    )
+
+
+@registerRecord("okx", "index-tickers")
+class OkxIndexTicker(Record):
+    __slots__ = (
+        "instId",
+        "idxPx",
+        "high24h",
+        "low24h",
+        "open24h",
+        "sodUtc0",
+        "sodUtc8",
+        "ts",
+    )
+    types = (str,) + (float,) * 6 + (int,)
+
+
+@registerRecord("bitget", "ticker")
+class BitgetTicker(Record):
+    __slots__ = (
+        "instId",
+        "lastPr",
+        "bidPr",
+        "askPr",
+        "bidSz",
+        "askSz",
+        "open24h",
+        "high24h",
+        "low24h",
+        "change24h",
+        "fundingRate",
+        "nextFundingTime",
+        "markPrice",
+        "indexPrice",
+        "holdingAmount",
+        "baseVolume",
+        "quoteVolume",
+        "openUtc",
+        "symbolType",
+        "symbol",
+        "deliveryPrice",
+        "ts",
+    )
+    types = (str,) + (float,) * 10 + (int,) + (float,) * 6 + (str, str, float, int)
+
+
+@registerRecord("bybit", "tickers")
+class BybitTicker(Record):
+    __slots__ = (
+        "symbol",
+        "tickDirection",
+        "price24hPcnt",
+        "lastPrice",
+        "prevPrice24h",
+        "highPrice24h",
+        "lowPrice24h",
+        "prevPrice1h",
+        "markPrice",
+        "indexPrice",
+        "openInterest",
+        "openInterestValue",
+        "turnover24h",
+        "volume24h",
+        "nextFundingTime",
+        "fundingRate",
+        "bid1Price",
+        "bid1Size",
+        "ask1Price",
+        "ask1Size",
+        "ts",
+    )
+    # ts不在推送的data中，为合并后写入的推送时间
+    types = (str, str) + (float,) * 12 + (int,) + (float,) * 5 + (int,)
+
+
+class Tick(Record):
+    """
+    各交易所统一的行情，包含买一卖一、最新价、标记价格、指数价格与资金费率
+    symbol统一为BTCUSDT形式，推送中没有的字段为None
+    """
+
+    __slots__ = (
+        "exchange",
+        "symbol",
+        "timestamp",
+        "bidPx",
+        "bidSz",
+        "askPx",
+        "askSz",
+        "lastPx",
+        "markPrice",
+        "indexPrice",
+        "fundingRate",
+        "nextFundingTime",
+        "minFundingRate",
+        "maxFundingRate",
+    )
+    types = (str, str, int) + (float,) * 8 + (int, float, float)
+
+    def __init__(
+        self,
+        exchange: str,
+        symbol: str,
+        timestamp: int,
+        bidPx: float = None,
+        bidSz: float = None,
+        askPx: float = None,
+        askSz: float = None,
+        lastPx: float = None,
+        markPrice: float = None,
+        indexPrice: float = None,
+        fundingRate: float = None,
+        nextFundingTime: int = None,
+        minFundingRate: float = None,
+        maxFundingRate: float = None,
+    ):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.timestamp = timestamp
+        self.bidPx = bidPx
+        self.bidSz = bidSz
+        self.askPx = askPx
+        self.askSz = askSz
+        self.lastPx = lastPx
+        self.markPrice = markPrice
+        self.indexPrice = indexPrice
+        self.fundingRate = fundingRate
+        self.nextFundingTime = nextFundingTime
+        self.minFundingRate = minFundingRate
+        self.maxFundingRate = maxFundingRate
+
+
+def okxSymbol(instId: str) -> str:
+    """BTC-USDT-SWAP或BTC-USDT转换为BTCUSDT"""
+    return instId.removesuffix("-SWAP").replace("-", "")
+
+
+@registerNormalizer("binance", "bookTicker")
+def _binanceBookTickerToTick(record: BinanceBookTicker, timestamp=None) -> Tick:
+    return Tick(
+        "binance",
+        record.s,
+        record.T,
+        bidPx=record.b,
+        bidSz=record.B,
+        askPx=record.a,
+        askSz=record.A,
+    )
+
+
+@registerNormalizer("binance", "markPriceUpdate")
+def _binanceMarkPriceToTick(record: BinanceMarkPrice, timestamp=None) -> Tick:
+    return Tick(
+        "binance",
+        record.s,
+        record.E,
+        markPrice=record.p,
+        indexPrice=record.i,
+        fundingRate=record.r,
+        nextFundingTime=record.T,
+    )
+
+
+@registerNormalizer("okx", "tickers")
+def _okxTickerToTick(record: OkxTicker, timestamp=None) -> Tick:
+    return Tick(
+        "okx",
+        okxSymbol(record.instId),
+        record.ts,
+        bidPx=record.bidPx,
+        bidSz=record.bidSz,
+        askPx=record.askPx,
+        askSz=record.askSz,
+        lastPx=record.last,
+    )
+
+
+@registerNormalizer("okx", "funding-rate")
+def _okxFundingRateToTick(record: OkxFundingRate, timestamp=None) -> Tick:
+    # okx的fundingTime为下一次收取资金费的时间，与其他交易所的nextFundingTime含义一致
+    return Tick(
+        "okx",
+        okxSymbol(record.instId),
+        record.ts,
+        fundingRate=record.fundingRate,
+        nextFundingTime=record.fundingTime,
+        minFundingRate=record.minFundingRate,
+        maxFundingRate=record.maxFundingRate,
+    )
+
+
+@registerNormalizer("okx", "index-tickers")
+def _okxIndexTickerToTick(record: OkxIndexTicker, timestamp=None) -> Tick:
+    return Tick("okx", okxSymbol(record.instId), record.ts, indexPrice=record.idxPx)
+
+
+@registerNormalizer("bitget", "ticker")
+def _bitgetTickerToTick(record: BitgetTicker, timestamp=None) -> Tick:
+    return Tick(
+        "bitget",
+        record.instId,
+        record.ts,
+        bidPx=record.bidPr,
+        bidSz=record.bidSz,
+        askPx=record.askPr,
+        askSz=record.askSz,
+        lastPx=record.lastPr,
+        markPrice=record.markPrice,
+        indexPrice=record.indexPrice,
+        fundingRate=record.fundingRate,
+        nextFundingTime=record.nextFundingTime,
+    )
+
+
+@registerNormalizer("bybit", "tickers")
+def _bybitTickerToTick(record: BybitTicker, timestamp=None) -> Tick:
+    # bybit的tickers数据中没有时间戳，使用推送的ts
+    return Tick(
+        "bybit",
+        record.symbol,
+        record.ts if record.ts is not None else timestamp,
+        bidPx=record.bid1Price,
+        bidSz=record.bid1Size,
+        askPx=record.ask1Price,
+        askSz=record.ask1Size,
+        lastPx=record.lastPrice,
+        markPrice=record.markPrice,
+        indexPrice=record.indexPrice,
+        fundingRate=record.fundingRate,
+        nextFundingTime=record.nextFundingTime,
+    )
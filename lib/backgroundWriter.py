@@ -0,0 +1,259 @@
+import os
+import sys
+import queue
+import threading
+import time
+from loguru import logger
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.fileCache import FileHandleCache, formatRow
+from lib.latency import LatencyHistogram, LatencyTable
+
+_STOP = object()
+
+
+class BackgroundWriter(threading.Thread):
+    def __init__(
+        self,
+        maxBatchRows: int = 5000,
+        flushInterval: float = 1,
+        fsync: bool = False,
+        maxOpenFiles: int = 512,
+        statsInterval: float = 60,
+    ):
+        """
+        后台写文件线程，事件循环只把行放入队列，由本线程按文件合并后批量写入
+        :param maxBatchRows: 缓存的行数达到该值时写入
+        :param flushInterval: 距上次写入超过该时间(秒)时写入
+        :param fsync: 每次写入后是否fsync
+        :param maxOpenFiles: 最多同时打开的文件数量
+        :param statsInterval: 输出队列深度与写入耗时的间隔(秒)，0为不输出
+        """
+        super().__init__(name="backgroundWriter", daemon=True)
+        self.maxBatchRows = maxBatchRows
+        self.flushInterval = flushInterval
+        self.fsync = fsync
+        self.statsInterval = statsInterval
+        # 元素为(path, header, text或values, 延迟统计的key, 接收时间戳)
+        self.queue = queue.SimpleQueue()
+        self.fileCache = FileHandleCache(maxOpenFiles=maxOpenFiles, buffering=-1)
+        self.pendingDict: dict[str, list] = {}  # path -> [header, 行文本列表]
+        self.pendingRows = 0
+        self.pendingRecvList: list[tuple] = []  # 缓存的行的(延迟统计的key, 接收时间戳)
+        self.lastFlushTime = time.time()
+        self.lastStatsTime = time.time()
+        self.closed = False
+        # 统计，只在本线程中修改
+        self.flushLatency = LatencyHistogram()
+        self.rowCount = 0
+        self.flushCount = 0
+        self.maxQueueDepth = 0
+        self.persistLatency = LatencyTable()  # 接收->写入文件的延迟
+
+    def write(self, path: str, text: str, header=None):
+        """追加文本，可在任意线程调用"""
+        self.queue.put((path, header, text, None, None))
+
+    def writeRow(
+        self, path: str, values, header=None, latencyKey=None, recvTimestamp=None
+    ):
+        """
+        追加一行csv，格式化在写线程中进行
+        :param latencyKey: (交易所, channel, 连接名称)，与recvTimestamp同时指定时统计接收->写入文件的延迟
+        :param recvTimestamp: 行情的接收时间戳（秒）
+        """
+        self.queue.put((path, header, values, latencyKey, recvTimestamp))
+
+    def sync(self, timeout: float = None) -> bool:
+        """
+        等待此前放入的行全部写入并fsync
+        :return: 是否在超时前完成
+        """
+        doneEvent = threading.Event()
+        self.queue.put(doneEvent)
+        return doneEvent.wait(timeout)
+
+    def close(self, timeout: float = None):
+        """写入剩余的行并关闭所有文件"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.is_alive():
+            self.queue.put(_STOP)
+            self.join(timeout)
+        else:
+            self._drain()
+            self._flush()
+            self.fileCache.close()
+
+    def discard(self):
+        """
+        丢弃队列与缓存的行并关闭，不写入文件
+        用于fork出的子进程，子进程中没有写线程，继承的行由父进程写入
+        """
+        self.closed = True
+        self.queue = queue.SimpleQueue()
+        self.pendingDict = {}
+        self.pendingRows = 0
+        self.pendingRecvList = []
+        self.fileCache.discard()
+
+    def run(self):
+        while True:
+            timeout = max(0, self.lastFlushTime + self.flushInterval - time.time())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._drain()
+                self._flush()
+                self.fileCache.close()
+                return
+            if isinstance(item, threading.Event):
+                self._flush(fsync=True)
+                item.set()
+            elif item is not None:
+                self._add(item)
+                stop = self._drain()
+                if stop:
+                    self._flush()
+                    self.fileCache.close()
+                    return
+            if (
+                self.pendingRows >= self.maxBatchRows
+                or time.time() - self.lastFlushTime >= self.flushInterval
+            ):
+                self._flush()
+            if (
+                self.statsInterval
+                and time.time() - self.lastStatsTime >= self.statsInterval
+            ):
+                self._dumpStats()
+
+    def _add(self, item):
+        path, header, data, latencyKey, recvTimestamp = item
+        if latencyKey is not None and recvTimestamp is not None:
+            self.pendingRecvList.append((latencyKey, recvTimestamp))
+        pending = self.pendingDict.get(path)
+        if pending is None:
+            pending = self.pendingDict[path] = [header, []]
+        pending[1].append(data if isinstance(data, str) else formatRow(data))
+        self.pendingRows += 1
+
+    def _drain(self) -> bool:
+        """
+        取出队列中已有的行，直到达到批量大小
+        :return: 是否取到了停止标记
+        """
+        depth = self.queue.qsize()
+        if depth > self.maxQueueDepth:
+            self.maxQueueDepth = depth
+        while self.pendingRows < self.maxBatchRows:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return False
+            if item is _STOP:
+                return True
+            if isinstance(item, threading.Event):
+                self._flush(fsync=True)
+                item.set()
+            else:
+                self._add(item)
+        return False
+
+    def _flush(self, fsync: bool = False):
+        start = time.perf_counter()
+        pendingDict, self.pendingDict = self.pendingDict, {}
+        rows, self.pendingRows = self.pendingRows, 0
+        recvList, self.pendingRecvList = self.pendingRecvList, []
+        for path, (header, lines) in pendingDict.items():
+            try:
+                self.fileCache.write(path, "".join(lines), header)
+            except Exception as e:
+                logger.error(f"backgroundWriter write {path} failed: {e}")
+        self.fileCache.flush()
+        if fsync or self.fsync:
+            for f in self.fileCache.handleDict.values():
+                os.fsync(f.fileno())
+        self.lastFlushTime = time.time()
+        for latencyKey, recvTimestamp in recvList:
+            self.persistLatency.record(
+                latencyKey, int((self.lastFlushTime - recvTimestamp) * 1e6)
+            )
+        if rows:
+            self.rowCount += rows
+            self.flushCount += 1
+            self.flushLatency.record(int((time.perf_counter() - start) * 1e6))
+
+    def stats(self) -> dict:
+        """获取队列深度与写入耗时(ms)统计"""
+        return {
+            "queueDepth": self.queue.qsize(),
+            "maxQueueDepth": self.maxQueueDepth,
+            "pendingRows": self.pendingRows,
+            "rows": self.rowCount,
+            "flushes": self.flushCount,
+            "flushLatency": self.flushLatency.snapshot(),
+        }
+
+    def _dumpStats(self):
+        """输出队列深度与写入耗时并清空统计"""
+        stats = self.stats()
+        latency = stats["flushLatency"]
+        logger.info(
+            "backgroundWriter queueDepth={} maxQueueDepth={} rows={} flushes={} "
+            "flush p50={:.3f}ms p99={:.3f}ms max={:.3f}ms".format(
+                stats["queueDepth"],
+                stats["maxQueueDepth"],
+                stats["rows"],
+                stats["flushes"],
+                latency["p50"],
+                latency["p99"],
+                latency["max"],
+            )
+        )
+        self.flushLatency.reset()
+        self.persistLatency.dump()
+        self.maxQueueDepth = 0
+        self.rowCount = 0
+        self.flushCount = 0
+        self.lastStatsTime = time.time()
+
+
+class CsvSink:
+    def __init__(self, writer: BackgroundWriter, rootDir: str = "data"):
+        """
+        按交易所/channel/symbol保存为csv文件：{rootDir}/{exchange}/{channel}/{symbol}.csv
+        :param writer: 后台写线程
+        :param rootDir: 根目录
+        """
+        self.writer = writer
+        self.rootDir = rootDir
+
+    def writeRow(
+        self,
+        exchange: str,
+        channel: str,
+        symbol: str,
+        header,
+        values,
+        types=None,
+        timestamp=None,
+        recv=None,
+    ):
+        """
+        追加一行，types与timestamp只为与ParquetSink保持一致，csv不使用
+        :param recv: (连接名称, 接收时间戳)，用于统计接收->写入文件的延迟
+        """
+        self.writer.writeRow(
+            f"{self.rootDir}/{exchange}/{channel}/{symbol}.csv",
+            values,
+            header,
+            None if recv is None else (exchange, channel, recv[0]),
+            None if recv is None else recv[1],
+        )
+
+    def close(self, timeout: float = None):
+        self.writer.close(timeout)
@@ -0,0 +1,195 @@
+class Bar:
+    """一个时间窗口的聚合结果，各统计量按字段顺序保存"""
+
+    __slots__ = (
+        "key",
+        "fields",
+        "windowStart",
+        "windowEnd",
+        "count",
+        "firstTime",
+        "lastTime",
+        "last",
+        "mean",
+        "min",
+        "max",
+        "sum",
+        "twa",
+    )
+
+    stats = ("last", "mean", "min", "max", "sum", "twa")
+
+    def get(self, field: str, stat: str = "last"):
+        """获取字段的统计量，stat为last/mean/min/max/sum/twa"""
+        return getattr(self, stat)[self.fields.index(field)]
+
+    def toDict(self) -> dict:
+        """展开为{字段}_{统计量}的字典"""
+        data = {
+            "key": self.key,
+            "windowStart": self.windowStart,
+            "windowEnd": self.windowEnd,
+            "count": self.count,
+            "firstTime": self.firstTime,
+            "lastTime": self.lastTime,
+        }
+        for stat in self.stats:
+            for field, value in zip(self.fields, getattr(self, stat)):
+                data[f"{field}_{stat}"] = value
+        return data
+
+    def __repr__(self):
+        return f"Bar({self.toDict()})"
+
+
+class _BarState:
+    """单个key当前窗口的累加量，大小只与字段数量有关"""
+
+    __slots__ = (
+        "windowStart",
+        "count",
+        "firstTime",
+        "lastTime",
+        "twStart",
+        "twTime",
+        "last",
+        "fieldCount",
+        "sum",
+        "min",
+        "max",
+        "twSum",
+    )
+
+    def __init__(self, fieldCount: int):
+        self.last = [None] * fieldCount
+        self.twTime = None
+        self.reset(0)
+
+    def reset(self, windowStart: int):
+        """开始新窗口，上一窗口的最新值保留用于时间加权"""
+        fieldCount = len(self.last)
+        self.windowStart = windowStart
+        self.count = 0
+        self.firstTime = None
+        self.lastTime = None
+        self.fieldCount = [0] * fieldCount
+        self.sum = [0.0] * fieldCount
+        self.min = [None] * fieldCount
+        self.max = [None] * fieldCount
+        self.twSum = [0.0] * fieldCount
+        if self.twTime is not None:
+            # 上一窗口的值一直持续到本窗口开始
+            self.twTime = windowStart
+        self.twStart = self.twTime
+
+
+class BarAggregator:
+    def __init__(self, fields: tuple[str, ...], windowMs: int = 100):
+        """
+        按key(一般为symbol)独立的事件时间窗口流式聚合，每个key只保存当前窗口的累加量
+        每个字段统计last/mean/min/max/sum与时间加权平均twa
+        某个key收到下一窗口的数据时关闭该key的当前窗口，不影响其他key
+        :param fields: 需要聚合的字段名，update时values按此顺序
+        :param windowMs: 窗口长度(毫秒)，如100、1000、60000
+        """
+        self.fields = tuple(fields)
+        self.windowMs = windowMs
+        self.stateDict: dict[str, _BarState] = {}
+
+    def update(self, key: str, timestamp: int, values) -> Bar | None:
+        """
+        加入一条数据
+        :param key: 聚合的key
+        :param timestamp: 事件时间(毫秒)
+        :param values: 字段值，与fields一一对应，None表示该字段缺失
+        :return: 因本条数据关闭的窗口，没有时返回None
+        """
+        windowStart = timestamp - timestamp % self.windowMs
+        state = self.stateDict.get(key)
+        bar = None
+        if state is None:
+            state = self.stateDict[key] = _BarState(len(self.fields))
+            state.reset(windowStart)
+        elif windowStart > state.windowStart:
+            if state.count:
+                bar = self._close(key, state)
+            state.reset(windowStart)
+        earliest = state.windowStart if state.lastTime is None else state.lastTime
+        if timestamp < earliest:
+            # 乱序或属于已关闭窗口的数据按当前窗口的最新时间计入
+            timestamp = earliest
+        if state.twTime is not None:
+            elapsed = timestamp - state.twTime
+            for index, last in enumerate(state.last):
+                if last is not None:
+                    state.twSum[index] += last * elapsed
+        else:
+            state.twStart = timestamp
+        state.twTime = timestamp
+        for index, value in enumerate(values):
+            if value is None:
+                continue
+            state.last[index] = value
+            state.fieldCount[index] += 1
+            state.sum[index] += value
+            if state.min[index] is None or value < state.min[index]:
+                state.min[index] = value
+            if state.max[index] is None or value > state.max[index]:
+                state.max[index] = value
+        if state.count == 0:
+            state.firstTime = timestamp
+        state.count += 1
+        state.lastTime = timestamp
+        return bar
+
+    def _close(self, key: str, state: _BarState) -> Bar:
+        windowEnd = state.windowStart + self.windowMs
+        elapsed = windowEnd - state.twTime
+        duration = windowEnd - state.twStart
+        bar = Bar()
+        bar.key = key
+        bar.fields = self.fields
+        bar.windowStart = state.windowStart
+        bar.windowEnd = windowEnd
+        bar.count = state.count
+        bar.firstTime = state.firstTime
+        bar.lastTime = state.lastTime
+        bar.last = list(state.last)
+        bar.mean = [
+            total / count if count else None
+            for total, count in zip(state.sum, state.fieldCount)
+        ]
+        bar.min = state.min
+        bar.max = state.max
+        bar.sum = state.sum
+        bar.twa = [
+            (
+                (twSum + last * elapsed) / duration
+                if last is not None and duration > 0
+                else last
+            )
+            for twSum, last in zip(state.twSum, state.last)
+        ]
+        state.twTime = windowEnd
+        return bar
+
+    def flushBefore(self, timestamp: int) -> list[Bar]:
+        """
+        关闭结束时间不晚于timestamp的窗口，用于长时间没有新数据的key
+        :return: 关闭的窗口
+        """
+        barList = []
+        for key, state in self.stateDict.items():
+            if state.count and state.windowStart + self.windowMs <= timestamp:
+                barList.append(self._close(key, state))
+                state.reset(timestamp - timestamp % self.windowMs)
+        return barList
+
+    def flush(self) -> list[Bar]:
+        """关闭所有未关闭的窗口"""
+        barList = []
+        for key, state in self.stateDict.items():
+            if state.count:
+                barList.append(self._close(key, state))
+                state.reset(state.windowStart + self.windowMs)
+        return barList
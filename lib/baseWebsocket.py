@@ -1,15 +1,41 @@
 import asyncio
 import json
+import os
+import sys
+import time
+import itertools
+from collections import deque
 import websockets
+from websockets.exceptions import ConnectionClosed
 from websockets.protocol import State
 from loguru import logger
 
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.reconnect import Backoff, getConnectLimiter
+from lib.watchdog import TopicStat
+from lib.latency import LatencyHistogram, currentRecv
+from lib.decoder import loads
+from lib.ringBuffer import RingBuffer
+from lib.sequenceTracker import GAP, OUTAGE, SequenceTracker
+
 # class State(enum.IntEnum):
 #     """A WebSocket connection is in one of these four states."""
 #     CONNECTING, OPEN, CLOSING, CLOSED = range(4)
 
 
 class ExchangeWebsocket:
+    exchangeName = "exchange"  # 交易所名称，同一交易所的连接共享连接并发限制
+    maxConcurrentConnects = 3  # 同一交易所同时建立连接的最大数量
+    # 订阅请求的格式，子类按交易所协议重写，为None时请求不做合并
+    requestOpField = None
+    requestArgsField = None
+    subscribeOp = "subscribe"
+    unsubscribeOp = "unsubscribe"
+    maxArgsPerRequest = 50  # 合并后单个请求中args的最大数量
+    # 推送是否为需要在处理时合并的增量，为True时recvBuffer不能丢弃或替换消息
+    incrementalPayloads = False
+    _connectionCounter = itertools.count()
+
     def __init__(self, url: str, needLogin: bool, *args, **kwargs):
         """
         这是一个连接交易所websocket的基类
@@ -20,22 +46,67 @@ class ExchangeWebsocket:
         # 获取参数配置
         self.pingInterval = kwargs.get("pingInterval", 20)
         self.pingTimeout = kwargs.get("pingTimeout", 10)
-        self.checkRequestInterval = kwargs.get("checkRequestInterval", 0.2)
-        self.checkStateConsistentInterval = kwargs.get(
-            "checkStateConsistentInterval", 5
+        self.reconnectBaseDelay = kwargs.get("reconnectBaseDelay", 0.5)
+        self.reconnectMaxDelay = kwargs.get("reconnectMaxDelay", 60)
+        self.maxConcurrentConnects = kwargs.get(
+            "maxConcurrentConnects", self.maxConcurrentConnects
         )
-        self.execRequestsInterval = kwargs.get("execRequestsInterval", 0.2)
-        self.processRecvInterval = kwargs.get("processRecvInterval", 0.0001)
+        self.maxOutageRecords = kwargs.get("maxOutageRecords", 1000)
         self.maxWaitforRecvInterval = kwargs.get("maxWaitforRecvInterval", 90)
+        self.watchdogInterval = kwargs.get("watchdogInterval", 1)
+        self.staleFactor = kwargs.get("staleFactor", 10)
+        self.minStaleInterval = kwargs.get("minStaleInterval", 5)
         self.queueMaxSize = kwargs.get("queueMaxSize", 100)
+        self.connectionName = kwargs.get(
+            "connectionName",
+            f"{self.exchangeName}_{next(ExchangeWebsocket._connectionCounter)}",
+        )
+        self.latencyEnabled = kwargs.get("latencyEnabled", True)
+        self.latencyDumpInterval = kwargs.get("latencyDumpInterval", 60)
+        self.dedupFilter = kwargs.get("dedupFilter")  # 多条连接冗余接收时共享的去重器
+        self.recvBufferSize = kwargs.get("recvBufferSize", 10000)
+        self.recvOverflowPolicy = kwargs.get("recvOverflowPolicy", RingBuffer.BLOCK)
+        if self.incrementalPayloads and self.recvOverflowPolicy != RingBuffer.BLOCK:
+            raise ValueError(
+                f"{self.exchangeName}推送增量数据，recvOverflowPolicy只能为{RingBuffer.BLOCK}"
+            )
+        # 处理协程数量，大于1时同一订阅的消息可能乱序处理
+        self.recvConsumers = kwargs.get("recvConsumers", 1)
+        self.maxArgsPerRequest = kwargs.get("maxArgsPerRequest", self.maxArgsPerRequest)
+        self.sequenceEnabled = kwargs.get("sequenceEnabled", True)
+        self.gapLedger = kwargs.get("gapLedger")  # 多条连接共享的GapLedger
+        self.resubscribeOnGap = kwargs.get("resubscribeOnGap", False)
+        self.gapResubscribeInterval = kwargs.get("gapResubscribeInterval", 10)
         # 初始化
         self.url = url
         self.ws = None
         self.needLogin = needLogin
         self.requestQueue = asyncio.Queue(self.queueMaxSize)  # 实时请求队列
-        self.requestLogList = []  # 日志列表，只在重连时使用
+        self.subscriptionDict = {}  # 当前有效的订阅，key为_argKey，只在重连时使用
+        self.otherRequestDict = {}  # 无法解析为订阅的请求，去重后在重连时重放
         self.state = State.CLOSED
         self.reconnecting = False
+        self.connectedEvent = asyncio.Event()  # 连接可用时置位，processRecv等待该事件
+        self.recvTimestamp = 0.0  # 正在处理的帧的接收时间戳（秒），在_processRecv中可用
+        # 接收与处理之间的缓冲区，读取协程不等待处理（落盘）
+        self.recvBuffer = RingBuffer(self.recvBufferSize, self.recvOverflowPolicy)
+        self.disconnectedEvent = asyncio.Event()  # 连接断开时置位，唤醒重连
+        self.disconnectedEvent.set()
+        self.disconnectedTime = None  # 最近一次断线的时间，从未连接过时为None
+        self.backoff = Backoff(self.reconnectBaseDelay, self.reconnectMaxDelay)
+        self.outageList = deque(maxlen=self.maxOutageRecords)  # 断线区间记录
+        self.lastRecvTime = 0.0  # 最近一次收到数据的时间
+        self.topicStatDict = {}  # 每个订阅的推送统计，key与subscriptionDict一致
+        self._argKeyCache = {}  # 推送中arg的值到订阅key的缓存
+        # 延迟直方图，key为(类型, channel)，类型为exchange->recv或recv->enqueued
+        self.latencyDict: dict[tuple[str, str], LatencyHistogram] = {}
+        # 按订阅跟踪推送中的序号，记录数据丢失与乱序
+        self.sequenceTracker = (
+            SequenceTracker(self.exchangeName, self.gapLedger)
+            if self.sequenceEnabled
+            else None
+        )
+        self._gapResubscribeTimeDict = {}  # 每个订阅最近一次因数据丢失重新订阅的时间
 
     async def keepAlive(self):
         """保持连接"""
@@ -46,38 +117,61 @@ class ExchangeWebsocket:
                 await self.ws.send("ping")
 
     async def checkStateConsistent(self):
+        """连接断开后立即重连，失败后按带抖动的指数退避重试"""
         while True:
-            await asyncio.sleep(self.checkStateConsistentInterval)
-            if self.reconnecting:
-                continue
-            if self.ws == None:
-                # 未初始化，重新连接
-                logger.debug("ws未初始化，正在重新连接...")
-                await self.reconnect()
-            if self.ws and self.ws.state != self.state:
-                # 状态不一致，需要重新连接
-                logger.debug("状态不一致，正在重新连接...")
-                await self.reconnect()
-            if self.ws and self.ws.state == self.state and self.state == State.CLOSED:
-                # 断线，需要重新连接
+            await self.disconnectedEvent.wait()
+            outageStartTime = self.disconnectedTime
+            if outageStartTime is None:
+                logger.debug("ws未初始化，正在连接...")
+            else:
                 logger.debug("断线，正在重新连接...")
-                await self.reconnect()
+            while not (await self.reconnect()):
+                delay = self.backoff.nextDelay()
+                logger.debug("重连失败，{:.2f}秒后重试".format(delay))
+                await asyncio.sleep(delay)
+            self.backoff.reset()
+            if outageStartTime is not None:
+                await self._recordOutage(outageStartTime, time.time())
+
+    async def _recordOutage(self, startTime: float, endTime: float):
+        """记录断线区间，下游可以据此判断数据缺口"""
+        outage = {
+            "start": startTime,
+            "end": endTime,
+            "duration": endTime - startTime,
+        }
+        self.outageList.append(outage)
+        if self.sequenceTracker is not None:
+            self.sequenceTracker.ledger.record(
+                self.exchangeName, None, OUTAGE, startTime, endTime
+            )
+            # 重连后序号可能重新开始
+            self.sequenceTracker.reset()
+        await self._onOutage(outage)
+
+    async def _onOutage(self, outage: dict):  # 根据需要重写
+        """断线恢复后调用"""
+        logger.warning("断线{:.3f}秒后恢复".format(outage["duration"]))
 
     async def reconnect(self, *args, **kwargs):
         # 重新连接
         self.reconnecting = True
-        recoverQueue = asyncio.Queue()
-        for requestMsg in self.requestLogList:
-            await recoverQueue.put(requestMsg)
         if not (await self.connect(*args, **kwargs)):
             self.reconnecting = False
             return False
-        # 执行先前的请求
-        while not recoverQueue.empty():
-            requestMsg = await recoverQueue.get()
-            await self._execRequest(requestMsg)
-            await asyncio.sleep(self.execRequestsInterval)
+        # 队列中尚未发送的请求已经反映在订阅表中，直接丢弃
+        while not self.requestQueue.empty():
+            self.requestQueue.get_nowait()
+        # 恢复当前有效的订阅，期间断线则视为本次重连失败
+        try:
+            for requestMsg in self._mergeRequests(self._getRecoverRequests()):
+                await self.ws.send(json.dumps(requestMsg))
+        except ConnectionClosed:
+            self._onDisconnected(self.ws)
+            self.reconnecting = False
+            return False
         # 重连结束
+        self._resetTopicStats(time.time())
         self.reconnecting = False
         logger.info("重新连接成功")
         return True
@@ -85,81 +179,440 @@ class ExchangeWebsocket:
     async def connect(self, *args, **kwargs):
         """连接websocket"""
         try:
-            self.ws = await websockets.connect(self.url)
-            if self.needLogin:
-                await self.login(*args, **kwargs)
+            if self.ws and self.ws.state == State.OPEN:
+                # 关闭旧连接，使processRecv切换到新连接上
+                await self.ws.close()
+            async with getConnectLimiter(self.exchangeName, self.maxConcurrentConnects):
+                self.ws = await websockets.connect(self.url)
+                if self.needLogin:
+                    await self.login(*args, **kwargs)
             self.state = State.OPEN
+            self.disconnectedEvent.clear()
+            self.connectedEvent.set()
             logger.info("连接成功")
             return True
         except Exception as e:
             logger.warning("连接失败")
             self.state = State.CLOSED
+            self.connectedEvent.clear()
             return False
 
     async def login(self, *args, **kwargs):  # 根据需要重写
         """如果需要登录的话自己写登录逻辑"""
         pass
 
-    async def addRequest(self, requestMsg):
+    async def addRequest(self, requestMsg: dict):
         """添加请求"""
-        await self.requestQueue.put(json.dumps(requestMsg))  # 添加到请求队列
-        self.requestLogList.append(json.dumps(requestMsg))  # 添加到日志队列
+        await self.requestQueue.put(requestMsg)  # 添加到请求队列
+        self._recordRequest(requestMsg)  # 更新订阅表
+
+    async def subscribe(self, args: list):
+        """订阅"""
+        await self.addRequest(self._buildRequest(self.subscribeOp, args))
+
+    async def unsubscribe(self, args: list):
+        """取消订阅"""
+        await self.addRequest(self._buildRequest(self.unsubscribeOp, args))
+
+    @staticmethod
+    def _argKey(arg) -> str:
+        """订阅参数的唯一标识"""
+        if isinstance(arg, str):
+            return arg
+        return json.dumps(arg, sort_keys=True, separators=(",", ":"))
+
+    def _getArgKey(self, arg: dict) -> str:
+        """带缓存的_argKey，用于每条消息都要计算订阅key的场景"""
+        cacheKey = tuple(arg.values())
+        key = self._argKeyCache.get(cacheKey)
+        if key is None:
+            key = self._argKeyCache[cacheKey] = self._argKey(arg)
+        return key
+
+    def _recordRequest(self, requestMsg: dict):
+        """根据请求更新订阅表，订阅与取消订阅按集合语义处理"""
+        op = requestMsg.get(self.requestOpField) if self.requestOpField else None
+        if op == self.subscribeOp:
+            now = time.time()
+            for arg in requestMsg[self.requestArgsField]:
+                key = self._argKey(arg)
+                self.subscriptionDict[key] = arg
+                if key not in self.topicStatDict:
+                    self.topicStatDict[key] = TopicStat(now)
+        elif op == self.unsubscribeOp:
+            for arg in requestMsg[self.requestArgsField]:
+                key = self._argKey(arg)
+                self.subscriptionDict.pop(key, None)
+                self.topicStatDict.pop(key, None)
+        elif op is None:
+            self.otherRequestDict[self._argKey(requestMsg)] = requestMsg
+
+    def _getRecoverRequests(self) -> list[dict]:
+        """重连时需要发送的请求"""
+        recoverList = list(self.otherRequestDict.values())
+        if self.subscriptionDict:
+            recoverList.append(
+                self._buildRequest(
+                    self.subscribeOp, list(self.subscriptionDict.values())
+                )
+            )
+        return recoverList
+
+    def _buildRequest(self, op: str, args: list) -> dict:  # 根据需要重写
+        """根据操作类型和参数构造请求"""
+        return {self.requestOpField: op, self.requestArgsField: args}
+
+    def _mergeRequests(self, requestList: list[dict]) -> list[dict]:
+        """
+        将相邻的同类型请求合并为尽量少的请求，保持请求的先后顺序
+        :param requestList: 待发送的请求
+        :return: 合并后的请求
+        """
+        if self.requestOpField is None:
+            return requestList
+        mergedList = []
+        op, args = None, []
+        for requestMsg in requestList:
+            if (
+                self.requestOpField not in requestMsg
+                or self.requestArgsField not in requestMsg
+            ):
+                # 无法合并的请求（如登录），原样发送
+                if args:
+                    mergedList.extend(self._splitRequest(op, args))
+                op, args = None, []
+                mergedList.append(requestMsg)
+                continue
+            if requestMsg[self.requestOpField] != op and args:
+                mergedList.extend(self._splitRequest(op, args))
+                args = []
+            op = requestMsg[self.requestOpField]
+            args.extend(requestMsg[self.requestArgsField])
+        if args:
+            mergedList.extend(self._splitRequest(op, args))
+        return mergedList
+
+    def _splitRequest(self, op: str, args: list) -> list[dict]:
+        """按maxArgsPerRequest拆分请求"""
+        size = max(1, self.maxArgsPerRequest)
+        return [
+            self._buildRequest(op, args[i : i + size])
+            for i in range(0, len(args), size)
+        ]
 
     # 监听与执行
     async def execRequests(self):
-        """循环检查请求队列，如果存在请求则执行请求"""
+        """阻塞等待请求队列，取出当前积压的全部请求合并后立即发送"""
         while True:
-            if not self.requestQueue.empty() and not self.reconnecting:
-                requestMsg = await self.requestQueue.get()
+            # 连接建立前的请求由重连时的订阅恢复发送
+            await self.connectedEvent.wait()
+            requestList = [await self.requestQueue.get()]
+            while not self.requestQueue.empty():
+                requestList.append(self.requestQueue.get_nowait())
+            for requestMsg in self._mergeRequests(requestList):
                 await self._execRequest(requestMsg)
 
-            await asyncio.sleep(self.checkRequestInterval)
-
     # 具体的执行逻辑
-    async def _execRequest(self, requestMsg):
-        """执行请求"""
-        if self.ws and self.ws.state == State.OPEN:
-            await self.ws.send(requestMsg)
-        else:
-            await asyncio.sleep(self.execRequestsInterval)
-            await self._execRequest(requestMsg)
+    async def _execRequest(self, requestMsg: dict):
+        """执行请求，连接不可用时等待连接恢复"""
+        while True:
+            await self.connectedEvent.wait()
+            try:
+                await self.ws.send(json.dumps(requestMsg))
+                return
+            except ConnectionClosed:
+                self._onDisconnected(self.ws)
 
     # 处理接受到的消息
     async def processRecv(self):
-        """循环接受消息并将其交给_processRecv处理"""
+        """等待连接可用后直接迭代接收消息，反序列化后连同接收时间放入recvBuffer"""
         while True:
-            if self.ws and self.ws.state == State.OPEN:
-                try:
-                    recv = await self.ws.recv()
-                    if recv == "pong":
+            await self.connectedEvent.wait()
+            ws = self.ws
+            try:
+                async for recv in ws:
+                    recvTimestamp = time.time()
+                    if await self._isHeartbeat(recv):
                         continue
-                    await self._processRecv(recv)
-                except Exception as e:
-                    logger.error(e)
+                    self.lastRecvTime = recvTimestamp
+                    try:
+                        recvMsg = self._decodeRecv(recv)
+                        topic = self._getRecvTopic(recvMsg)
+                        topicStat = self.topicStatDict.get(topic)
+                        if topicStat is not None:
+                            topicStat.update(recvTimestamp)
+                        if self.sequenceTracker is not None and topic is not None:
+                            await self._checkSequence(topic, recvMsg, recvTimestamp)
+                        # 订单簿需要每条增量，在去重与recvBuffer合并之前更新
+                        await self._updateOrderBook(recvMsg)
+                        if (
+                            self.dedupFilter is not None
+                            and self.dedupFilter.isDuplicate(
+                                topic,
+                                self._getUpdateId(recvMsg),
+                                self.connectionName,
+                            )
+                        ):
+                            continue
+                        await self.recvBuffer.put((recvTimestamp, recvMsg), topic)
+                    except Exception as e:
+                        logger.error(e)
+            except ConnectionClosed as e:
+                logger.warning("连接断开: {}".format(e))
+            self._onDisconnected(ws)
+
+    async def consumeRecv(self):
+        """
+        从recvBuffer中取出消息交给_processRecv处理
+        _processRecv与读取协程在同一个事件循环中运行，其中不应有同步的文件IO，
+        落盘应放入后台写线程（见exchange.handler._saveRow），否则会阻塞接收
+        """
+        while True:
+            recvTimestamp, recvMsg = await self.recvBuffer.get()
+            self.recvTimestamp = recvTimestamp
+            # 保存行情时据此统计接收->落盘的延迟，每个处理协程有自己的上下文
+            currentRecv.set((self.connectionName, recvTimestamp))
+            try:
+                await self._processRecv(recvMsg)
+                if self.latencyEnabled:
+                    self._recordLatency(recvMsg, recvTimestamp)
+            except Exception as e:
+                logger.error(e)
+
+    async def _checkSequence(self, topic, recvMsg, recvTimestamp: float):
+        """检查推送序号，发现数据丢失时按需重新订阅"""
+        sequence = self._getSequence(recvMsg)
+        if sequence is None:
+            return
+        kind = self.sequenceTracker.update(
+            topic, sequence[0], sequence[1], recvTimestamp
+        )
+        if (
+            kind == GAP
+            and self.resubscribeOnGap
+            and topic in self.subscriptionDict
+            and recvTimestamp - self._gapResubscribeTimeDict.get(topic, 0)
+            > self.gapResubscribeInterval
+        ):
+            self._gapResubscribeTimeDict[topic] = recvTimestamp
+            logger.warning("{} 数据丢失，正在重新订阅...".format(topic))
+            await self._resubscribe([topic], recvTimestamp)
 
-            await asyncio.sleep(self.processRecvInterval)
+    def _onDisconnected(self, ws):
+        """连接关闭后更新状态，等待重新连接"""
+        if ws is self.ws and not self.disconnectedEvent.is_set():
+            self.state = State.CLOSED
+            self.connectedEvent.clear()
+            self.disconnectedTime = time.time()
+            self.disconnectedEvent.set()
+
+    async def _isHeartbeat(self, recvMsg) -> bool:  # 根据需要重写
+        """判断是否为心跳消息，心跳消息不会交给_processRecv处理"""
+        return recvMsg == "pong"
+
+    def _decodeRecv(self, recvMsg):
+        """反序列化接收到的消息，每帧只反序列化一次，安装了orjson时使用orjson"""
+        try:
+            return loads(recvMsg)
+        except ValueError:
+            return recvMsg
+
+    def _getRecvTopic(self, recvMsg):  # 根据需要重写
+        """获取消息对应的订阅，返回值与subscriptionDict的key一致，无法对应时返回None"""
+        return None
+
+    def _getUpdateId(self, recvMsg):  # 根据需要重写
+        """获取消息的更新id，同一订阅内单调递增，用于冗余连接去重"""
+        return None
+
+    def _getSequence(self, recvMsg):  # 根据需要重写
+        """
+        获取消息的序号，用于发现数据丢失与乱序
+        :return: (序号, 前序号)，没有前序号时前序号为None，快照的前序号为SNAPSHOT，无法获取时返回None
+        """
+        return None
+
+    def _getRecvChannel(self, recvMsg):  # 根据需要重写
+        """获取消息的channel，用于分类统计延迟"""
+        return None
+
+    def _getEventTime(self, recvMsg):  # 根据需要重写
+        """获取消息中交易所的事件时间（毫秒），没有时返回None"""
+        return None
+
+    def _recordLatency(self, recvMsg, recvTimestamp: float):
+        """
+        记录交易所->接收和接收->放入后台写队列的延迟（微秒）
+        接收->落盘的延迟在写线程写入文件后统计，见BackgroundWriter与ParquetSink
+        """
+        channel = self._getRecvChannel(recvMsg)
+        if channel is None:
+            return
+        eventTime = self._getEventTime(recvMsg)
+        if eventTime is not None:
+            self._getLatencyHistogram("exchange->recv", channel).record(
+                int(recvTimestamp * 1e6) - int(eventTime) * 1000
+            )
+        self._getLatencyHistogram("recv->enqueued", channel).record(
+            int((time.time() - recvTimestamp) * 1e6)
+        )
+
+    def _getLatencyHistogram(self, kind: str, channel: str) -> LatencyHistogram:
+        key = (kind, channel)
+        histogram = self.latencyDict.get(key)
+        if histogram is None:
+            histogram = self.latencyDict[key] = LatencyHistogram()
+        return histogram
+
+    async def dumpLatency(self):
+        """定期输出延迟分位数并清空统计"""
+        while True:
+            await asyncio.sleep(self.latencyDumpInterval)
+            for (kind, channel), histogram in self.latencyDict.items():
+                if histogram.count == 0:
+                    continue
+                snapshot = histogram.snapshot()
+                logger.info(
+                    "{} {} {} {} count={} p50={:.3f}ms p90={:.3f}ms p99={:.3f}ms "
+                    "p99.9={:.3f}ms max={:.3f}ms negative={}".format(
+                        self.exchangeName,
+                        self.connectionName,
+                        channel,
+                        kind,
+                        snapshot["count"],
+                        snapshot["p50"],
+                        snapshot["p90"],
+                        snapshot["p99"],
+                        snapshot["p999"],
+                        snapshot["max"],
+                        snapshot["negative"],
+                    )
+                )
+                histogram.reset()
+            stats = self.recvBuffer.stats()
+            logger.info(
+                "{} {} recvBuffer depth={} maxDepth={} put={} drop={} conflate={}".format(
+                    self.exchangeName,
+                    self.connectionName,
+                    stats["depth"],
+                    stats["maxDepth"],
+                    stats["put"],
+                    stats["drop"],
+                    stats["conflate"],
+                )
+            )
+            if self.sequenceTracker is not None:
+                logger.info(
+                    "{} {} sequence gap={} outOfOrder={} duplicate={}".format(
+                        self.exchangeName,
+                        self.connectionName,
+                        self.sequenceTracker.gapCount,
+                        self.sequenceTracker.outOfOrderCount,
+                        self.sequenceTracker.duplicateCount,
+                    )
+                )
+
+    def _resetTopicStats(self, now: float):
+        """连接建立后重新计时"""
+        self.lastRecvTime = now
+        for topicStat in self.topicStatDict.values():
+            topicStat.reset(now)
+
+    async def watchRecv(self):
+        """检查订阅是否停止推送，重新订阅停止推送的订阅，全部停止推送时重建连接"""
+        while True:
+            await asyncio.sleep(self.watchdogInterval)
+            if not self.connectedEvent.is_set() or not self.topicStatDict:
+                continue
+            now = time.time()
+            staleKeys = [
+                key
+                for key, topicStat in self.topicStatDict.items()
+                if topicStat.isStale(
+                    now,
+                    self.staleFactor,
+                    self.minStaleInterval,
+                    self.maxWaitforRecvInterval,
+                )
+            ]
+            if (
+                len(staleKeys) == len(self.topicStatDict)
+                or now - self.lastRecvTime > self.maxWaitforRecvInterval
+            ):
+                logger.warning("连接上的订阅均停止推送，正在重建连接...")
+                self._resetTopicStats(now)
+                await self.ws.close()
+                continue
+            if staleKeys:
+                logger.warning(
+                    "{}个订阅停止推送，正在重新订阅...".format(len(staleKeys))
+                )
+                await self._resubscribe(staleKeys, now)
+
+    async def _resubscribe(self, keys: list[str], now: float):
+        """取消订阅后重新订阅，不改变订阅表"""
+        args = [self.subscriptionDict[key] for key in keys]
+        await self.requestQueue.put(self._buildRequest(self.unsubscribeOp, args))
+        await self.requestQueue.put(self._buildRequest(self.subscribeOp, args))
+        for key in keys:
+            self.topicStatDict[key].reset(now, resubscribed=True)
+            if self.sequenceTracker is not None:
+                self.sequenceTracker.reset(key)
+
+    async def _updateOrderBook(self, recvMsg):  # 根据需要重写
+        """
+        维护本地订单簿，在processRecv中去重之前调用，每条连接的订单簿收到自己的全部增量
+        _processRecv中读取到的是最新的订单簿
+        """
+        pass
 
     async def _processRecv(self, recvMsg):  # 根据需要重写
-        """处理processRecv接受到的消息"""
+        """处理processRecv接受到并反序列化后的消息"""
         if recvMsg == "pong":
             pass
         else:
             logger.info("recive msg {}".format(recvMsg))
 
     async def run(self):
-        """运行程序"""
-        await asyncio.gather(
-            self.connect(),
-            self.keepAlive(),
-            self.checkStateConsistent(),
-            self.execRequests(),
-            self.processRecv(),
-        )
+        """运行程序，任意协程异常退出或被取消时取消其他协程并关闭连接"""
+        taskList = [
+            asyncio.create_task(coro)
+            for coro in (
+                self.keepAlive(),
+                self.checkStateConsistent(),
+                self.execRequests(),
+                self.processRecv(),
+                *(self.consumeRecv() for _ in range(self.recvConsumers)),
+                self.watchRecv(),
+                self.dumpLatency(),
+            )
+        ]
+        try:
+            await asyncio.gather(*taskList)
+        finally:
+            for task in taskList:
+                task.cancel()
+            await asyncio.gather(*taskList, return_exceptions=True)
+            await self.close()
+
+    async def close(self):
+        """关闭websocket，不再重连"""
+        self.state = State.CLOSED
+        self.connectedEvent.clear()
+        ws, self.ws = self.ws, None
+        if ws is not None:
+            try:
+                await ws.close()
+            except Exception as e:
+                logger.error(e)
 
 
 if __name__ == "__main__":
 
     class OKX(ExchangeWebsocket):
+        requestOpField = "op"
+        requestArgsField = "args"
+
         def __init__(
             self,
             url: str,
@@ -168,17 +621,12 @@ if __name__ == "__main__":
             secret=None,
             passphrase=None,
             *args,
-            **kwargs
+            **kwargs,
         ):
             super().__init__(
                 url, needLogin, apikey, secret, passphrase, *args, **kwargs
             )
 
-        async def subscribe(self, args: list[dict]):
-            op = "subscribe"
-            params = {"op": op, "args": args}
-            await self.addRequest(params)
-
     async def main():
         url = "wss://wspap.okx.com:8443/ws/v5/public"
         okx = OKX(url, False)
@@ -0,0 +1,304 @@
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from loguru import logger
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.baseWebsocket import ExchangeWebsocket
+from lib.reconnect import Backoff
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        feedClass: type[ExchangeWebsocket],
+        url: str,
+        needLogin: bool,
+        *args,
+        name: str = None,
+        maxSubscriptionsPerConnection: int = 50,
+        maxRatePerConnection: float = 500,
+        imbalanceFactor: float = 2,
+        rebalanceInterval: float = 60,
+        maxMovesPerRebalance: int = 10,
+        rateEstimator=None,
+        maxRestarts: int = 10,
+        restartWindow: float = 600,
+        **kwargs,
+    ):
+        """
+        根据订阅的消息频率和交易所的订阅数量限制，将订阅分配到多条连接上
+        运行时定期测量每个订阅的实际频率，把负载过高的连接上的订阅迁移到空闲连接
+        :param feedClass: 交易所连接类，如OkxExtend
+        :param url: websocket连接地址
+        :param needLogin: 是否需要登录
+        :param name: 连接名称前缀，默认为交易所名称
+        :param maxSubscriptionsPerConnection: 每条连接的最大订阅数量
+        :param maxRatePerConnection: 每条连接每秒的最大消息数量
+        :param imbalanceFactor: 连接负载超过平均负载的多少倍时进行迁移
+        :param rebalanceInterval: 测量频率并迁移订阅的间隔（秒）
+        :param maxMovesPerRebalance: 每次最多迁移的订阅数量
+        :param rateEstimator: 订阅在测量前的预估频率，参数为订阅参数，默认为1
+        :param maxRestarts: restartWindow内重建连接的最大次数，超过后异常抛出到run
+        :param restartWindow: 统计重建次数的时间窗口（秒）
+        """
+        self.feedClass = feedClass
+        self.url = url
+        self.needLogin = needLogin
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name or feedClass.exchangeName
+        self.maxSubscriptionsPerConnection = maxSubscriptionsPerConnection
+        self.maxRatePerConnection = maxRatePerConnection
+        self.imbalanceFactor = imbalanceFactor
+        self.rebalanceInterval = rebalanceInterval
+        self.maxMovesPerRebalance = maxMovesPerRebalance
+        self.rateEstimator = rateEstimator or (lambda arg: 1.0)
+        self.connectionList: list[ExchangeWebsocket] = []
+        self.placementDict: dict[str, ExchangeWebsocket] = {}  # 订阅所在的连接
+        self.argDict = {}  # 订阅的key到订阅参数
+        self.rateDict: dict[str, float] = {}  # 订阅每秒的消息数量
+        self.lastCountDict = {}  # 上次测量时每个订阅所在的连接和消息计数
+        self.lastMeasureTime = time.time()
+        self.taskList: list[asyncio.Task] = []  # 各连接的运行任务，包括运行时新建的连接
+        self.running = False
+        self.maxRestarts = maxRestarts
+        self.restartWindow = restartWindow
+        self.restartBackoff = Backoff(1, 60)
+        self.restartTimeList = deque()  # restartWindow内重建连接的时间
+        self.failedEvent = asyncio.Event()  # 重建次数超过上限时置位，run抛出异常
+        self.failure = None
+
+    def _createFeed(self, connectionName: str) -> ExchangeWebsocket:
+        return self.feedClass(
+            self.url,
+            self.needLogin,
+            *self.args,
+            connectionName=connectionName,
+            **self.kwargs,
+        )
+
+    def _newConnection(self) -> ExchangeWebsocket:
+        feed = self._createFeed(f"{self.name}_{len(self.connectionList)}")
+        self.connectionList.append(feed)
+        if self.running:
+            self._startConnection(feed)
+        logger.info("{}新建连接{}".format(self.name, feed.connectionName))
+        return feed
+
+    def _startConnection(self, feed: ExchangeWebsocket):
+        task = asyncio.create_task(feed.run())
+        task.add_done_callback(lambda task: self._onConnectionDone(feed, task))
+        self.taskList.append(task)
+
+    def _onConnectionDone(self, feed: ExchangeWebsocket, task: asyncio.Task):
+        """连接的任务正常情况下不会结束，退出时重建连接并恢复其上的订阅"""
+        if task in self.taskList:
+            self.taskList.remove(task)
+        if task.cancelled() or not self.running:
+            return
+        exception = task.exception()
+        logger.error(f"{self.name}连接{feed.connectionName}异常退出: {exception!r}")
+        now = time.time()
+        while (
+            self.restartTimeList and self.restartTimeList[0] < now - self.restartWindow
+        ):
+            self.restartTimeList.popleft()
+        if not self.restartTimeList:
+            self.restartBackoff.reset()
+        if len(self.restartTimeList) >= self.maxRestarts:
+            self.failure = exception or RuntimeError(
+                f"{feed.connectionName}连接任务退出"
+            )
+            self.failedEvent.set()
+            return
+        self.restartTimeList.append(now)
+        self.taskList.append(asyncio.create_task(self._restartConnection(feed)))
+
+    async def _restartConnection(self, feed: ExchangeWebsocket):
+        """用同名的新连接替换退出的连接，重放原连接上的订阅与其他请求"""
+        try:
+            await asyncio.sleep(self.restartBackoff.nextDelay())
+            newFeed = self._createFeed(feed.connectionName)
+            self.connectionList[self.connectionList.index(feed)] = newFeed
+            for requestMsg in feed.otherRequestDict.values():
+                await newFeed.addRequest(requestMsg)
+            args = []
+            for key, arg in feed.subscriptionDict.items():
+                if self.placementDict.get(key) is feed:
+                    self.placementDict[key] = newFeed
+                    self.lastCountDict.pop(key, None)
+                    args.append(arg)
+            if args:
+                await newFeed.subscribe(args)
+            # 原连接的任务已经结束，清空订阅表并关闭连接，避免与新连接重复接收
+            feed.subscriptionDict.clear()
+            feed.otherRequestDict.clear()
+            await feed.close()
+            logger.info(
+                "{}重建连接{}，恢复{}个订阅".format(
+                    self.name, newFeed.connectionName, len(args)
+                )
+            )
+            self._startConnection(newFeed)
+        finally:
+            task = asyncio.current_task()
+            if task in self.taskList:
+                self.taskList.remove(task)
+
+    def _getLoad(self, feed: ExchangeWebsocket) -> float:
+        return sum(self.rateDict.get(key, 0.0) for key in feed.subscriptionDict)
+
+    async def subscribe(self, args: list):
+        """按预估频率从高到低，把订阅放到负载最低且有余量的连接上"""
+        loadDict = {feed: self._getLoad(feed) for feed in self.connectionList}
+        countDict = {feed: len(feed.subscriptionDict) for feed in self.connectionList}
+        batchDict: dict[ExchangeWebsocket, list] = {}
+        newArgs = []
+        for arg in args:
+            key = ExchangeWebsocket._argKey(arg)
+            if key in self.placementDict:
+                continue
+            self.argDict[key] = arg
+            self.rateDict[key] = self.rateEstimator(arg)
+            newArgs.append((self.rateDict[key], key, arg))
+        for rate, key, arg in sorted(newArgs, key=lambda item: -item[0]):
+            candidates = [
+                feed
+                for feed in self.connectionList
+                if countDict[feed] < self.maxSubscriptionsPerConnection
+                and loadDict[feed] + rate <= self.maxRatePerConnection
+            ]
+            if candidates:
+                feed = min(candidates, key=lambda feed: loadDict[feed])
+            else:
+                feed = self._newConnection()
+                loadDict[feed] = 0.0
+                countDict[feed] = 0
+            loadDict[feed] += rate
+            countDict[feed] += 1
+            self.placementDict[key] = feed
+            batchDict.setdefault(feed, []).append(arg)
+        for feed, batchArgs in batchDict.items():
+            await feed.subscribe(batchArgs)
+
+    async def unsubscribe(self, args: list):
+        """在订阅所在的连接上取消订阅"""
+        batchDict: dict[ExchangeWebsocket, list] = {}
+        for arg in args:
+            key = ExchangeWebsocket._argKey(arg)
+            feed = self.placementDict.pop(key, None)
+            if feed is None:
+                continue
+            self.argDict.pop(key, None)
+            self.rateDict.pop(key, None)
+            self.lastCountDict.pop(key, None)
+            batchDict.setdefault(feed, []).append(arg)
+        for feed, batchArgs in batchDict.items():
+            await feed.unsubscribe(batchArgs)
+
+    def _measureRates(self):
+        """根据连接上的推送统计更新每个订阅的频率"""
+        now = time.time()
+        elapsed = now - self.lastMeasureTime
+        self.lastMeasureTime = now
+        for key, feed in self.placementDict.items():
+            topicStat = feed.topicStatDict.get(key)
+            if topicStat is None:
+                continue
+            lastFeed, lastCount = self.lastCountDict.get(key, (None, 0))
+            if lastFeed is feed and elapsed > 0:
+                self.rateDict[key] = (topicStat.count - lastCount) / elapsed
+            self.lastCountDict[key] = (feed, topicStat.count)
+
+    async def _move(self, key: str, source: ExchangeWebsocket, target):
+        """先在目标连接订阅再在原连接取消订阅，迁移期间不中断数据"""
+        arg = self.argDict[key]
+        self.placementDict[key] = target
+        self.lastCountDict.pop(key, None)
+        await target.subscribe([arg])
+        await source.unsubscribe([arg])
+
+    async def rebalance(self):
+        """把负载最高的连接上的热点订阅迁移到负载最低的连接"""
+        self._measureRates()
+        moves = 0
+        while moves < self.maxMovesPerRebalance and self.connectionList:
+            loadDict = {feed: self._getLoad(feed) for feed in self.connectionList}
+            source = max(loadDict, key=loadDict.get)
+            meanLoad = sum(loadDict.values()) / len(loadDict)
+            if (
+                loadDict[source] <= self.maxRatePerConnection
+                and loadDict[source] <= meanLoad * self.imbalanceFactor
+            ):
+                break
+            target = min(loadDict, key=loadDict.get)
+            if (
+                target is source
+                or len(target.subscriptionDict) >= self.maxSubscriptionsPerConnection
+            ):
+                target = self._newConnection()
+                loadDict[target] = 0.0
+            # 迁移后不会使目标连接成为新的最高负载的最热订阅
+            gap = loadDict[source] - loadDict[target]
+            candidates = [
+                key
+                for key in source.subscriptionDict
+                if key in self.placementDict and self.rateDict[key] < gap
+            ]
+            if not candidates:
+                break
+            key = max(candidates, key=lambda key: self.rateDict[key])
+            logger.info(
+                "{}迁移订阅{}（{:.1f}条/秒）: {} -> {}".format(
+                    self.name,
+                    key,
+                    self.rateDict[key],
+                    source.connectionName,
+                    target.connectionName,
+                )
+            )
+            await self._move(key, source, target)
+            moves += 1
+
+    async def rebalanceLoop(self):
+        while True:
+            await asyncio.sleep(self.rebalanceInterval)
+            try:
+                await self.rebalance()
+            except Exception as e:
+                logger.error(e)
+
+    async def close(self):
+        """取消所有连接的任务并等待结束，然后关闭websocket"""
+        self.running = False
+        taskList, self.taskList = self.taskList, []
+        for task in taskList:
+            task.cancel()
+        await asyncio.gather(*taskList, return_exceptions=True)
+        for feed in self.connectionList:
+            await feed.close()
+
+    async def run(self):
+        """
+        运行所有连接，并定期迁移订阅，结束或被取消时关闭所有连接
+        连接任务异常退出时重建连接，连续重建超过maxRestarts次时抛出连接的异常
+        """
+        self.running = True
+        for feed in self.connectionList:
+            self._startConnection(feed)
+        rebalanceTask = asyncio.create_task(self.rebalanceLoop())
+        failedTask = asyncio.create_task(self.failedEvent.wait())
+        try:
+            await asyncio.wait(
+                [rebalanceTask, failedTask], return_when=asyncio.FIRST_COMPLETED
+            )
+            if self.failure is not None:
+                raise self.failure
+            rebalanceTask.result()
+        finally:
+            rebalanceTask.cancel()
+            failedTask.cancel()
+            await self.close()
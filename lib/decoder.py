@@ -0,0 +1,130 @@
+import json
+from loguru import logger
+
+# 优先使用更快的json库，未安装时使用标准库
+try:
+    import orjson
+
+    loads = orjson.loads
+    backend = "orjson"
+except ImportError:
+    try:
+        import ujson
+
+        loads = ujson.loads
+        backend = "ujson"
+    except ImportError:
+        loads = json.loads
+        backend = "json"
+
+
+# 出现过无法转换的值的(记录类型, 字段)，每个字段只输出一次警告
+_badFieldSet: set[tuple] = set()
+
+
+class Record:
+    """
+    固定字段的行情记录，子类通过__slots__声明字段，types声明每个字段的类型转换
+    缺失或为空字符串的字段为None，无法转换的字段也为None，不影响其他字段
+    """
+
+    __slots__ = ()
+    types = ()
+
+    @classmethod
+    def fromDict(cls, data: dict):
+        """从交易所推送的字典构造记录"""
+        record = cls.__new__(cls)
+        for name, convert in zip(cls.__slots__, cls.types):
+            value = data.get(name)
+            if value is None or value == "":
+                setattr(record, name, None)
+            else:
+                try:
+                    setattr(record, name, convert(value))
+                except (TypeError, ValueError):
+                    setattr(record, name, None)
+                    if (cls, name) not in _badFieldSet:
+                        _badFieldSet.add((cls, name))
+                        logger.warning(
+                            f"{cls.__name__}.{name} 的值无法转换，保存为空: {value!r}"
+                        )
+        return record
+
+    @classmethod
+    def fieldNames(cls) -> tuple[str, ...]:
+        return cls.__slots__
+
+    def values(self) -> list:
+        return [getattr(self, name) for name in self.__slots__]
+
+    def toDict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__),
+        )
+
+
+# (交易所, channel) -> 记录类型
+recordTypeDict: dict[tuple[str, str], type[Record]] = {}
+# 已检查过未定义字段的推送字段组合，每种组合只检查一次
+_checkedKeysSet: set[tuple] = set()
+
+
+def registerRecord(exchange: str, channel: str):
+    """注册channel对应的记录类型"""
+
+    def decorator(recordType: type[Record]):
+        assert len(recordType.__slots__) == len(recordType.types)
+        recordTypeDict[(exchange, channel)] = recordType
+        return recordType
+
+    return decorator
+
+
+def decodeRecord(exchange: str, channel: str, data: dict):
+    """
+    将已反序列化的推送数据转换为记录，记录中未定义的字段不保存，每种字段组合第一次出现时输出警告
+    :return: 记录，channel未注册时返回None
+    """
+    recordType = recordTypeDict.get((exchange, channel))
+    if recordType is None:
+        return None
+    keys = (recordType, *data)
+    if keys not in _checkedKeysSet:
+        _checkedKeysSet.add(keys)
+        unknownList = [key for key in data if key not in recordType.__slots__]
+        if unknownList:
+            logger.warning(
+                f"{exchange} {channel} 推送中有未定义的字段，不会保存: {unknownList}"
+            )
+    return recordType.fromDict(data)
+
+
+# (交易所, channel) -> 将记录转换为统一行情Tick的函数
+normalizerDict: dict[tuple[str, str], object] = {}
+
+
+def registerNormalizer(exchange: str, channel: str):
+    """注册channel对应的Tick转换函数，函数参数为(记录, 推送时间戳)"""
+
+    def decorator(normalizer):
+        normalizerDict[(exchange, channel)] = normalizer
+        return normalizer
+
+    return decorator
+
+
+def normalizeRecord(exchange: str, channel: str, record: Record, timestamp=None):
+    """
+    将记录转换为统一的Tick
+    :param timestamp: 记录本身没有时间戳时使用的推送时间戳(毫秒)
+    :return: Tick，channel未注册时返回None
+    """
+    normalizer = normalizerDict.get((exchange, channel))
+    if normalizer is None:
+        return None
+    return normalizer(record, timestamp)
@@ -0,0 +1,104 @@
+import os
+import time
+from collections import OrderedDict
+from loguru import logger
+
+
+def formatRow(values) -> str:
+    """格式化为csv的一行，None写为空"""
+    return ",".join("" if value is None else str(value) for value in values) + "\n"
+
+
+class FileHandleCache:
+    def __init__(self, maxOpenFiles: int = 512, buffering: int = 1):
+        """
+        缓存打开的文件句柄，按LRU关闭超出数量的文件
+        记住已创建的目录和已写入表头的文件，避免每条消息都检查文件系统
+        已有文件的表头与要写入的表头不同时，将已有文件重命名为{文件名}.{时间}{扩展名}后新建，避免列错位
+        :param maxOpenFiles: 最多同时打开的文件数量
+        :param buffering: open的buffering参数，默认按行缓冲
+        """
+        self.maxOpenFiles = maxOpenFiles
+        self.buffering = buffering
+        self.handleDict: OrderedDict[str, object] = OrderedDict()
+        self.knownDirSet: set[str] = set()
+        self.headerFileSet: set[str] = set()  # 已有表头的文件
+
+    def _open(self, path: str, header):
+        dirName = os.path.dirname(path)
+        if dirName and dirName not in self.knownDirSet:
+            os.makedirs(dirName, exist_ok=True)
+            self.knownDirSet.add(dirName)
+        if path not in self.headerFileSet and header is not None:
+            self._rotateIfHeaderChanged(path, formatRow(header))
+        f = open(path, "a", buffering=self.buffering)
+        if path not in self.headerFileSet:
+            # 追加模式下tell为文件长度，为0说明是新文件
+            if header is not None and f.tell() == 0:
+                f.write(formatRow(header))
+            self.headerFileSet.add(path)
+        self.handleDict[path] = f
+        while len(self.handleDict) > self.maxOpenFiles:
+            _, oldest = self.handleDict.popitem(last=False)
+            oldest.close()
+        return f
+
+    @staticmethod
+    def _rotateIfHeaderChanged(path: str, headerLine: str):
+        """已有文件的表头不同时重命名已有文件"""
+        try:
+            with open(path, "r") as f:
+                firstLine = f.readline()
+        except FileNotFoundError:
+            return
+        if not firstLine or firstLine == headerLine:
+            return
+        root, ext = os.path.splitext(path)
+        rotatedPath = f"{root}.{time.strftime('%Y%m%d%H%M%S')}{ext}"
+        os.replace(path, rotatedPath)
+        logger.warning(f"{path} 的表头与当前字段不同，已有文件重命名为 {rotatedPath}")
+
+    def getHandle(self, path: str, header=None):
+        """
+        获取文件句柄，文件为空时先写入表头
+        :param path: 文件路径
+        :param header: 表头字段
+        """
+        f = self.handleDict.get(path)
+        if f is None:
+            return self._open(path, header)
+        self.handleDict.move_to_end(path)
+        return f
+
+    def write(self, path: str, text: str, header=None):
+        """追加文本"""
+        self.getHandle(path, header).write(text)
+
+    def writeRow(self, path: str, values, header=None):
+        """追加一行csv"""
+        self.getHandle(path, header).write(formatRow(values))
+
+    def flush(self):
+        for f in self.handleDict.values():
+            f.flush()
+
+    def discard(self):
+        """
+        丢弃所有文件句柄，缓冲中未写入的内容不写入文件
+        用于fork出的子进程，继承的缓冲由父进程写入
+        """
+        devNull = os.open(os.devnull, os.O_WRONLY)
+        try:
+            while self.handleDict:
+                _, f = self.handleDict.popitem(last=False)
+                # 关闭时会写出缓冲，先将文件描述符指向空设备
+                os.dup2(devNull, f.fileno())
+                f.close()
+        finally:
+            os.close(devNull)
+
+    def close(self):
+        """关闭所有文件"""
+        while self.handleDict:
+            _, f = self.handleDict.popitem(last=False)
+            f.close()
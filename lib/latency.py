@@ -0,0 +1,161 @@
+from array import array
+from contextvars import ContextVar
+from loguru import logger
+
+# 正在处理的消息的(连接名称, 接收时间戳(秒))，由ExchangeWebsocket.consumeRecv在调用_processRecv前设置
+# 保存行情时随行放入写队列，写入文件后统计接收->落盘的延迟
+currentRecv: ContextVar[tuple[str, float] | None] = ContextVar(
+    "currentRecv", default=None
+)
+
+
+class LatencyHistogram:
+    """
+    固定分桶的延迟直方图（HDR风格的对数线性分桶），记录为O(1)，内存固定
+    每个2的幂区间内再均分为2**subBucketBits个桶，相对误差不超过1/2**subBucketBits
+    """
+
+    __slots__ = (
+        "subBucketBits",
+        "maxValue",
+        "counts",
+        "count",
+        "total",
+        "min",
+        "max",
+        "negativeCount",
+    )
+
+    def __init__(self, subBucketBits: int = 4, maxValue: int = 2**36):
+        """
+        :param subBucketBits: 每个2的幂区间的分桶位数
+        :param maxValue: 可记录的最大值（微秒），超出的值记入最后一个桶
+        """
+        self.subBucketBits = subBucketBits
+        self.maxValue = maxValue
+        self.counts = array("Q", [0]) * (self._index(maxValue) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+        self.negativeCount = 0  # 交易所时间晚于本地时间（时钟偏差）的次数
+
+    def _index(self, value: int) -> int:
+        subBucketCount = 1 << self.subBucketBits
+        if value < subBucketCount << 1:
+            return value
+        shift = value.bit_length() - self.subBucketBits - 1
+        return (shift + 1) * subBucketCount + (value >> shift) - subBucketCount
+
+    def _value(self, index: int) -> int:
+        """桶的中间值"""
+        subBucketCount = 1 << self.subBucketBits
+        if index < subBucketCount << 1:
+            return index
+        shift = index // subBucketCount - 1
+        return (((index % subBucketCount) + subBucketCount) << shift) + (
+            (1 << shift) >> 1
+        )
+
+    def record(self, value: int):
+        """
+        记录一次延迟
+        :param value: 延迟（微秒）
+        """
+        if value < 0:
+            self.negativeCount += 1
+            value = 0
+        elif value > self.maxValue:
+            value = self.maxValue
+        self.counts[self._index(value)] += 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q: float) -> int:
+        """
+        获取分位数
+        :param q: 分位数，取值0-100
+        :return: 延迟（微秒）
+        """
+        if self.count == 0:
+            return 0
+        target = max(1, int(self.count * q / 100 + 0.5))
+        cumulative = 0
+        for index, bucketCount in enumerate(self.counts):
+            cumulative += bucketCount
+            if cumulative >= target:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        """获取当前统计结果，时间单位为毫秒"""
+        return {
+            "count": self.count,
+            "negative": self.negativeCount,
+            "min": self.min / 1000,
+            "mean": self.total / self.count / 1000 if self.count else 0,
+            "p50": self.percentile(50) / 1000,
+            "p90": self.percentile(90) / 1000,
+            "p99": self.percentile(99) / 1000,
+            "p999": self.percentile(99.9) / 1000,
+            "max": self.max / 1000,
+        }
+
+    def reset(self):
+        """清空统计"""
+        for index in range(len(self.counts)):
+            self.counts[index] = 0
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+        self.negativeCount = 0
+
+
+class LatencyTable:
+    """按(交易所, channel, 连接)分别统计的延迟直方图，用于写线程中统计接收->落盘的延迟"""
+
+    def __init__(self, kind: str = "recv->persisted"):
+        self.kind = kind
+        self.histogramDict: dict[tuple[str, str, str], LatencyHistogram] = {}
+
+    def record(self, key: tuple[str, str, str], value: int):
+        """
+        :param key: (交易所, channel, 连接名称)
+        :param value: 延迟（微秒）
+        """
+        histogram = self.histogramDict.get(key)
+        if histogram is None:
+            histogram = self.histogramDict[key] = LatencyHistogram()
+        histogram.record(value)
+
+    def dump(self):
+        """输出延迟分位数并清空统计"""
+        for (
+            exchange,
+            channel,
+            connectionName,
+        ), histogram in self.histogramDict.items():
+            if histogram.count == 0:
+                continue
+            snapshot = histogram.snapshot()
+            logger.info(
+                "{} {} {} {} count={} p50={:.3f}ms p90={:.3f}ms p99={:.3f}ms "
+                "p99.9={:.3f}ms max={:.3f}ms".format(
+                    exchange,
+                    connectionName,
+                    channel,
+                    self.kind,
+                    snapshot["count"],
+                    snapshot["p50"],
+                    snapshot["p90"],
+                    snapshot["p99"],
+                    snapshot["p999"],
+                    snapshot["max"],
+                )
+            )
+            histogram.reset()
@@ -0,0 +1,168 @@
+import zlib
+from bisect import bisect_left
+
+
+class BookSide:
+    """
+    一侧的价格档位，按从优到劣排序保存在并行的数组中
+    买方按价格从高到低，卖方按价格从低到高，内部统一用key升序排序（买方key为负价格）
+    同时保存推送中的原始字符串，用于校验和
+    """
+
+    __slots__ = ("sign", "keys", "prices", "sizes", "rawList")
+
+    def __init__(self, descending: bool):
+        """
+        :param descending: 是否按价格从高到低排序，买方为True
+        """
+        self.sign = -1.0 if descending else 1.0
+        self.keys: list[float] = []
+        self.prices: list[float] = []
+        self.sizes: list[float] = []
+        self.rawList: list[tuple[str, str]] = []  # (价格, 数量)原始字符串
+
+    def __len__(self):
+        return len(self.keys)
+
+    def clear(self):
+        self.keys.clear()
+        self.prices.clear()
+        self.sizes.clear()
+        self.rawList.clear()
+
+    def apply(self, priceStr: str, sizeStr: str):
+        """更新一档，数量为0时删除该档"""
+        price = float(priceStr)
+        size = float(sizeStr)
+        key = price * self.sign
+        keys = self.keys
+        index = bisect_left(keys, key)
+        if index < len(keys) and keys[index] == key:
+            if size == 0:
+                del keys[index]
+                del self.prices[index]
+                del self.sizes[index]
+                del self.rawList[index]
+            else:
+                self.sizes[index] = size
+                self.rawList[index] = (priceStr, sizeStr)
+        elif size != 0:
+            keys.insert(index, key)
+            self.prices.insert(index, price)
+            self.sizes.insert(index, size)
+            self.rawList.insert(index, (priceStr, sizeStr))
+
+    def best(self) -> tuple[float, float] | None:
+        if not self.keys:
+            return None
+        return self.prices[0], self.sizes[0]
+
+    def top(self, n: int) -> list[tuple[float, float]]:
+        return list(zip(self.prices[:n], self.sizes[:n]))
+
+    def fill(self, quantity: float) -> tuple[float | None, float]:
+        """
+        从最优档开始吃单
+        :return: (平均成交价格, 成交数量)，深度不足时成交数量小于quantity
+        """
+        remaining = quantity
+        cost = 0.0
+        for price, size in zip(self.prices, self.sizes):
+            take = size if size < remaining else remaining
+            cost += take * price
+            remaining -= take
+            if remaining <= 0:
+                break
+        filled = quantity - remaining
+        if filled <= 0:
+            return None, 0.0
+        return cost / filled, filled
+
+
+class OrderBook:
+    def __init__(self, symbol: str):
+        """
+        本地L2订单簿
+        :param symbol: 交易对
+        """
+        self.symbol = symbol
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.updateId = None  # 最后一次更新的序号
+        self.timestamp = None
+        # 是否已与交易所同步，由维护订单簿的一方设置，未同步时数据不可用
+        self.synced = False
+
+    def clear(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.updateId = None
+        self.timestamp = None
+        self.synced = False
+
+    def applySnapshot(self, bids, asks, updateId=None, timestamp=None):
+        """
+        使用全量数据重建订单簿
+        :param bids: [[价格, 数量, ...], ...]，价格与数量为字符串
+        :param asks: 同bids
+        """
+        self.bids.clear()
+        self.asks.clear()
+        self.applyDelta(bids, asks, updateId, timestamp)
+
+    def applyDelta(self, bids, asks, updateId=None, timestamp=None):
+        """应用增量数据，数量为0的档位被删除"""
+        for level in bids:
+            self.bids.apply(level[0], level[1])
+        for level in asks:
+            self.asks.apply(level[0], level[1])
+        if updateId is not None:
+            self.updateId = updateId
+        if timestamp is not None:
+            self.timestamp = timestamp
+
+    def bestBid(self) -> tuple[float, float] | None:
+        return self.bids.best()
+
+    def bestAsk(self) -> tuple[float, float] | None:
+        return self.asks.best()
+
+    def top(self, n: int = 5) -> tuple[list, list]:
+        """
+        获取前n档
+        :return: (买方[(价格, 数量), ...], 卖方[(价格, 数量), ...])
+        """
+        return self.bids.top(n), self.asks.top(n)
+
+    def estimateFill(self, side: str, quantity: float) -> tuple[float | None, float]:
+        """
+        估算市价单按当前深度成交的平均价格
+        :param side: buy吃卖方，sell吃买方
+        :param quantity: 数量
+        :return: (平均成交价格, 成交数量)
+        """
+        if side == "buy":
+            return self.asks.fill(quantity)
+        if side == "sell":
+            return self.bids.fill(quantity)
+        raise ValueError(f"unknown side: {side}")
+
+    def checksum(self, depth: int = 25) -> int:
+        """
+        okx的订单簿校验和：前depth档买卖交替拼接为 买价:买量:卖价:卖量:...，取crc32的有符号值
+        """
+        parts = []
+        bidRaw = self.bids.rawList
+        askRaw = self.asks.rawList
+        for i in range(depth):
+            if i < len(bidRaw):
+                parts.append(bidRaw[i][0])
+                parts.append(bidRaw[i][1])
+            if i < len(askRaw):
+                parts.append(askRaw[i][0])
+                parts.append(askRaw[i][1])
+        crc = zlib.crc32(":".join(parts).encode())
+        return crc - (1 << 32) if crc >= 1 << 31 else crc
+
+    def __repr__(self):
+        return f"OrderBook({self.symbol}, bid={self.bestBid()}, ask={self.bestAsk()}, updateId={self.updateId})"
@@ -0,0 +1,280 @@
+import os
+import sys
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from loguru import logger
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.latency import LatencyTable
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+_STOP = object()
+
+# 记录字段类型 -> arrow类型
+_arrowTypeDict = {}
+if pa is not None:
+    _arrowTypeDict = {int: pa.int64(), float: pa.float64(), str: pa.string()}
+
+
+HOUR_MS = 3600000
+
+
+def _partitionTime(hour: int) -> tuple[str, str]:
+    """从1970年开始的小时数(UTC)对应的分区日期与小时"""
+    utcTime = datetime.fromtimestamp(hour * 3600, timezone.utc)
+    return utcTime.strftime("%Y-%m-%d"), utcTime.strftime("%H")
+
+
+class _Partition:
+    """一个分区(交易所/channel/日期/小时)的列缓存与文件"""
+
+    __slots__ = (
+        "path",
+        "schema",
+        "hourEnd",
+        "columns",
+        "rows",
+        "firstRowTime",
+        "writer",
+        "symbolColumn",
+        "recvList",
+    )
+
+    def __init__(self, path: str, schema, hourEnd: float, symbolColumn: bool):
+        self.path = path
+        self.schema = schema
+        self.symbolColumn = symbolColumn  # 是否在第一列额外保存symbol
+        self.recvList = []  # 缓存的行的(延迟统计的key, 接收时间戳)
+        self.hourEnd = hourEnd  # 该小时结束的时间(秒)
+        self.columns = [[] for _ in schema]
+        self.rows = 0
+        self.firstRowTime = 0
+        self.writer = None
+
+
+class ParquetSink(threading.Thread):
+    def __init__(
+        self,
+        rootDir: str = "data/parquet",
+        rowGroupSize: int = 100000,
+        rowGroupInterval: float = 60,
+        compression: str = "zstd",
+        lateness: float = 60,
+        statsInterval: float = 60,
+    ):
+        """
+        按列缓存行情并写入parquet文件，目录按hive方式分区：
+        {rootDir}/exchange=.../channel=.../date=YYYY-MM-DD/hour=HH/part-*.parquet
+        日期与小时为行情的事件时间(UTC)，没有事件时间时为接收时间，
+        记录中没有symbol字段时symbol作为第一列保存
+        每个小时一个文件，缓存行数或时间达到阈值时写入一个row group，小时结束lateness秒后或关闭时写入文件尾
+        写入row group失败时丢弃缓存的行，避免缓存无限增长
+        :param rootDir: 根目录
+        :param rowGroupSize: 缓存行数达到该值时写入row group
+        :param rowGroupInterval: 距第一行缓存超过该时间(秒)时写入row group
+        :param compression: 压缩方式
+        :param lateness: 小时结束后等待迟到行情的时间(秒)，之后迟到的行情写入该小时的新文件
+        :param statsInterval: 输出接收->写入row group延迟的间隔(秒)，0为不输出
+        """
+        if pa is None:
+            raise ImportError("ParquetSink需要安装pyarrow")
+        super().__init__(name="parquetSink", daemon=True)
+        self.rootDir = rootDir
+        self.rowGroupSize = rowGroupSize
+        self.rowGroupInterval = rowGroupInterval
+        self.compression = compression
+        self.lateness = lateness
+        self.statsInterval = statsInterval
+        self.queue = queue.SimpleQueue()
+        # (exchange, channel, 小时) -> 分区，只在写线程中访问
+        self.partitionDict: dict[tuple[str, str, int], _Partition] = {}
+        self.closed = False
+        self.lastRollCheckTime = 0
+        self.rowCount = 0
+        self.rowGroupCount = 0
+        self.persistLatency = LatencyTable()  # 接收->写入row group的延迟
+        self.lastStatsTime = time.time()
+
+    def writeRow(
+        self,
+        exchange: str,
+        channel: str,
+        symbol: str,
+        header,
+        values,
+        types,
+        timestamp=None,
+        recv=None,
+    ):
+        """
+        追加一行，可在任意线程调用
+        :param header: 字段名
+        :param values: 字段值，与header一一对应
+        :param types: 字段类型(int/float/str)，与header一一对应
+        :param timestamp: 事件时间(毫秒)，用于确定分区，None时使用接收时间
+        :param recv: (连接名称, 接收时间戳)，用于统计接收->写入row group的延迟
+        """
+        self.queue.put(
+            (
+                time.time(),
+                timestamp,
+                exchange,
+                channel,
+                symbol,
+                header,
+                values,
+                types,
+                recv,
+            )
+        )
+
+    def close(self, timeout: float = None):
+        """写入剩余的行并关闭所有文件"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.is_alive():
+            self.queue.put(_STOP)
+            self.join(timeout)
+
+    def discard(self):
+        """
+        丢弃队列与缓存的行并关闭，不写入文件尾
+        用于fork出的子进程，子进程中没有写线程，继承的文件由父进程写入
+        """
+        self.closed = True
+        self.queue = queue.SimpleQueue()
+        partitionDict, self.partitionDict = self.partitionDict, {}
+        for partition in partitionDict.values():
+            if partition.writer is not None:
+                # ParquetWriter回收时会写入文件尾，标记为已关闭
+                partition.writer.is_open = False
+
+    def run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=1)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            if item is not None:
+                try:
+                    self._add(*item)
+                except Exception as e:
+                    logger.error(f"parquetSink add {item[2]} {item[3]} failed: {e}")
+            now = time.time()
+            # 每秒检查一次是否需要写入row group或切换小时
+            if now - self.lastRollCheckTime >= 1:
+                self.lastRollCheckTime = now
+                self._rollExpired(now)
+            if self.statsInterval and now - self.lastStatsTime >= self.statsInterval:
+                self.lastStatsTime = now
+                self.persistLatency.dump()
+        for key in list(self.partitionDict):
+            self._closePartition(key)
+
+    def _getPartition(self, now, hour, exchange, channel, header, types):
+        key = (exchange, channel, hour)
+        partition = self.partitionDict.get(key)
+        if partition is not None:
+            return partition
+        date, hourStr = _partitionTime(hour)
+        # 记录中已有symbol字段时不再额外保存，避免出现同名的列
+        symbolColumn = "symbol" not in header
+        fields = [pa.field("symbol", pa.string())] if symbolColumn else []
+        fields += [
+            pa.field(name, _arrowTypeDict[dataType])
+            for name, dataType in zip(header, types)
+        ]
+        dirName = os.path.join(
+            self.rootDir,
+            f"exchange={exchange}",
+            f"channel={channel}",
+            f"date={date}",
+            f"hour={hourStr}",
+        )
+        os.makedirs(dirName, exist_ok=True)
+        # 同一小时内重启时写入新文件，不覆盖已有文件
+        path = os.path.join(dirName, f"part-{int(now * 1000)}.parquet")
+        partition = _Partition(path, pa.schema(fields), (hour + 1) * 3600, symbolColumn)
+        self.partitionDict[key] = partition
+        return partition
+
+    def _add(
+        self, now, timestamp, exchange, channel, symbol, header, values, types, recv
+    ):
+        hour = int(now // 3600) if timestamp is None else int(timestamp // HOUR_MS)
+        partition = self._getPartition(now, hour, exchange, channel, header, types)
+        if partition.rows == 0:
+            partition.firstRowTime = now
+        columns = partition.columns
+        if partition.symbolColumn:
+            columns[0].append(symbol)
+        for index, value in enumerate(values, int(partition.symbolColumn)):
+            columns[index].append(value)
+        partition.rows += 1
+        if recv is not None:
+            partition.recvList.append(((exchange, channel, recv[0]), recv[1]))
+        if partition.rows >= self.rowGroupSize:
+            self._writeRowGroup(partition)
+
+    def _writeRowGroup(self, partition: _Partition):
+        """写入缓存的行，失败时同样清空缓存并抛出异常"""
+        if partition.rows == 0:
+            return
+        try:
+            table = pa.Table.from_arrays(
+                [
+                    pa.array(column, type=field.type)
+                    for column, field in zip(partition.columns, partition.schema)
+                ],
+                schema=partition.schema,
+            )
+            if partition.writer is None:
+                partition.writer = pq.ParquetWriter(
+                    partition.path, partition.schema, compression=self.compression
+                )
+            partition.writer.write_table(table)
+            now = time.time()
+            for latencyKey, recvTimestamp in partition.recvList:
+                self.persistLatency.record(latencyKey, int((now - recvTimestamp) * 1e6))
+            self.rowCount += partition.rows
+            self.rowGroupCount += 1
+        except Exception:
+            logger.error(f"parquetSink丢弃{partition.rows}行 {partition.path}")
+            raise
+        finally:
+            partition.columns = [[] for _ in partition.schema]
+            partition.rows = 0
+            partition.recvList = []
+
+    def _rollExpired(self, now):
+        for key, partition in list(self.partitionDict.items()):
+            # 小时结束并等待迟到的行情后写入文件尾
+            if now >= partition.hourEnd + self.lateness:
+                self._closePartition(key)
+            elif (
+                partition.rows and now - partition.firstRowTime >= self.rowGroupInterval
+            ):
+                try:
+                    self._writeRowGroup(partition)
+                except Exception as e:
+                    logger.error(f"parquetSink write {partition.path} failed: {e}")
+
+    def _closePartition(self, key):
+        partition = self.partitionDict.pop(key)
+        try:
+            self._writeRowGroup(partition)
+        except Exception as e:
+            logger.error(f"parquetSink write {partition.path} failed: {e}")
+        if partition.writer is not None:
+            partition.writer.close()
@@ -0,0 +1,243 @@
+import math
+import os
+import struct
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from exchange.schema import Tick
+
+# 共享内存报价板，每个(交易所, symbol)一个固定位置的槽，保存最新的买一卖一、标记价格、指数价格与资金费率
+# 内存布局：
+#     头部 HEADER_SIZE字节：MAGIC(8) maxSymbols(uint32) 交易所数量(uint32) 每个交易所已使用的槽数量(uint32 * MAX_EXCHANGES)
+#     之后为交易所数量 * maxSymbols个槽，第i个交易所使用[i * maxSymbols, (i + 1) * maxSymbols)
+# 槽：seq(uint64) symbol(32字节) timestamp(int64) bidPx bidSz askPx askSz markPrice indexPrice fundingRate(float64) nextFundingTime(int64)
+# seq为seqlock版本号，写入前加1变为奇数，写完后再加1变为偶数
+# 读取方读取前后seq相同且为偶数时数据一致，否则重试，读写都不需要加锁
+# 每个交易所只能有一个写进程，读进程数量不限
+
+MAGIC = b"QBOARD01"
+MAX_EXCHANGES = 8
+HEADER_SIZE = 64
+EXCHANGES = ("okx", "bitget", "binance", "bybit")
+
+_headerStruct = struct.Struct(f"<8sII{MAX_EXCHANGES}I")
+_seqStruct = struct.Struct("<Q")
+_countStruct = struct.Struct("<I")
+_slotStruct = struct.Struct("<Q32sq7dq")
+_dataStruct = struct.Struct("<q7dq")
+SLOT_SIZE = _slotStruct.size
+_DATA_OFFSET = 40  # seq与symbol之后
+_COUNT_OFFSET = 16
+# 槽中保存的Tick字段及其在槽中的偏移与格式
+_fieldList = (
+    ("timestamp", 40, struct.Struct("<q")),
+    ("bidPx", 48, struct.Struct("<d")),
+    ("bidSz", 56, struct.Struct("<d")),
+    ("askPx", 64, struct.Struct("<d")),
+    ("askSz", 72, struct.Struct("<d")),
+    ("markPrice", 80, struct.Struct("<d")),
+    ("indexPrice", 88, struct.Struct("<d")),
+    ("fundingRate", 96, struct.Struct("<d")),
+    ("nextFundingTime", 104, struct.Struct("<q")),
+)
+
+
+def _untrack(shm: shared_memory.SharedMemory):
+    """
+    posix下打开共享内存时会登记到resource_tracker，登记的进程退出时共享内存会被删除
+    fork出的子进程与父进程共用resource_tracker，因此都取消登记，由创建的进程负责删除
+    """
+    if os.name == "posix":
+        resource_tracker.unregister(shm._name, "shared_memory")
+
+
+class QuoteBoard:
+    def __init__(
+        self, name: str = "quoteBoard", create: bool = False, maxSymbols: int = 2048
+    ):
+        """
+        创建或打开共享内存报价板
+        :param name: 共享内存名称
+        :param create: 是否创建，已存在同名的报价板时先删除
+        :param maxSymbols: 每个交易所最多的symbol数量，只在创建时使用
+        """
+        self.name = name
+        if create:
+            size = HEADER_SIZE + len(EXCHANGES) * maxSymbols * SLOT_SIZE
+            try:
+                self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+            except FileExistsError:
+                # 上次异常退出时残留的报价板
+                stale = shared_memory.SharedMemory(name)
+                stale.close()
+                stale.unlink()  # 打开时已登记，unlink时取消登记
+                self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+            _untrack(self.shm)
+            self.buf = self.shm.buf
+            self.buf[:size] = bytes(size)
+            _headerStruct.pack_into(
+                self.buf, 0, MAGIC, maxSymbols, len(EXCHANGES), *([0] * MAX_EXCHANGES)
+            )
+        else:
+            self.shm = shared_memory.SharedMemory(name)
+            _untrack(self.shm)
+            self.buf = self.shm.buf
+            magic, maxSymbols, exchangeCount, *_ = _headerStruct.unpack_from(
+                self.buf, 0
+            )
+            if magic != MAGIC or exchangeCount != len(EXCHANGES):
+                raise ValueError(f"shared memory {name} is not a quote board")
+        self.created = create
+        self.maxSymbols = maxSymbols
+        self.exchangeIndexDict = {exchange: i for i, exchange in enumerate(EXCHANGES)}
+        # (交易所, symbol) -> 槽的偏移
+        self.offsetDict: dict[tuple[str, str], int] = {}
+        # 交易所 -> 已扫描的槽数量
+        self.scannedCountDict = {exchange: 0 for exchange in EXCHANGES}
+
+    def _getCount(self, exchangeIndex: int) -> int:
+        return _countStruct.unpack_from(self.buf, _COUNT_OFFSET + exchangeIndex * 4)[0]
+
+    def _slotOffset(self, exchangeIndex: int, index: int) -> int:
+        return HEADER_SIZE + (exchangeIndex * self.maxSymbols + index) * SLOT_SIZE
+
+    def _scan(self, exchange: str):
+        """读取其他进程新增的槽"""
+        exchangeIndex = self.exchangeIndexDict[exchange]
+        count = self._getCount(exchangeIndex)
+        for index in range(self.scannedCountDict[exchange], count):
+            offset = self._slotOffset(exchangeIndex, index)
+            symbol = bytes(self.buf[offset + 8 : offset + _DATA_OFFSET])
+            self.offsetDict[(exchange, symbol.rstrip(b"\x00").decode())] = offset
+        self.scannedCountDict[exchange] = count
+
+    def _findOffset(self, exchange: str, symbol: str):
+        offset = self.offsetDict.get((exchange, symbol))
+        if offset is None and exchange in self.exchangeIndexDict:
+            self._scan(exchange)
+            offset = self.offsetDict.get((exchange, symbol))
+        return offset
+
+    def _allocate(self, exchange: str, symbol: str) -> int:
+        offset = self._findOffset(exchange, symbol)
+        if offset is not None:
+            return offset
+        exchangeIndex = self.exchangeIndexDict[exchange]
+        count = self._getCount(exchangeIndex)
+        if count >= self.maxSymbols:
+            raise ValueError(f"quote board is full for {exchange}")
+        encoded = symbol.encode()
+        if len(encoded) > 32:
+            raise ValueError(f"symbol too long for quote board: {symbol}")
+        offset = self._slotOffset(exchangeIndex, count)
+        _slotStruct.pack_into(self.buf, offset, 0, encoded, 0, *([math.nan] * 7), 0)
+        # 槽写完后再增加数量，读取方只扫描已完整写入的槽
+        _countStruct.pack_into(self.buf, _COUNT_OFFSET + exchangeIndex * 4, count + 1)
+        self.offsetDict[(exchange, symbol)] = offset
+        self.scannedCountDict[exchange] = count + 1
+        return offset
+
+    def update(self, tick: Tick):
+        """写入一条Tick，为None的字段保留原值"""
+        offset = self._allocate(tick.exchange, tick.symbol)
+        buf = self.buf
+        seq = _seqStruct.unpack_from(buf, offset)[0]
+        _seqStruct.pack_into(buf, offset, seq + 1)
+        for name, fieldOffset, fieldStruct in _fieldList:
+            value = getattr(tick, name)
+            if value is not None:
+                fieldStruct.pack_into(buf, offset + fieldOffset, value)
+        _seqStruct.pack_into(buf, offset, seq + 2)
+
+    def _read(self, exchange: str, symbol: str, offset: int, maxRetry: int):
+        buf = self.buf
+        for _ in range(maxRetry):
+            seq = _seqStruct.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            data = _dataStruct.unpack_from(buf, offset + _DATA_OFFSET)
+            if _seqStruct.unpack_from(buf, offset)[0] != seq:
+                continue
+            if seq == 0:
+                return None
+            values = [None if value != value else value for value in data]
+            timestamp, bidPx, bidSz, askPx, askSz, markPrice, indexPrice = values[:7]
+            fundingRate, nextFundingTime = values[7:]
+            return Tick(
+                exchange,
+                symbol,
+                timestamp,
+                bidPx=bidPx,
+                bidSz=bidSz,
+                askPx=askPx,
+                askSz=askSz,
+                markPrice=markPrice,
+                indexPrice=indexPrice,
+                fundingRate=fundingRate,
+                nextFundingTime=nextFundingTime or None,
+            )
+        return None
+
+    def get(self, exchange: str, symbol: str, maxRetry: int = 1000) -> Tick | None:
+        """
+        读取一致的最新报价
+        :param maxRetry: 写入进程异常退出时seq可能一直为奇数，超过重试次数返回None
+        :return: Tick，没有数据时返回None
+        """
+        offset = self._findOffset(exchange, symbol)
+        if offset is None:
+            return None
+        return self._read(exchange, symbol, offset, maxRetry)
+
+    def symbols(self, exchange: str) -> list[str]:
+        """交易所已有报价的symbol"""
+        self._scan(exchange)
+        return [symbol for ex, symbol in self.offsetDict if ex == exchange]
+
+    def snapshot(self, exchange: str | None = None) -> list[Tick]:
+        """读取全部或某个交易所的最新报价，每个槽单独保证一致"""
+        tickList = []
+        for ex in EXCHANGES if exchange is None else (exchange,):
+            self._scan(ex)
+        for (ex, symbol), offset in list(self.offsetDict.items()):
+            if exchange is not None and ex != exchange:
+                continue
+            tick = self._read(ex, symbol, offset, 1000)
+            if tick is not None:
+                tickList.append(tick)
+        return tickList
+
+    def changed(self, seqDict: dict, exchange: str | None = None) -> list[Tick]:
+        """
+        只读取上次调用之后有更新的报价，通过比较槽的seq判断，没有更新的槽不解析
+        :param seqDict: (交易所, symbol) -> 上次读取时的seq，由调用方保存，调用后更新
+        :return: 有更新的Tick
+        """
+        tickList = []
+        for ex in EXCHANGES if exchange is None else (exchange,):
+            self._scan(ex)
+        buf = self.buf
+        for key, offset in list(self.offsetDict.items()):
+            if exchange is not None and key[0] != exchange:
+                continue
+            seq = _seqStruct.unpack_from(buf, offset)[0]
+            # 正在写入的槽在下次调用时读取
+            if seq & 1 or seq == seqDict.get(key, 0):
+                continue
+            tick = self._read(key[0], key[1], offset, 1000)
+            if tick is not None:
+                seqDict[key] = seq
+                tickList.append(tick)
+        return tickList
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        """删除共享内存，只应由创建的进程调用"""
+        if os.name == "posix":
+            # unlink时会取消登记，先重新登记
+            resource_tracker.register(self.shm._name, "shared_memory")
+        self.shm.unlink()
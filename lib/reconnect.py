@@ -0,0 +1,55 @@
+import asyncio
+import random
+
+
+class Backoff:
+    def __init__(
+        self,
+        baseDelay: float = 0.5,
+        maxDelay: float = 60,
+        factor: float = 2,
+        jitter: bool = True,
+    ):
+        """
+        带抖动的指数退避
+        :param baseDelay: 第一次重试的延迟上限（秒）
+        :param maxDelay: 延迟的最大值（秒）
+        :param factor: 每次失败后延迟的增长倍数
+        :param jitter: 是否在[0, 延迟上限]内随机取值，避免多个连接同时重连
+        """
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+
+    def nextDelay(self) -> float:
+        """获取下一次重试前需要等待的时间"""
+        delay = min(self.maxDelay, self.baseDelay * self.factor**self.attempts)
+        # 到达上限后不再增加指数，避免长时间重连失败后指数过大溢出
+        if delay < self.maxDelay:
+            self.attempts += 1
+        if self.jitter:
+            return random.uniform(0, delay)
+        return delay
+
+    def reset(self):
+        """连接成功后重置"""
+        self.attempts = 0
+
+
+# 每个事件循环中每个交易所共用一个信号量，限制同时建立的连接数
+_connectLimiterDict: dict[tuple, asyncio.Semaphore] = {}
+
+
+def getConnectLimiter(exchangeName: str, limit: int) -> asyncio.Semaphore:
+    """
+    获取交易所的连接并发限制
+    :param exchangeName: 交易所名称
+    :param limit: 同时建立连接的最大数量，只在第一次获取时生效
+    :return: 信号量
+    """
+    key = (asyncio.get_running_loop(), exchangeName)
+    if key not in _connectLimiterDict:
+        _connectLimiterDict[key] = asyncio.Semaphore(limit)
+    return _connectLimiterDict[key]
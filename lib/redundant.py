@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sys
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.baseWebsocket import ExchangeWebsocket
+
+
+class FirstArrivalFilter:
+    def __init__(self):
+        """
+        多条连接共享的去重器，每个订阅只保留最先到达的更新
+        以交易所的更新id判断重复，id不大于已处理的最大id即视为重复
+        没有序号的channel（如bitget ticker）使用(时间戳, 内容摘要)作为id，同一毫秒内内容不同的更新都保留
+        """
+        self.lastUpdateIdDict = {}  # 每个订阅已处理的最大更新id
+        self.digestDict = {}  # 每个订阅在最大时间戳内已处理的内容摘要
+        self.passedCount = 0
+        self.duplicateCount = 0
+        self.winCountDict = defaultdict(int)  # 每条连接最先送达的次数
+
+    def isDuplicate(self, topic, updateId, connectionName: str) -> bool:
+        """
+        判断消息是否已经由其他连接送达
+        :param topic: 订阅的唯一标识
+        :param updateId: 交易所的更新id或(时间戳, 内容摘要)，无法获取时不做去重
+        :param connectionName: 收到消息的连接
+        """
+        if topic is None or updateId is None:
+            return False
+        digest = None
+        if isinstance(updateId, tuple):
+            updateId, digest = updateId
+        lastUpdateId = self.lastUpdateIdDict.get(topic)
+        if lastUpdateId is not None and updateId <= lastUpdateId:
+            digestSet = self.digestDict.get(topic)
+            if (
+                updateId < lastUpdateId
+                or digest is None
+                or digestSet is None
+                or digest in digestSet
+            ):
+                self.duplicateCount += 1
+                return True
+            # 同一时间戳内的另一条更新
+            digestSet.add(digest)
+        else:
+            self.lastUpdateIdDict[topic] = updateId
+            if digest is not None:
+                self.digestDict[topic] = {digest}
+            else:
+                self.digestDict.pop(topic, None)
+        self.passedCount += 1
+        self.winCountDict[connectionName] += 1
+        return False
+
+    def discard(self, topic):
+        """取消订阅后清理"""
+        self.lastUpdateIdDict.pop(topic, None)
+        self.digestDict.pop(topic, None)
+
+
+class RedundantFeed:
+    def __init__(
+        self,
+        feedClass: type[ExchangeWebsocket],
+        url: str,
+        needLogin: bool,
+        *args,
+        copies: int = 2,
+        **kwargs,
+    ):
+        """
+        同一组订阅同时由多条独立连接接收，最先到达的更新交给_processRecv处理
+        单条连接断开或变慢时数据不中断
+        :param feedClass: 交易所连接类，如OkxExtend
+        :param url: websocket连接地址
+        :param needLogin: 是否需要登录
+        :param copies: 连接数量
+        """
+        self.dedupFilter = FirstArrivalFilter()
+        connectionName = kwargs.pop("connectionName", feedClass.exchangeName)
+        self.feedList = [
+            feedClass(
+                url,
+                needLogin,
+                *args,
+                dedupFilter=self.dedupFilter,
+                connectionName=f"{connectionName}_{chr(ord('A') + i)}",
+                **kwargs,
+            )
+            for i in range(copies)
+        ]
+
+    async def subscribe(self, args: list):
+        """在所有连接上订阅"""
+        for feed in self.feedList:
+            await feed.subscribe(args)
+
+    async def unsubscribe(self, args: list):
+        """在所有连接上取消订阅"""
+        for feed in self.feedList:
+            await feed.unsubscribe(args)
+        for arg in args:
+            self.dedupFilter.discard(ExchangeWebsocket._argKey(arg))
+
+    async def run(self):
+        """运行所有连接"""
+        await asyncio.gather(*(feed.run() for feed in self.feedList))
+
+
+if __name__ == "__main__":
+    from exchange.binance import Binance
+
+    async def main():
+        url = "wss://fstream.binance.com/ws"
+        feed = RedundantFeed(Binance, url, False)
+        await feed.subscribe(["btcusdt@bookTicker"])
+        await feed.run()
+
+    asyncio.get_event_loop().run_until_complete(main())
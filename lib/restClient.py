@@ -0,0 +1,102 @@
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.reconnect import Backoff
+
+
+class RestClient:
+    retryStatusCodes = (429, 500, 502, 503, 504)  # 可以重试的状态码
+
+    def __init__(
+        self,
+        timeout: float = 10,
+        retries: int = 3,
+        poolSize: int = 16,
+        baseDelay: float = 0.5,
+        maxDelay: float = 5,
+    ):
+        """
+        基于requests.Session的REST客户端，同一host复用keep-alive连接
+        同步的get可以在线程中并发调用，fetch在线程池中执行get，不阻塞事件循环
+        :param timeout: 单次请求的超时时间（秒）
+        :param retries: 连接失败、超时或可重试的状态码时的最大重试次数
+        :param poolSize: 每个host保持的最大连接数量，不小于并发请求数量
+        :param baseDelay: 第一次重试的延迟上限（秒）
+        :param maxDelay: 重试延迟的最大值（秒）
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, params: dict | None = None):
+        """
+        发送GET请求，失败时按带抖动的指数退避重试
+        :return: 反序列化后的响应
+        :raises requests.RequestException: 重试后仍然失败或不可重试的状态码
+        """
+        backoff = Backoff(self.baseDelay, self.maxDelay)
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                if (
+                    response.status_code not in self.retryStatusCodes
+                    or attempt == self.retries
+                ):
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP Error: {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                error = e
+            delay = backoff.nextDelay()
+            logger.warning(f"GET {url} 失败: {error}，{delay:.2f}秒后重试")
+            time.sleep(delay)
+
+    async def fetch(self, url: str, params: dict | None = None):
+        """get的异步版本"""
+        return await asyncio.to_thread(self.get, url, params)
+
+    def close(self):
+        self.session.close()
+
+
+_clientDict: dict[int, RestClient] = {}
+
+
+def getRestClient() -> RestClient:
+    """当前进程共用的RestClient，fork出的子进程不共用父进程的连接"""
+    pid = os.getpid()
+    client = _clientDict.get(pid)
+    if client is None:
+        client = _clientDict[pid] = RestClient()
+    return client
+
+
+async def gatherCalls(*funcs) -> list:
+    """在线程池中并发执行多个同步函数，返回值按参数顺序"""
+    return list(await asyncio.gather(*(asyncio.to_thread(func) for func in funcs)))
+
+
+def runConcurrently(*funcs) -> list:
+    """
+    在线程池中并发执行多个同步函数并等待全部完成，耗时取决于最慢的一个
+    不使用事件循环，可以在任何地方调用，但在协程中调用会阻塞事件循环，协程中应使用gatherCalls
+    :return: 返回值按参数顺序，有函数抛出异常时抛出第一个异常
+    """
+    if not funcs:
+        return []
+    with ThreadPoolExecutor(max_workers=len(funcs)) as executor:
+        return list(executor.map(lambda func: func(), funcs))
@@ -0,0 +1,95 @@
+import asyncio
+from collections import deque
+
+
+class RingBuffer:
+    """
+    有界缓冲区，连接读取消息后放入，处理协程从中取出
+    满时的处理方式：
+    block: 等待处理协程取出
+    dropOldest: 丢弃最早的一条
+    conflate: 同一key（订阅）尚未处理的消息直接被新消息替换，没有可替换的消息时丢弃最早的一条
+    dropOldest与conflate会丢失消息，只适用于每条消息都是完整快照的订阅，
+    推送增量（如bybit tickers的delta）的连接只能使用block
+    """
+
+    BLOCK = "block"
+    DROP_OLDEST = "dropOldest"
+    CONFLATE = "conflate"
+
+    def __init__(self, maxSize: int = 10000, overflowPolicy: str = BLOCK):
+        """
+        :param maxSize: 最大长度
+        :param overflowPolicy: 满时的处理方式
+        """
+        if overflowPolicy not in (self.BLOCK, self.DROP_OLDEST, self.CONFLATE):
+            raise ValueError(f"unknown overflowPolicy: {overflowPolicy}")
+        self.maxSize = maxSize
+        self.overflowPolicy = overflowPolicy
+        self.buffer = deque()  # 元素为[key, item]，conflate时原地替换item
+        self.pendingDict = {}  # key -> 缓冲区中该key最新的元素，只在conflate时使用
+        self.notEmptyEvent = asyncio.Event()
+        self.notFullEvent = asyncio.Event()
+        self.notFullEvent.set()
+        # 统计
+        self.putCount = 0
+        self.dropCount = 0
+        self.conflateCount = 0
+        self.maxDepth = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def _popLeft(self):
+        entry = self.buffer.popleft()
+        if self.pendingDict.get(entry[0]) is entry:
+            del self.pendingDict[entry[0]]
+        return entry
+
+    async def put(self, item, key=None):
+        """
+        放入一条消息
+        :param item: 消息
+        :param key: conflate时用于替换的key，一般为订阅
+        """
+        self.putCount += 1
+        if len(self.buffer) >= self.maxSize:
+            if self.overflowPolicy == self.BLOCK:
+                while len(self.buffer) >= self.maxSize:
+                    self.notFullEvent.clear()
+                    await self.notFullEvent.wait()
+            elif self.overflowPolicy == self.CONFLATE and key in self.pendingDict:
+                self.pendingDict[key][1] = item
+                self.conflateCount += 1
+                return
+            else:
+                self._popLeft()
+                self.dropCount += 1
+        entry = [key, item]
+        self.buffer.append(entry)
+        if self.overflowPolicy == self.CONFLATE and key is not None:
+            self.pendingDict[key] = entry
+        if len(self.buffer) > self.maxDepth:
+            self.maxDepth = len(self.buffer)
+        self.notEmptyEvent.set()
+
+    async def get(self):
+        """取出最早的一条消息，为空时等待"""
+        while not self.buffer:
+            self.notEmptyEvent.clear()
+            await self.notEmptyEvent.wait()
+        entry = self._popLeft()
+        self.notFullEvent.set()
+        return entry[1]
+
+    def stats(self) -> dict:
+        """获取缓冲区统计，maxDepth在获取后清零"""
+        stats = {
+            "depth": len(self.buffer),
+            "maxDepth": self.maxDepth,
+            "put": self.putCount,
+            "drop": self.dropCount,
+            "conflate": self.conflateCount,
+        }
+        self.maxDepth = len(self.buffer)
+        return stats
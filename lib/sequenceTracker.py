@@ -0,0 +1,229 @@
+import csv
+import io
+import os
+import sys
+from collections import defaultdict, deque
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.backgroundWriter import BackgroundWriter
+
+GAP = "gap"  # 有前序号的推送不连续，中间的数据丢失
+OUT_OF_ORDER = "outOfOrder"  # 序号小于已收到的最大序号
+OUTAGE = "outage"  # 断线区间
+SNAPSHOT = -1  # prevSeq为该值时表示快照，从快照重新开始跟踪
+
+
+class GapRecord:
+    """一次序号异常或断线，start与end为接收时间（秒）"""
+
+    __slots__ = ("exchange", "topic", "kind", "start", "end", "expected", "received")
+
+    fieldNames = __slots__
+
+    def __init__(self, exchange, topic, kind, start, end, expected, received):
+        self.exchange = exchange
+        self.topic = topic
+        self.kind = kind
+        self.start = start  # 异常前最后一条正常数据的接收时间
+        self.end = end  # 发现异常的数据的接收时间
+        self.expected = expected  # 期望的序号（上一条的序号）
+        self.received = received  # 收到的序号（gap为推送中的前序号）
+
+    def values(self) -> list:
+        return [getattr(self, name) for name in self.fieldNames]
+
+    def __repr__(self):
+        return (
+            f"GapRecord({self.exchange} {self.topic} {self.kind} "
+            f"{self.start:.3f}-{self.end:.3f} expected={self.expected} received={self.received})"
+        )
+
+
+class GapLedger:
+    def __init__(
+        self,
+        maxRecords: int = 10000,
+        path: str | None = None,
+        writer: BackgroundWriter | None = None,
+    ):
+        """
+        序号异常与断线的记录，多条连接可以共享
+        :param maxRecords: 内存中保留的最大记录数量，计数不受影响
+        :param path: csv文件路径，不为None时每条记录追加写入，供分析时读取
+        :param writer: 写入文件的后台写线程，如exchange.handler.writer，
+            为None且指定了path时创建自己的写线程，事件循环中不直接写文件
+        """
+        self.recordList: deque[GapRecord] = deque(maxlen=maxRecords)
+        self.countDict = defaultdict(int)  # (交易所, 类型) -> 次数
+        self.path = path
+        self.writer = writer
+        if path is not None and writer is None:
+            self.writer = BackgroundWriter(statsInterval=0)
+            self.writer.start()
+
+    def record(self, exchange, topic, kind, start, end, expected=None, received=None):
+        gapRecord = GapRecord(exchange, topic, kind, start, end, expected, received)
+        self._add(gapRecord)
+        if self.path is not None:
+            # topic可能包含逗号与引号，按csv规则格式化后交给写线程
+            line = io.StringIO()
+            csv.writer(line, lineterminator="\n").writerow(gapRecord.values())
+            self.writer.write(self.path, line.getvalue(), GapRecord.fieldNames)
+        return gapRecord
+
+    def sync(self, timeout: float = None) -> bool:
+        """等待此前的记录写入文件"""
+        if self.writer is None:
+            return True
+        return self.writer.sync(timeout)
+
+    def _add(self, gapRecord: GapRecord):
+        self.recordList.append(gapRecord)
+        self.countDict[(gapRecord.exchange, gapRecord.kind)] += 1
+
+    def query(
+        self,
+        exchange: str | None = None,
+        topic: str | None = None,
+        kinds: tuple[str, ...] | None = None,
+        start: float | None = None,
+        end: float | None = None,
+    ) -> list[GapRecord]:
+        """按交易所、订阅、类型与时间范围查询，参数为None时不限制"""
+        return [
+            gapRecord
+            for gapRecord in self.recordList
+            if (exchange is None or gapRecord.exchange == exchange)
+            and (topic is None or gapRecord.topic == topic)
+            and (kinds is None or gapRecord.kind in kinds)
+            and (start is None or gapRecord.end >= start)
+            and (end is None or gapRecord.start <= end)
+        ]
+
+    def maskIntervals(
+        self,
+        exchange: str | None = None,
+        topic: str | None = None,
+        kinds: tuple[str, ...] = (GAP, OUTAGE),
+        padding: float = 0.0,
+    ) -> list[tuple[float, float]]:
+        """
+        不可信的时间区间，重叠的区间合并，分析时可以剔除这些区间内的数据
+        断线记录的topic为None，按topic查询时也会包含
+        :param padding: 区间两端扩展的秒数
+        :return: [(开始时间, 结束时间), ...]，按开始时间排序
+        """
+        intervalList = sorted(
+            (gapRecord.start - padding, gapRecord.end + padding)
+            for gapRecord in self.recordList
+            if (exchange is None or gapRecord.exchange == exchange)
+            and (topic is None or gapRecord.topic in (topic, None))
+            and gapRecord.kind in kinds
+        )
+        mergedList = []
+        for start, end in intervalList:
+            if mergedList and start <= mergedList[-1][1]:
+                if end > mergedList[-1][1]:
+                    mergedList[-1] = (mergedList[-1][0], end)
+            else:
+                mergedList.append((start, end))
+        return mergedList
+
+    def stats(self) -> dict:
+        return dict(self.countDict)
+
+
+def loadGapLedger(path: str, maxRecords: int = 1000000) -> GapLedger:
+    """读取GapLedger写入的csv文件"""
+    ledger = GapLedger(maxRecords)
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            ledger._add(
+                GapRecord(
+                    row["exchange"],
+                    row["topic"] or None,
+                    row["kind"],
+                    float(row["start"]),
+                    float(row["end"]),
+                    row["expected"] or None,
+                    row["received"] or None,
+                )
+            )
+    return ledger
+
+
+class _SequenceState:
+    """单个订阅的序号状态"""
+
+    __slots__ = ("lastSeq", "lastTime")
+
+    def __init__(self, seq, now: float):
+        self.lastSeq = seq
+        self.lastTime = now
+
+
+class SequenceTracker:
+    def __init__(self, exchange: str, ledger: GapLedger | None = None):
+        """
+        按订阅跟踪推送中的序号，每个订阅只保存最大序号与其接收时间
+        推送带有前序号（如币安合约深度的pu、okx订单簿的prevSeqId）时可以发现数据丢失
+        只有单调递增的序号（如币安bookTicker的u、各交易所的ts）时只能发现乱序
+        :param exchange: 交易所名称，写入记录
+        :param ledger: 记录异常的GapLedger，为None时新建
+        """
+        self.exchange = exchange
+        self.ledger = GapLedger() if ledger is None else ledger
+        self.stateDict: dict[str, _SequenceState] = {}
+        self.gapCount = 0
+        self.outOfOrderCount = 0
+        self.duplicateCount = 0
+
+    def update(self, topic, seq, prevSeq, now: float) -> str | None:
+        """
+        收到一条推送
+        :param topic: 订阅的唯一标识
+        :param seq: 推送的序号
+        :param prevSeq: 推送中的前序号，没有时为None，为SNAPSHOT时重新开始跟踪
+        :param now: 接收时间（秒）
+        :return: 发现异常时返回GAP或OUT_OF_ORDER，否则返回None
+        """
+        state = self.stateDict.get(topic)
+        if state is None or prevSeq == SNAPSHOT:
+            self.stateDict[topic] = _SequenceState(seq, now)
+            return None
+        lastSeq = state.lastSeq
+        if prevSeq is not None and prevSeq == lastSeq:
+            kind = None
+        elif seq == lastSeq:
+            # 重复推送只计数，不记录
+            self.duplicateCount += 1
+            return None
+        elif seq < lastSeq:
+            kind = OUT_OF_ORDER
+            self.outOfOrderCount += 1
+        elif prevSeq is not None:
+            kind = GAP
+            self.gapCount += 1
+        else:
+            kind = None
+        if kind is not None:
+            self.ledger.record(
+                self.exchange,
+                topic,
+                kind,
+                state.lastTime,
+                now,
+                lastSeq,
+                seq if kind == OUT_OF_ORDER else prevSeq,
+            )
+        if seq > lastSeq:
+            state.lastSeq = seq
+            state.lastTime = now
+        return kind
+
+    def reset(self, topic=None):
+        """重连或重新订阅后序号可能重新开始，清除订阅的状态，topic为None时清除全部"""
+        if topic is None:
+            self.stateDict.clear()
+        else:
+            self.stateDict.pop(topic, None)
@@ -0,0 +1,227 @@
+import os
+import sys
+import time
+from loguru import logger
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from exchange.schema import Tick
+
+# 默认手续费率，dataProcess.analyzeData使用同一个值，实时与离线的计算结果一致
+DEFAULT_FEE_RATE = 0.00025
+
+
+class SpreadEvent:
+    """某个交易对的operation越过阈值"""
+
+    __slots__ = (
+        "symbol",
+        "exchange1",
+        "exchange2",
+        "operation",
+        "value",
+        "threshold",
+        "above",
+        "timestamp",
+    )
+
+    def __init__(
+        self,
+        symbol,
+        exchange1,
+        exchange2,
+        operation,
+        value,
+        threshold,
+        above,
+        timestamp,
+    ):
+        self.symbol = symbol
+        self.exchange1 = exchange1
+        self.exchange2 = exchange2
+        self.operation = operation
+        self.value = value
+        self.threshold = threshold
+        self.above = above
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return (
+            f"SpreadEvent({self.symbol} {self.exchange1}/{self.exchange2} "
+            f"operation{self.operation}={self.value:.6f} "
+            f"{'above' if self.above else 'below'} {self.threshold} ts={self.timestamp})"
+        )
+
+
+class _PairState:
+    """一个symbol一对交易所的operation1~4的最新值与是否在阈值之上"""
+
+    __slots__ = ("values", "aboveList", "timestamp")
+
+    def __init__(self):
+        self.values = [None] * 4
+        self.aboveList = [False] * 4
+        self.timestamp = None
+
+
+class SpreadEngine:
+    def __init__(
+        self,
+        exchanges: tuple[str, ...] = ("okx", "bitget", "binance", "bybit"),
+        feeRate: float = DEFAULT_FEE_RATE,
+        threshold: float = 0.0,
+        hysteresis: float = 0.0,
+        maxQuoteAge: int | None = None,
+        onEvent=None,
+    ):
+        """
+        实时计算各交易所之间的进出场利润率，与dataProcess.analyzeData一致：
+        operation1: 在exchange1做maker long,在exchange2做taker short，bid2 / bid1 - 1 - feeRate
+        operation2: 在exchange1做taker long,在exchange2做maker short，ask2 / ask1 - 1 - feeRate
+        operation3: 在exchange1做maker short,在exchange2做taker long，bid1 / bid2 - 1 - feeRate
+        operation4: 在exchange1做taker short,在exchange2做maker long，ask1 / ask2 - 1 - feeRate
+        每条报价只重新计算该symbol包含该交易所的交易对，越过阈值时产生事件
+        :param exchanges: 交易所，交易对为(exchanges[i], exchanges[j])，i < j
+        :param feeRate: 手续费率
+        :param threshold: 阈值，operation大于阈值时为在阈值之上
+        :param hysteresis: 回到阈值之下需要低于threshold - hysteresis，避免在阈值附近反复产生事件
+        :param maxQuoteAge: 两边报价时间相差超过该值(毫秒)时不计算，None为不限制
+        :param onEvent: 事件回调，参数为SpreadEvent
+        """
+        self.exchanges = tuple(exchanges)
+        self.exchangeIndexDict = {exchange: i for i, exchange in enumerate(exchanges)}
+        self.feeRate = feeRate
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.maxQuoteAge = maxQuoteAge
+        self.onEvent = onEvent
+        # symbol -> 各交易所的[bidPx, askPx, timestamp]，按exchanges顺序，没有报价时为None
+        self.quoteDict: dict[str, list] = {}
+        # (symbol, exchange1, exchange2) -> 交易对状态
+        self.pairStateDict: dict[tuple[str, str, str], _PairState] = {}
+
+    def update(self, tick: Tick) -> list[SpreadEvent]:
+        """
+        加入一条报价，只有买一卖一价格的Tick会被使用
+        :return: 本次产生的事件
+        """
+        index = self.exchangeIndexDict.get(tick.exchange)
+        if index is None or tick.bidPx is None or tick.askPx is None:
+            return []
+        quotes = self.quoteDict.get(tick.symbol)
+        if quotes is None:
+            quotes = self.quoteDict[tick.symbol] = [None] * len(self.exchanges)
+        quote = quotes[index]
+        if quote is None:
+            quote = quotes[index] = [tick.bidPx, tick.askPx, tick.timestamp]
+        else:
+            quote[0] = tick.bidPx
+            quote[1] = tick.askPx
+            quote[2] = tick.timestamp
+        eventList = []
+        for otherIndex, other in enumerate(quotes):
+            if other is None or otherIndex == index:
+                continue
+            if otherIndex < index:
+                self._updatePair(
+                    tick.symbol, otherIndex, index, other, quote, eventList
+                )
+            else:
+                self._updatePair(
+                    tick.symbol, index, otherIndex, quote, other, eventList
+                )
+        return eventList
+
+    def _updatePair(self, symbol, index1, index2, quote1, quote2, eventList):
+        bid1, ask1, timestamp1 = quote1
+        bid2, ask2, timestamp2 = quote2
+        if (
+            self.maxQuoteAge is not None
+            and timestamp1 is not None
+            and timestamp2 is not None
+            and abs(timestamp1 - timestamp2) > self.maxQuoteAge
+        ):
+            return
+        if not bid1 or not ask1 or not bid2 or not ask2:
+            return
+        exchange1 = self.exchanges[index1]
+        exchange2 = self.exchanges[index2]
+        key = (symbol, exchange1, exchange2)
+        state = self.pairStateDict.get(key)
+        if state is None:
+            state = self.pairStateDict[key] = _PairState()
+        feeRate = self.feeRate
+        values = state.values
+        values[0] = bid2 / bid1 - 1 - feeRate
+        values[1] = ask2 / ask1 - 1 - feeRate
+        values[2] = bid1 / bid2 - 1 - feeRate
+        values[3] = ask1 / ask2 - 1 - feeRate
+        timestamp = max(timestamp1 or 0, timestamp2 or 0)
+        state.timestamp = timestamp
+        aboveList = state.aboveList
+        for i, value in enumerate(values):
+            if aboveList[i]:
+                if value >= self.threshold - self.hysteresis:
+                    continue
+                aboveList[i] = False
+            else:
+                if value <= self.threshold:
+                    continue
+                aboveList[i] = True
+            event = SpreadEvent(
+                symbol,
+                exchange1,
+                exchange2,
+                i + 1,
+                value,
+                self.threshold,
+                aboveList[i],
+                timestamp,
+            )
+            eventList.append(event)
+            if self.onEvent is not None:
+                try:
+                    self.onEvent(event)
+                except Exception as e:
+                    logger.error(f"spread event callback failed: {e}")
+
+    def get(self, symbol: str, exchange1: str, exchange2: str) -> list | None:
+        """
+        获取交易对operation1~4的最新值
+        :return: [operation1, operation2, operation3, operation4]，没有时返回None
+        """
+        if self.exchangeIndexDict.get(exchange1, 0) > self.exchangeIndexDict.get(
+            exchange2, 0
+        ):
+            # 交换两个交易所后operation1与3、2与4互换
+            values = self.get(symbol, exchange2, exchange1)
+            if values is None:
+                return None
+            return [values[2], values[3], values[0], values[1]]
+        state = self.pairStateDict.get((symbol, exchange1, exchange2))
+        if state is None or state.values[0] is None:
+            return None
+        return list(state.values)
+
+
+def runFromBoard(engine: SpreadEngine, board, pollInterval: float = 0.001):
+    """
+    从共享内存报价板读取各交易所报价并更新引擎，只处理seq变化的槽
+    :param board: lib.quoteBoard.QuoteBoard
+    :param pollInterval: 没有新报价时等待的时间（秒）
+    """
+    seqDict = {}
+    while True:
+        tickList = board.changed(seqDict)
+        for tick in tickList:
+            engine.update(tick)
+        if not tickList:
+            time.sleep(pollInterval)
+
+
+if __name__ == "__main__":
+    # 从共享内存报价板读取各交易所报价，输出越过阈值的事件
+    from lib.quoteBoard import QuoteBoard
+
+    engine = SpreadEngine(threshold=0.001, hysteresis=0.0002, maxQuoteAge=1000)
+    engine.onEvent = logger.info
+    runFromBoard(engine, QuoteBoard("quoteBoard"))
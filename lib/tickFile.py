@@ -0,0 +1,271 @@
+import json
+import math
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+# 定长二进制行情文件，每个symbol每天一个文件
+# 文件头固定HEADER_SIZE字节：
+#     0   8字节 MAGIC
+#     8   uint64 已写入的记录数量
+#     16  uint32 每条记录的字节数
+#     20  uint32 字段描述json的长度
+#     24  字段描述json，[[字段名, "q"或"d"], ...]
+# 之后为连续的记录，整数为int64，浮点数为float64，小端
+# 文件预先分配空间，写入时直接写入内存映射，写满后按倍数扩大
+
+MAGIC = b"TICKv1\x00\x00"
+HEADER_SIZE = 4096
+DAY_MS = 86400000
+_countStruct = struct.Struct("<Q")
+_headerStruct = struct.Struct("<8sQII")
+_dtypeCodeDict = {"q": "<i8", "d": "<f8"}
+
+
+class TickFormat:
+    def __init__(self, fields: list[tuple[str, str]]):
+        """
+        :param fields: [(字段名, "q"为int64或"d"为float64), ...]
+        """
+        for _, code in fields:
+            if code not in _dtypeCodeDict:
+                raise ValueError(f"unknown field code: {code}")
+        self.fields = [tuple(field) for field in fields]
+        self.names = tuple(name for name, _ in self.fields)
+        self.codes = tuple(code for _, code in self.fields)
+        self.struct = struct.Struct("<" + "".join(self.codes))
+        self.dtype = np.dtype(
+            [(name, _dtypeCodeDict[code]) for name, code in self.fields]
+        )
+
+    def pack(self, record) -> list:
+        """
+        从记录中取出各字段，缺失的浮点数为nan，缺失的整数为0
+        :param record: 有对应属性的记录
+        """
+        values = []
+        for name, code in self.fields:
+            value = getattr(record, name)
+            if value is None:
+                value = math.nan if code == "d" else 0
+            values.append(value)
+        return values
+
+
+class TickFileWriter:
+    def __init__(self, path: str, tickFormat: TickFormat, capacity: int = 65536):
+        """
+        打开或创建行情文件，已存在时在末尾继续写入
+        :param path: 文件路径
+        :param tickFormat: 记录格式
+        :param capacity: 新文件预先分配的记录数量
+        """
+        self.path = path
+        self.format = tickFormat
+        self.recordSize = tickFormat.struct.size
+        meta = json.dumps(tickFormat.fields).encode()
+        if _headerStruct.size + len(meta) > HEADER_SIZE:
+            raise ValueError("too many fields for tick file header")
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            self.file = open(path, "r+b")
+            magic, count, recordSize, metaLen = _headerStruct.unpack(
+                self.file.read(_headerStruct.size)
+            )
+            fileMeta = self.file.read(metaLen)
+            if magic != MAGIC or recordSize != self.recordSize or fileMeta != meta:
+                self.file.close()
+                raise ValueError(f"tick file {path} has a different format")
+            self.count = count
+            size = max(
+                os.path.getsize(path), HEADER_SIZE + (count + 1) * self.recordSize
+            )
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.file = open(path, "w+b")
+            self.file.write(
+                _headerStruct.pack(MAGIC, 0, self.recordSize, len(meta)) + meta
+            )
+            self.count = 0
+            size = HEADER_SIZE + capacity * self.recordSize
+        self.file.truncate(size)
+        self.size = size
+        self.mm = mmap.mmap(self.file.fileno(), size)
+        self.capacity = (size - HEADER_SIZE) // self.recordSize
+
+    def _grow(self):
+        size = HEADER_SIZE + self.capacity * 2 * self.recordSize
+        # windows下文件存在映射时不能改变大小，先关闭映射
+        if self.mm is not None:
+            self.mm.close()
+        self.file.truncate(size)
+        self.size = size
+        self.mm = mmap.mmap(self.file.fileno(), size)
+        self.capacity *= 2
+
+    def unmap(self):
+        """关闭内存映射但保留文件与预分配的空间，下次写入时重新映射"""
+        if self.mm is not None:
+            self.mm.flush()
+            self.mm.close()
+            self.mm = None
+
+    def append(self, values):
+        """写入一条记录，values按字段顺序"""
+        if self.count >= self.capacity:
+            self._grow()
+        elif self.mm is None:
+            self.mm = mmap.mmap(self.file.fileno(), self.size)
+        self.format.struct.pack_into(
+            self.mm, HEADER_SIZE + self.count * self.recordSize, *values
+        )
+        self.count += 1
+        # 记录写完后再更新数量，读取方只读取已完整写入的记录
+        _countStruct.pack_into(self.mm, 8, self.count)
+
+    def flush(self):
+        if self.mm is not None:
+            self.mm.flush()
+
+    def close(self):
+        """关闭文件，截去预分配未使用的部分"""
+        if self.file.closed:
+            return
+        self.unmap()
+        self.file.truncate(HEADER_SIZE + self.count * self.recordSize)
+        self.file.close()
+
+
+def readTickFile(path: str) -> np.ndarray:
+    """
+    以只读内存映射读取行情文件，不复制数据
+    :return: numpy结构化数组，字段与写入时一致
+    """
+    with open(path, "rb") as f:
+        magic, count, recordSize, metaLen = _headerStruct.unpack(
+            f.read(_headerStruct.size)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a tick file")
+        fields = json.loads(f.read(metaLen))
+    tickFormat = TickFormat(fields)
+    if count == 0:
+        return np.empty(0, dtype=tickFormat.dtype)
+    return np.memmap(
+        path, dtype=tickFormat.dtype, mode="r", offset=HEADER_SIZE, shape=(count,)
+    )
+
+
+# (交易所, channel) -> 记录格式，只有高频的channel保存为二进制
+tickFormatDict: dict[tuple[str, str], TickFormat] = {
+    ("binance", "bookTicker"): TickFormat(
+        [
+            ("T", "q"),
+            ("E", "q"),
+            ("u", "q"),
+            ("b", "d"),
+            ("B", "d"),
+            ("a", "d"),
+            ("A", "d"),
+        ]
+    ),
+    ("okx", "tickers"): TickFormat(
+        [("ts", "q")]
+        + [
+            (name, "d")
+            for name in (
+                "last",
+                "lastSz",
+                "askPx",
+                "askSz",
+                "bidPx",
+                "bidSz",
+                "open24h",
+                "high24h",
+                "low24h",
+                "volCcy24h",
+                "vol24h",
+                "sodUtc0",
+                "sodUtc8",
+            )
+        ]
+    ),
+}
+
+
+def getTickFilePath(rootDir: str, exchange: str, channel: str, symbol: str, date: str):
+    """行情文件路径，date为YYYYMMDD"""
+    return f"{rootDir}/{exchange}/{channel}/{symbol}/{date}.tick"
+
+
+class TickFileSink:
+    def __init__(
+        self,
+        rootDir: str = "data/tick",
+        capacity: int = 65536,
+        maxMappedFiles: int | None = None,
+    ):
+        """
+        将高频channel的每条行情写入按symbol按天(UTC)的二进制文件
+        每个symbol的文件在当天一直打开，只在跨天时关闭
+        :param rootDir: 根目录
+        :param capacity: 新文件预先分配的记录数量
+        :param maxMappedFiles: 最多同时保持的内存映射数量，超出时按LRU关闭映射，
+            文件与预分配的空间保留，再次写入时重新映射；None时不限制
+        """
+        self.rootDir = rootDir
+        self.capacity = capacity
+        self.maxMappedFiles = maxMappedFiles
+        # (交易所, channel, symbol) -> (当天开始毫秒, 次日开始毫秒, 文件)
+        self.writerDict: dict[tuple, tuple] = {}
+        # 保持内存映射的文件，按最近写入排序，只在限制映射数量时使用
+        self.mappedDict: OrderedDict[tuple, TickFileWriter] = OrderedDict()
+
+    def write(self, exchange: str, channel: str, symbol: str, record, timestamp: int):
+        """
+        写入一条记录
+        :param record: 有对应字段属性的记录
+        :param timestamp: 毫秒时间戳，用于确定日期，None时使用当前时间
+        """
+        tickFormat = tickFormatDict.get((exchange, channel))
+        if tickFormat is None:
+            return
+        if timestamp is None:
+            timestamp = time.time() * 1000
+        key = (exchange, channel, symbol)
+        current = self.writerDict.get(key)
+        if current is None or not current[0] <= timestamp < current[1]:
+            if current is not None:
+                current[2].close()
+            dayStart = int(timestamp // DAY_MS * DAY_MS)
+            date = datetime.fromtimestamp(dayStart / 1000, timezone.utc).strftime(
+                "%Y%m%d"
+            )
+            writer = TickFileWriter(
+                getTickFilePath(self.rootDir, exchange, channel, symbol, date),
+                tickFormat,
+                self.capacity,
+            )
+            current = self.writerDict[key] = (dayStart, dayStart + DAY_MS, writer)
+        writer = current[2]
+        if self.maxMappedFiles is not None:
+            self.mappedDict[key] = writer
+            self.mappedDict.move_to_end(key)
+            while len(self.mappedDict) > self.maxMappedFiles:
+                _, oldest = self.mappedDict.popitem(last=False)
+                oldest.unmap()
+        writer.append(tickFormat.pack(record))
+
+    def flush(self):
+        for _, _, writer in self.writerDict.values():
+            writer.flush()
+
+    def close(self):
+        self.mappedDict.clear()
+        while self.writerDict:
+            _, (_, _, writer) = self.writerDict.popitem()
+            writer.close()
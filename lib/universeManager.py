@@ -0,0 +1,97 @@
+import asyncio
+import os
+import sys
+from loguru import logger
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.connectionPool import ConnectionPool
+
+
+class UniverseManager:
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        fetchUniverse,
+        buildArgs,
+        universe: dict | None = None,
+        interval: float = 60,
+        removeAfter: int = 2,
+        maxRemoveRatio: float = 0.5,
+    ):
+        """
+        定期获取交易所的合约列表，与当前订阅的合约对比，在连接池上增量订阅新上线的合约、取消订阅已下架的合约
+        :param pool: 连接池，新的订阅由连接池分配到有余量的连接上
+        :param fetchUniverse: 获取合约列表的同步函数，返回{合约id: 合约信息}，在线程中执行，失败时抛出异常
+        :param buildArgs: 根据合约信息生成订阅参数列表的函数
+        :param universe: 已经订阅的合约{合约id: 合约信息}，为None时第一次获取的合约全部订阅
+        :param interval: 获取间隔（秒）
+        :param removeAfter: 连续多少次获取不到时才取消订阅，避免接口偶尔返回不完整的列表
+        :param maxRemoveRatio: 一次缺失的合约超过当前数量的该比例时视为接口异常，不取消订阅
+        """
+        self.pool = pool
+        self.fetchUniverse = fetchUniverse
+        self.buildArgs = buildArgs
+        self.universeDict = dict(universe or {})
+        self.interval = interval
+        self.removeAfter = removeAfter
+        self.maxRemoveRatio = maxRemoveRatio
+        self.missingCountDict: dict[str, int] = {}  # 合约连续获取不到的次数
+
+    async def refresh(self) -> tuple[list, list]:
+        """
+        获取一次合约列表并增量订阅与取消订阅
+        :return: (新订阅的合约id, 取消订阅的合约id)
+        """
+        try:
+            newDict = await asyncio.to_thread(self.fetchUniverse)
+        except Exception as e:
+            logger.error(f"{self.pool.name}获取合约列表失败: {e}")
+            return [], []
+        if not newDict:
+            logger.warning(f"{self.pool.name}获取的合约列表为空，跳过")
+            return [], []
+        addedList = [key for key in newDict if key not in self.universeDict]
+        missingList = [key for key in self.universeDict if key not in newDict]
+        for key in newDict:
+            self.missingCountDict.pop(key, None)
+        removedList = []
+        if len(missingList) > self.maxRemoveRatio * len(self.universeDict):
+            logger.warning(
+                f"{self.pool.name}有{len(missingList)}个合约不在列表中，超过比例，跳过取消订阅"
+            )
+        else:
+            for key in missingList:
+                count = self.missingCountDict.get(key, 0) + 1
+                self.missingCountDict[key] = count
+                if count >= self.removeAfter:
+                    removedList.append(key)
+        if addedList:
+            args = [arg for key in addedList for arg in self.buildArgs(newDict[key])]
+            for key in addedList:
+                self.universeDict[key] = newDict[key]
+            await self.pool.subscribe(args)
+            logger.info(f"{self.pool.name}新上线{len(addedList)}个合约: {addedList}")
+        if removedList:
+            args = [
+                arg
+                for key in removedList
+                for arg in self.buildArgs(self.universeDict.pop(key))
+            ]
+            for key in removedList:
+                self.missingCountDict.pop(key, None)
+            await self.pool.unsubscribe(args)
+            logger.info(
+                f"{self.pool.name}已下架{len(removedList)}个合约: {removedList}"
+            )
+        return addedList, removedList
+
+    async def run(self):
+        """定期刷新，没有指定universe时立即订阅全部合约"""
+        if not self.universeDict:
+            await self.refresh()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(e)
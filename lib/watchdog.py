@@ -0,0 +1,50 @@
+class TopicStat:
+    """单个订阅的推送统计，用于判断订阅是否长时间未推送数据"""
+
+    __slots__ = ("lastRecvTime", "resetTime", "meanInterval", "count", "resubscribed")
+
+    alpha = 0.05  # 推送间隔指数移动平均的系数
+
+    def __init__(self, now: float):
+        self.lastRecvTime = 0.0  # 最近一次收到数据的时间
+        self.resetTime = now  # 订阅、重新订阅或重连的时间
+        self.meanInterval = 0.0  # 推送间隔的指数移动平均
+        self.count = 0
+        self.resubscribed = False  # 重新订阅后尚未收到数据
+
+    def update(self, now: float):
+        """收到该订阅的数据"""
+        if self.count > 0:
+            interval = now - max(self.lastRecvTime, self.resetTime)
+            if self.count == 1:
+                self.meanInterval = interval
+            else:
+                self.meanInterval += self.alpha * (interval - self.meanInterval)
+        self.count += 1
+        self.lastRecvTime = now
+        self.resubscribed = False
+
+    def reset(self, now: float, resubscribed: bool = False):
+        """重新订阅或重连后重新计时，重新订阅后按推送频率未知处理，避免频繁重新订阅"""
+        self.resetTime = now
+        self.resubscribed = self.resubscribed or resubscribed
+
+    def isStale(
+        self,
+        now: float,
+        staleFactor: float,
+        minStaleInterval: float,
+        maxStaleInterval: float,
+    ) -> bool:
+        """
+        判断订阅是否已停止推送
+        :param now: 当前时间
+        :param staleFactor: 超过平均推送间隔的多少倍视为停止推送
+        :param minStaleInterval: 判断停止推送的最小等待时间
+        :param maxStaleInterval: 推送频率未知时的等待时间
+        """
+        if self.count < 2 or self.resubscribed:
+            threshold = maxStaleInterval
+        else:
+            threshold = max(minStaleInterval, staleFactor * self.meanInterval)
+        return now - max(self.lastRecvTime, self.resetTime) > threshold
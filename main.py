@@ -6,12 +6,10 @@ from exchange.handler import (
     okxSingleMsgHandler,
     bitgetSingleMsgHandler,
     binanceSingleMsgHandler,
+    bybitSingleMsgHandler,
 )
-from loguru import logger
 import asyncio
 import os
-import json
-import time
 
 exchanges = ["okx", "bitget", "binance", "bybit"]
 for e in exchanges:
@@ -38,24 +36,7 @@ def binanceMsgHandler(msg):
 
 def bybitMsgHandler(msg):
     # logger.debug(msg)
-    try:
-        msg = json.loads(msg)
-        if "op" in msg.keys():
-            logger.debug(msg)
-            return
-        channel = msg["topic"].split(".")[0]
-        symbol = msg["data"]["symbol"]
-        if not os.path.exists(f"data/bybit/{channel}/"):
-            os.makedirs(f"data/bybit/{channel}/")
-        saveFile = f"data/bybit/{channel}/{symbol}.csv"
-        if channel == "tickers":
-            with open(saveFile, "a+") as f:
-                f.write(f"{json.dumps(msg)}\n")
-        else:
-            logger.debug(msg)
-    except Exception as e:
-        logger.error(msg)
-        logger.error(e)
+    return bybitSingleMsgHandler(msg)
 
 
 class OkxExtend(Okx):
@@ -122,7 +103,7 @@ bitgetArgs = [
 # 从binance获取买卖一档，指数价格，资金费率
 # binancePublicWss = "wss://stream.binance.com:9443/ws" # 现货的ws
 binancePublicWss = "wss://fstream.binance.com/ws"  # 期货的ws
-binance = BinanceExtend(binancePublicWss, False, processRecvInterval=0.0001)
+binance = BinanceExtend(binancePublicWss, False)
 binanceArgs = []
 for binanceCoin in binanceCoins:
     binanceArgs.append(f"{binanceCoin.lower()}usdt@bookTicker")
@@ -1,20 +1,23 @@
-from exchange.okx import Okx, getAllOkxSymbols
-from exchange.bitget import Bitget, getAllBitgetSymbols
-from exchange.binance import Binance, getAllBinanceSymbols
-from exchange.bybit import Bybit
+from exchange.okx import Okx
+from exchange.bitget import Bitget
+from exchange.binance import Binance
+from lib.connectionPool import ConnectionPool
 from exchange.handler import (
     okxSingleMsgHandler,
     binanceSingleMsgHandler,
     bitgetSingleMsgHandler,
+    useQuoteBoard,
+    useParquetSink,
 )
+from lib.quoteBoard import QuoteBoard
+from exchange.instrumentCatalog import getInstrumentCatalog, fetchInstruments
+from lib.universeManager import UniverseManager
 from loguru import logger
 import asyncio
 import os
 import json
-import time
 import multiprocessing
 
-
 exchanges = ["okx", "bitget", "binance", "bybit"]
 for e in exchanges:
     if not os.path.exists(f"data/{e}"):
@@ -22,6 +25,11 @@ for e in exchanges:
 
 # [timestamp, fundingRate, indexPrice, askPx, askSz, bidPx, bidSz]
 
+# 各进程写入的共享内存报价板，由主进程创建
+quoteBoardName = "quoteBoard"
+# 为True时行情保存为parquet文件（需要安装pyarrow），否则保存为csv
+saveParquet = False
+
 
 def okxMsgHandler(msg):
     # logger.debug(msg)
@@ -35,7 +43,8 @@ def _binanceMsgHandler(msg: dict):  # 单条数据
 def binanceMsgHandler(msg):
     # logger.debug(msg)
     try:
-        msg = json.loads(msg)
+        if isinstance(msg, str):
+            msg = json.loads(msg)
         if isinstance(msg, list):
             for m in msg:
                 _binanceMsgHandler(m)
@@ -77,64 +86,90 @@ class BitgetExtend(Bitget):
         bitgetMsgHandler(recvMsg)
 
 
+def fetchUniverse(exchange: str) -> dict:
+    """获取交易所最新的合约，key为合约id"""
+    return {
+        instrument.nativeId: instrument for instrument in fetchInstruments(exchange)
+    }
+
+
+universeRefreshInterval = 60  # 检查新上线和已下架合约的间隔（秒）
+
+
+def okxInstrumentArgs(instrument) -> list:
+    return [
+        {"channel": "funding-rate", "instId": instrument.nativeId},
+        {"channel": "index-tickers", "instId": instrument.indexId},
+        {"channel": "tickers", "instId": instrument.nativeId},
+    ]
+
+
+def binanceInstrumentArgs(instrument) -> list:
+    return [f"{instrument.nativeId.lower()}@bookTicker"]
+
+
+def bitgetInstrumentArgs(instrument) -> list:
+    return [
+        {"instType": "USDT-FUTURES", "channel": "ticker", "instId": instrument.nativeId}
+    ]
+
+
 # 从okx获取资金费率，指数价格，买卖一档
 okxPublicWss = "wss://wspap.okx.com:8443/ws/v5/public"
-okxDict: dict[str, OkxExtend] = {}
 # 订阅
-okxSubscribeBatchSize = 50  # 每批订阅的数量
+okxSubscribeBatchSize = 50  # 每条连接的最大订阅数量
 okxArgs = []
-allOkxSymbols = getAllOkxSymbols()
-if not allOkxSymbols:
+# 各交易所的合约，优先从文件加载，过期时并发获取
+catalog = getInstrumentCatalog()
+allOkxInstruments = catalog.instruments("okx")
+if not allOkxInstruments:
     logger.error("No OKX symbols found. Exiting.")
     exit(1)
-for okxCoin in allOkxSymbols:
-    okxArgs.append({"channel": "funding-rate", "instId": f"{okxCoin}"})
-    okxArgs.append({"channel": "index-tickers", "instId": f"{okxCoin.rstrip('-SWAP')}"})
-    okxArgs.append({"channel": "tickers", "instId": f"{okxCoin}"})
+for okxInstrument in allOkxInstruments:
+    okxArgs.extend(okxInstrumentArgs(okxInstrument))
 
 # 从binance获取买卖一档，指数价格，资金费率
 # binancePublicWss = "wss://stream.binance.com:9443/ws" # 现货的ws
 binancePublicWss = "wss://fstream.binance.com/ws"  # 期货的ws
-binanceDict: dict[str, BinanceExtend] = {}
-binanceSubscribeBatchSize = 50  # 每批订阅的数量
+binanceSubscribeBatchSize = 50  # 每条连接的最大订阅数量
 binanceArgs = [
     "!markPrice@arr",
 ]
-allBinanceSymbols = getAllBinanceSymbols()
-for binanceCoin in allBinanceSymbols:
-    binanceArgs.append("".join([binanceCoin.lower(), "@bookTicker"]))
+allBinanceInstruments = catalog.instruments("binance")
+for binanceInstrument in allBinanceInstruments:
+    binanceArgs.extend(binanceInstrumentArgs(binanceInstrument))
 
 
 # 从bitget获取资金费率，指数价格，买卖一档
 bitgetPublicWss = "wss://ws.bitget.com/v2/ws/public"
-bitgetDict: dict[str, BitgetExtend] = {}
-bitgetSubscribeBatchSize = 50  # 每批订阅的数量
+bitgetSubscribeBatchSize = 50  # 每条连接的最大订阅数量
 bitgetArgs = []
-allBitgetSymbols = getAllBitgetSymbols()
-for bitgetCoin in allBitgetSymbols:
-    bitgetArgs.append(
-        {"instType": "USDT-FUTURES", "channel": "ticker", "instId": f"{bitgetCoin}"}
-    )
+allBitgetInstruments = catalog.instruments("bitget")
+for bitgetInstrument in allBitgetInstruments:
+    bitgetArgs.extend(bitgetInstrumentArgs(bitgetInstrument))
 
 
 async def _okxRun():
-    tasks = []
-    for i in range(int(len(okxArgs) / okxSubscribeBatchSize + 1)):
-        okxDict[f"okx_{i}"] = OkxExtend(okxPublicWss, False)
-        if (i + 1) * okxSubscribeBatchSize > len(okxArgs):
-            okxArgsBatch = okxArgs[i * okxSubscribeBatchSize : len(okxArgs)]
-        else:
-            okxArgsBatch = okxArgs[
-                i * okxSubscribeBatchSize : (i + 1) * okxSubscribeBatchSize
-            ]
-        taskSubscribe = asyncio.create_task(okxDict[f"okx_{i}"].subscribe(okxArgsBatch))
-        taskRun = asyncio.create_task(okxDict[f"okx_{i}"].run())
-        tasks.append(taskSubscribe)
-        tasks.append(taskRun)
-    await asyncio.gather(*tasks)
+    okxPool = ConnectionPool(
+        OkxExtend,
+        okxPublicWss,
+        False,
+        maxSubscriptionsPerConnection=okxSubscribeBatchSize,
+    )
+    await okxPool.subscribe(okxArgs)
+    # 增量订阅新上线的合约，取消订阅已下架的合约
+    okxUniverse = UniverseManager(
+        okxPool,
+        lambda: fetchUniverse("okx"),
+        okxInstrumentArgs,
+        universe={instrument.nativeId: instrument for instrument in allOkxInstruments},
+        interval=universeRefreshInterval,
+    )
+    await asyncio.gather(okxPool.run(), okxUniverse.run())
 
 
 def okxRun():
+    useQuoteBoard(quoteBoardName)
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     loop.run_until_complete(_okxRun())
@@ -142,27 +177,28 @@ def okxRun():
 
 
 async def _binanceRun():
-    tasks = []
-    for i in range(int(len(binanceArgs) / binanceSubscribeBatchSize + 1)):
-        binanceDict[f"binance_{i}"] = BinanceExtend(binancePublicWss, False)
-        if (i + 1) * binanceSubscribeBatchSize > len(binanceArgs):
-            binanceArgsBatch = binanceArgs[
-                i * binanceSubscribeBatchSize : len(binanceArgs)
-            ]
-        else:
-            binanceArgsBatch = binanceArgs[
-                i * binanceSubscribeBatchSize : (i + 1) * binanceSubscribeBatchSize
-            ]
-        taskSubscribe = asyncio.create_task(
-            binanceDict[f"binance_{i}"].subscribe(binanceArgsBatch)
-        )
-        taskRun = asyncio.create_task(binanceDict[f"binance_{i}"].run())
-        tasks.append(taskSubscribe)
-        tasks.append(taskRun)
-    await asyncio.gather(*tasks)
+    binancePool = ConnectionPool(
+        BinanceExtend,
+        binancePublicWss,
+        False,
+        maxSubscriptionsPerConnection=binanceSubscribeBatchSize,
+    )
+    await binancePool.subscribe(binanceArgs)
+    # 增量订阅新上线的合约，取消订阅已下架的合约
+    binanceUniverse = UniverseManager(
+        binancePool,
+        lambda: fetchUniverse("binance"),
+        binanceInstrumentArgs,
+        universe={
+            instrument.nativeId: instrument for instrument in allBinanceInstruments
+        },
+        interval=universeRefreshInterval,
+    )
+    await asyncio.gather(binancePool.run(), binanceUniverse.run())
 
 
 def binanceRun():
+    useQuoteBoard(quoteBoardName)
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     loop.run_until_complete(_binanceRun())
@@ -170,25 +206,28 @@ def binanceRun():
 
 
 async def _bitgetRun():
-    tasks = []
-    for i in range(int(len(bitgetArgs) / bitgetSubscribeBatchSize + 1)):
-        bitgetDict[f"bitget_{i}"] = BitgetExtend(bitgetPublicWss, False)
-        if (i + 1) * bitgetSubscribeBatchSize > len(bitgetArgs):
-            bitgetArgsBatch = bitgetArgs[i * bitgetSubscribeBatchSize : len(bitgetArgs)]
-        else:
-            bitgetArgsBatch = bitgetArgs[
-                i * bitgetSubscribeBatchSize : (i + 1) * bitgetSubscribeBatchSize
-            ]
-        taskSubscribe = asyncio.create_task(
-            bitgetDict[f"bitget_{i}"].subscribe(bitgetArgsBatch)
-        )
-        taskRun = asyncio.create_task(bitgetDict[f"bitget_{i}"].run())
-        tasks.append(taskSubscribe)
-        tasks.append(taskRun)
-    await asyncio.gather(*tasks)
+    bitgetPool = ConnectionPool(
+        BitgetExtend,
+        bitgetPublicWss,
+        False,
+        maxSubscriptionsPerConnection=bitgetSubscribeBatchSize,
+    )
+    await bitgetPool.subscribe(bitgetArgs)
+    # 增量订阅新上线的合约，取消订阅已下架的合约
+    bitgetUniverse = UniverseManager(
+        bitgetPool,
+        lambda: fetchUniverse("bitget"),
+        bitgetInstrumentArgs,
+        universe={
+            instrument.nativeId: instrument for instrument in allBitgetInstruments
+        },
+        interval=universeRefreshInterval,
+    )
+    await asyncio.gather(bitgetPool.run(), bitgetUniverse.run())
 
 
 def bitgetRun():
+    useQuoteBoard(quoteBoardName)
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     loop.run_until_complete(_bitgetRun())
@@ -196,6 +235,10 @@ def bitgetRun():
 
 
 if __name__ == "__main__":
+    if saveParquet:
+        # fork出的各子进程按相同参数创建自己的写线程
+        useParquetSink()
+    quoteBoard = QuoteBoard(quoteBoardName, create=True)
     processList = []
     tasks = [okxRun, binanceRun, bitgetRun]
     # tasks = [binanceRun]
@@ -209,3 +252,5 @@ if __name__ == "__main__":
             logger.error(f"Process {p.name} exited with code {p.exitcode}")
         else:
             logger.info(f"Process {p.name} completed successfully.")
+    quoteBoard.close()
+    quoteBoard.unlink()
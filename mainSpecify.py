@@ -2,11 +2,16 @@ from exchange.okx import Okx, getAllOkxSymbols
 from exchange.bitget import Bitget, getAllBitgetSymbols
 from exchange.binance import Binance, getAllBinanceSymbols
 from exchange.bybit import Bybit
+from lib.connectionPool import ConnectionPool
 from exchange.handler import (
     okxSingleMsgHandler,
     binanceSingleMsgHandler,
     bitgetSingleMsgHandler,
+    useQuoteBoard,
+    useParquetSink,
 )
+from lib.quoteBoard import QuoteBoard
+from exchange.instrumentCatalog import getInstrumentCatalog
 from loguru import logger
 import asyncio
 import os
@@ -22,6 +27,11 @@ for e in exchanges:
 
 # [timestamp, fundingRate, indexPrice, askPx, askSz, bidPx, bidSz]
 
+# 各进程写入的共享内存报价板，由主进程创建
+quoteBoardName = "quoteBoard"
+# 为True时行情保存为parquet文件（需要安装pyarrow），否则保存为csv
+saveParquet = False
+
 
 def okxMsgHandler(msg):
     # logger.debug(msg)
@@ -35,7 +45,8 @@ def _binanceMsgHandler(msg: dict):  # 单条数据
 def binanceMsgHandler(msg):
     # logger.debug(msg)
     try:
-        msg = json.loads(msg)
+        if isinstance(msg, str):
+            msg = json.loads(msg)
         if isinstance(msg, list):
             for m in msg:
                 _binanceMsgHandler(m)
@@ -79,45 +90,37 @@ class BitgetExtend(Bitget):
 
 # 从okx获取资金费率，指数价格，买卖一档
 okxPublicWss = "wss://wspap.okx.com:8443/ws/v5/public"
-okxDict: dict[str, OkxExtend] = {}
 # 订阅
-okxSubscribeBatchSize = 50  # 每批订阅的数量
+okxSubscribeBatchSize = 50  # 每条连接的最大订阅数量
 okxArgs = []
 
 
 # 从binance获取买卖一档，指数价格，资金费率
 # binancePublicWss = "wss://stream.binance.com:9443/ws" # 现货的ws
 binancePublicWss = "wss://fstream.binance.com/ws"  # 期货的ws
-binanceDict: dict[str, BinanceExtend] = {}
-binanceSubscribeBatchSize = 50  # 每批订阅的数量
+binanceSubscribeBatchSize = 50  # 每条连接的最大订阅数量
 binanceArgs = []
 
 
 # 从bitget获取资金费率，指数价格，买卖一档
 bitgetPublicWss = "wss://ws.bitget.com/v2/ws/public"
-bitgetDict: dict[str, BitgetExtend] = {}
-bitgetSubscribeBatchSize = 50  # 每批订阅的数量
+bitgetSubscribeBatchSize = 50  # 每条连接的最大订阅数量
 bitgetArgs = []
 
 
 async def _okxRun(okxArgs: list):
-    tasks = []
-    for i in range(int(len(okxArgs) / okxSubscribeBatchSize + 1)):
-        okxDict[f"okx_{i}"] = OkxExtend(okxPublicWss, False)
-        if (i + 1) * okxSubscribeBatchSize > len(okxArgs):
-            okxArgsBatch = okxArgs[i * okxSubscribeBatchSize : len(okxArgs)]
-        else:
-            okxArgsBatch = okxArgs[
-                i * okxSubscribeBatchSize : (i + 1) * okxSubscribeBatchSize
-            ]
-        taskSubscribe = asyncio.create_task(okxDict[f"okx_{i}"].subscribe(okxArgsBatch))
-        taskRun = asyncio.create_task(okxDict[f"okx_{i}"].run())
-        tasks.append(taskSubscribe)
-        tasks.append(taskRun)
-    await asyncio.gather(*tasks)
+    okxPool = ConnectionPool(
+        OkxExtend,
+        okxPublicWss,
+        False,
+        maxSubscriptionsPerConnection=okxSubscribeBatchSize,
+    )
+    await okxPool.subscribe(okxArgs)
+    await okxPool.run()
 
 
 def okxRun(okxArgs: list):
+    useQuoteBoard(quoteBoardName)
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     loop.run_until_complete(_okxRun(okxArgs))
@@ -125,27 +128,18 @@ def okxRun(okxArgs: list):
 
 
 async def _binanceRun(binanceArgs: list):
-    tasks = []
-    for i in range(int(len(binanceArgs) / binanceSubscribeBatchSize + 1)):
-        binanceDict[f"binance_{i}"] = BinanceExtend(binancePublicWss, False)
-        if (i + 1) * binanceSubscribeBatchSize > len(binanceArgs):
-            binanceArgsBatch = binanceArgs[
-                i * binanceSubscribeBatchSize : len(binanceArgs)
-            ]
-        else:
-            binanceArgsBatch = binanceArgs[
-                i * binanceSubscribeBatchSize : (i + 1) * binanceSubscribeBatchSize
-            ]
-        taskSubscribe = asyncio.create_task(
-            binanceDict[f"binance_{i}"].subscribe(binanceArgsBatch)
-        )
-        taskRun = asyncio.create_task(binanceDict[f"binance_{i}"].run())
-        tasks.append(taskSubscribe)
-        tasks.append(taskRun)
-    await asyncio.gather(*tasks)
+    binancePool = ConnectionPool(
+        BinanceExtend,
+        binancePublicWss,
+        False,
+        maxSubscriptionsPerConnection=binanceSubscribeBatchSize,
+    )
+    await binancePool.subscribe(binanceArgs)
+    await binancePool.run()
 
 
 def binanceRun(binanceArgs: list):
+    useQuoteBoard(quoteBoardName)
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     loop.run_until_complete(_binanceRun(binanceArgs))
@@ -153,25 +147,18 @@ def binanceRun(binanceArgs: list):
 
 
 async def _bitgetRun(bitgetArgs: list):
-    tasks = []
-    for i in range(int(len(bitgetArgs) / bitgetSubscribeBatchSize + 1)):
-        bitgetDict[f"bitget_{i}"] = BitgetExtend(bitgetPublicWss, False)
-        if (i + 1) * bitgetSubscribeBatchSize > len(bitgetArgs):
-            bitgetArgsBatch = bitgetArgs[i * bitgetSubscribeBatchSize : len(bitgetArgs)]
-        else:
-            bitgetArgsBatch = bitgetArgs[
-                i * bitgetSubscribeBatchSize : (i + 1) * bitgetSubscribeBatchSize
-            ]
-        taskSubscribe = asyncio.create_task(
-            bitgetDict[f"bitget_{i}"].subscribe(bitgetArgsBatch)
-        )
-        taskRun = asyncio.create_task(bitgetDict[f"bitget_{i}"].run())
-        tasks.append(taskSubscribe)
-        tasks.append(taskRun)
-    await asyncio.gather(*tasks)
+    bitgetPool = ConnectionPool(
+        BitgetExtend,
+        bitgetPublicWss,
+        False,
+        maxSubscriptionsPerConnection=bitgetSubscribeBatchSize,
+    )
+    await bitgetPool.subscribe(bitgetArgs)
+    await bitgetPool.run()
 
 
 def bitgetRun(bitgetArgs: list):
+    useQuoteBoard(quoteBoardName)
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     loop.run_until_complete(_bitgetRun(bitgetArgs))
@@ -193,13 +180,15 @@ if __name__ == "__main__":
     binanceSymbols = symbols
     bitgetSymbols = symbols
 
+    # symbol与交易所合约id的对应关系
+    catalog = getInstrumentCatalog()
     for okxCoin in okxSymbols:
-        okxCoin = okxCoin.rstrip("USDT") + "-USDT" + "-SWAP"
-        okxArgs.append({"channel": "funding-rate", "instId": f"{okxCoin}"})
+        okxInstId = catalog.toNative("okx", okxCoin)
+        okxArgs.append({"channel": "funding-rate", "instId": f"{okxInstId}"})
         okxArgs.append(
-            {"channel": "index-tickers", "instId": f"{okxCoin.rstrip('-SWAP')}"}
+            {"channel": "index-tickers", "instId": catalog.toIndexId("okx", okxCoin)}
         )
-        okxArgs.append({"channel": "tickers", "instId": f"{okxCoin}"})
+        okxArgs.append({"channel": "tickers", "instId": f"{okxInstId}"})
 
     for binanceCoin in binanceSymbols:
         binanceArgs.append("".join([binanceCoin.lower(), "@bookTicker"]))
@@ -210,6 +199,10 @@ if __name__ == "__main__":
             {"instType": "USDT-FUTURES", "channel": "ticker", "instId": f"{bitgetCoin}"}
         )
 
+    if saveParquet:
+        # fork出的各子进程按相同参数创建自己的写线程
+        useParquetSink()
+    quoteBoard = QuoteBoard(quoteBoardName, create=True)
     processList = []
     tasks = [okxRun, binanceRun, bitgetRun]
     taskArgs = [okxArgs, binanceArgs, bitgetArgs]
@@ -225,3 +218,5 @@ if __name__ == "__main__":
             logger.error(f"Process {p.name} exited with code {p.exitcode}")
         else:
             logger.info(f"Process {p.name} completed successfully.")
+    quoteBoard.close()
+    quoteBoard.unlink()
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.backgroundWriter import BackgroundWriter
+
+
+def test_discardDropsInheritedRows(tmp_path):
+    # 未启动的写线程与fork出的子进程中的情况相同
+    writer = BackgroundWriter()
+    path = str(tmp_path / "a.csv")
+    writer.fileCache.write(path, "buffered\n", ["x"])
+    writer.writeRow(path, [1], ["x"])
+    writer.discard()
+    writer.close()
+    with open(path) as f:
+        assert f.read() == ""
+
+
+def _child(queue):
+    import exchange.handler as handler
+
+    queue.put(
+        (
+            handler.writer.native_id,
+            handler.writer.is_alive(),
+            len(handler._finalizerList),
+        )
+    )
+
+
+def test_writerRestartedAfterFork():
+    import exchange.handler as handler
+
+    parentWriter = handler.writer
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(queue,))
+    process.start()
+    nativeId, alive, finalizerCount = queue.get(timeout=10)
+    process.join(10)
+    assert process.exitcode == 0
+    assert nativeId != parentWriter.native_id
+    assert alive
+    # 只保留子进程自己的写线程的退出处理
+    assert finalizerCount == 1
+    assert not parentWriter.closed
+
+
+def test_recvToPersistedLatency(tmp_path):
+    import asyncio
+    import time
+
+    from lib.backgroundWriter import CsvSink
+    from lib.baseWebsocket import ExchangeWebsocket
+    from lib.latency import currentRecv
+
+    writer = BackgroundWriter(statsInterval=0)
+    writer.start()
+    sink = CsvSink(writer, str(tmp_path))
+
+    class _Feed(ExchangeWebsocket):
+        exchangeName = "okx"
+
+        async def _processRecv(self, recvMsg):
+            sink.writeRow(
+                "okx",
+                "tickers",
+                "BTC-USDT-SWAP",
+                ["a"],
+                [recvMsg],
+                recv=currentRecv.get(),
+            )
+
+    async def main():
+        feed = _Feed("wss://example", False, connectionName="okx_0")
+        task = asyncio.create_task(feed.consumeRecv())
+        await feed.recvBuffer.put((time.time() - 1, 1))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    # 不在连接的处理协程中保存的行不统计
+    sink.writeRow("okx", "tickers", "BTC-USDT-SWAP", ["a"], [2])
+    assert writer.sync(5)
+    histogramDict = writer.persistLatency.histogramDict
+    assert list(histogramDict) == [("okx", "tickers", "okx_0")]
+    histogram = histogramDict[("okx", "tickers", "okx_0")]
+    assert histogram.count == 1
+    assert histogram.min >= 1e6
+    writer.close()
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.barAggregator import BarAggregator
+
+
+def test_twaCarriesValueAcrossWindows():
+    aggregator = BarAggregator(("p",), 100)
+    assert aggregator.update("a", 10, (1.0,)) is None
+    assert aggregator.update("a", 60, (3.0,)) is None
+    bar = aggregator.update("a", 120, (5.0,))
+    assert (bar.windowStart, bar.windowEnd, bar.count) == (0, 100, 2)
+    assert (bar.firstTime, bar.lastTime) == (10, 60)
+    assert bar.get("p") == 3.0
+    assert bar.get("p", "mean") == 2.0
+    assert (bar.get("p", "min"), bar.get("p", "max"), bar.get("p", "sum")) == (
+        1.0,
+        3.0,
+        4.0,
+    )
+    # 第一个窗口从第一条数据开始加权：1持续50ms，3持续40ms
+    assert bar.get("p", "twa") == pytest.approx((1.0 * 50 + 3.0 * 40) / 90)
+    # 上一窗口的3持续到120，之后为5
+    [bar] = aggregator.flush()
+    assert bar.windowStart == 100
+    assert bar.get("p", "twa") == pytest.approx((3.0 * 20 + 5.0 * 80) / 100)
+
+
+def test_windowBoundaries():
+    aggregator = BarAggregator(("p",), 100)
+    assert aggregator.update("a", 0, (1.0,)) is None
+    assert aggregator.update("a", 99, (2.0,)) is None
+    bar = aggregator.update("a", 100, (3.0,))
+    assert (bar.windowStart, bar.windowEnd, bar.count) == (0, 100, 2)
+    # 窗口结束时间等于timestamp时关闭
+    assert aggregator.flushBefore(199) == []
+    [bar] = aggregator.flushBefore(200)
+    assert (bar.windowStart, bar.count, bar.get("p")) == (100, 1, 3.0)
+    assert aggregator.flush() == []
+
+
+def test_outOfOrderAndMissingValues():
+    aggregator = BarAggregator(("p", "q"), 100)
+    aggregator.update("a", 50, (1.0, None))
+    # 早于最新时间的数据按最新时间计入，不产生负的持续时间
+    aggregator.update("a", 20, (3.0, 2.0))
+    [bar] = aggregator.flush()
+    assert (bar.firstTime, bar.lastTime) == (50, 50)
+    assert bar.get("p", "twa") == pytest.approx(3.0)
+    assert bar.get("q", "mean") == 2.0
+    assert bar.get("q", "min") == 2.0
+
+
+def test_keysAreIndependent():
+    aggregator = BarAggregator(("p",), 100)
+    aggregator.update("a", 10, (1.0,))
+    assert aggregator.update("b", 150, (2.0,)) is None
+    barList = aggregator.flush()
+    assert sorted((bar.key, bar.windowStart) for bar in barList) == [
+        ("a", 0),
+        ("b", 100),
+    ]
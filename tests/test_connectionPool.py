@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.baseWebsocket import ExchangeWebsocket
+from lib.connectionPool import ConnectionPool
+
+
+class _Feed(ExchangeWebsocket):
+    requestOpField = "op"
+    requestArgsField = "args"
+    crashCount = 0  # 前几个连接的run直接异常退出
+
+    async def run(self):
+        if _Feed.crashCount > 0:
+            _Feed.crashCount -= 1
+            raise RuntimeError("crash")
+        await asyncio.sleep(3600)
+
+
+def _pool(**kwargs) -> ConnectionPool:
+    pool = ConnectionPool(
+        _Feed, "wss://example", False, maxSubscriptionsPerConnection=2, **kwargs
+    )
+    pool.restartBackoff.baseDelay = 0
+    return pool
+
+
+def test_restartResubscribes():
+    async def main():
+        _Feed.crashCount = 1
+        pool = _pool()
+        await pool.subscribe(["a", "b", "c"])
+        first = pool.connectionList[0]
+        firstArgs = sorted(first.subscriptionDict)
+        runTask = asyncio.create_task(pool.run())
+        await asyncio.sleep(0.05)
+        newFeed = pool.connectionList[0]
+        assert newFeed is not first
+        assert newFeed.connectionName == first.connectionName
+        assert sorted(newFeed.subscriptionDict) == firstArgs
+        assert all(pool.placementDict[key] is newFeed for key in firstArgs)
+        assert len(pool.taskList) == 2
+        runTask.cancel()
+        await asyncio.gather(runTask, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+def test_tooManyRestartsRaise():
+    async def main():
+        _Feed.crashCount = 10
+        pool = _pool(maxRestarts=2)
+        await pool.subscribe(["a"])
+        await asyncio.wait_for(pool.run(), 1)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
+    _Feed.crashCount = 0
+
+
+class _FailingFeed(ExchangeWebsocket):
+    """连接总是失败，第一个连接的dumpLatency异常退出，run中的其他协程仍在重连"""
+
+    requestOpField = "op"
+    requestArgsField = "args"
+    crashCount = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(
+            *args, reconnectBaseDelay=0.001, reconnectMaxDelay=0.001, **kwargs
+        )
+        self.connectCount = 0
+
+    async def connect(self, *args, **kwargs):
+        self.connectCount += 1
+        return False
+
+    async def dumpLatency(self):
+        if _FailingFeed.crashCount > 0:
+            _FailingFeed.crashCount -= 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("crash")
+        await asyncio.sleep(3600)
+
+
+def test_replacedFeedStopsReconnecting():
+    async def main():
+        _FailingFeed.crashCount = 1
+        pool = ConnectionPool(_FailingFeed, "wss://example", False)
+        pool.restartBackoff.baseDelay = 0
+        await pool.subscribe(["a"])
+        first = pool.connectionList[0]
+        runTask = asyncio.create_task(pool.run())
+        await asyncio.sleep(0.1)
+        assert pool.connectionList[0] is not first
+        assert first.subscriptionDict == {}
+        connectCount = first.connectCount
+        assert connectCount > 0
+        await asyncio.sleep(0.1)
+        assert first.connectCount == connectCount
+        newFeed = pool.connectionList[0]
+        runTask.cancel()
+        await asyncio.gather(runTask, return_exceptions=True)
+        connectCount = newFeed.connectCount
+        await asyncio.sleep(0.05)
+        assert newFeed.connectCount == connectCount
+
+    asyncio.run(main())
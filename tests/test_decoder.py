@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.decoder import decodeRecord
+import exchange.schema  # noqa: F401 注册各交易所的记录类型
+
+
+def test_badFieldDoesNotDropRecord():
+    record = decodeRecord(
+        "okx",
+        "funding-rate",
+        {
+            "instId": "BTC-USDT-SWAP",
+            "fundingRate": "0.0001",
+            "fundingTime": "1700000000000",
+            "impactValue": "x",
+            "premium": "",
+            "ts": "1699999999000",
+        },
+    )
+    assert record.fundingRate == 0.0001
+    assert record.fundingTime == 1700000000000
+    assert record.ts == 1699999999000
+    assert record.impactValue is None
+    assert record.premium is None
@@ -0,0 +1,65 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from exchange.getFundingInfo import FundingInfoCache
+
+
+class _Fetch:
+    def __init__(self, result=None, delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.count += 1
+        time.sleep(self.delay)
+        return self.result
+
+
+def _expiredCache(tmp_path, fetch) -> FundingInfoCache:
+    cache = FundingInfoCache("test", str(tmp_path / "fundingInfo.json"), fetch)
+    cache._setData([{"symbol": "BTCUSDT"}], 0)
+    return cache
+
+
+def _join(cache: FundingInfoCache):
+    if cache.refreshThread is not None:
+        cache.refreshThread.join(5)
+
+
+def test_failedRefreshBacksOff(tmp_path):
+    fetch = _Fetch()
+    cache = _expiredCache(tmp_path, fetch)
+    for _ in range(100):
+        assert cache.get("BTCUSDT") == {"symbol": "BTCUSDT"}
+        _join(cache)
+    assert fetch.count == 1
+    assert cache.nextRetryTime > time.time()
+    # 等待结束后重新获取，成功后重置退避
+    cache.nextRetryTime = 0
+    fetch.result = [{"symbol": "ETHUSDT"}]
+    cache.get("BTCUSDT")
+    _join(cache)
+    assert fetch.count == 2
+    assert cache.get("ETHUSDT") == {"symbol": "ETHUSDT"}
+    assert cache.nextRetryTime == 0
+
+
+def test_concurrentReadersStartOneRefresh(tmp_path):
+    fetch = _Fetch([{"symbol": "BTCUSDT"}], delay=0.2)
+    cache = _expiredCache(tmp_path, fetch)
+    threadList = [
+        threading.Thread(target=lambda: [cache.get("BTCUSDT") for _ in range(50)])
+        for _ in range(8)
+    ]
+    for thread in threadList:
+        thread.start()
+    for thread in threadList:
+        thread.join()
+    _join(cache)
+    assert fetch.count == 1
@@ -0,0 +1,141 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+import exchange.instrumentCatalog as instrumentCatalog
+from exchange.instrumentCatalog import fetchInstruments
+
+
+class _RestClient:
+    def __init__(self, responseDict: dict):
+        self.responseDict = responseDict
+
+    def get(self, url, params=None):
+        return self.responseDict[url]
+
+
+class _FundingInfoCache:
+    def __init__(self, data=()):
+        self.data = list(data)
+
+    def refresh(self) -> bool:
+        return True
+
+    def all(self) -> list[dict]:
+        return self.data
+
+    def get(self, symbol):
+        return None
+
+
+def _patch(monkeypatch, url, response, fundingInfo=()):
+    monkeypatch.setattr(
+        instrumentCatalog, "getRestClient", lambda: _RestClient({url: response})
+    )
+    monkeypatch.setattr(
+        instrumentCatalog,
+        "getFundingInfoCache",
+        lambda exchange: _FundingInfoCache(fundingInfo),
+    )
+
+
+def test_okxOnlyLive(monkeypatch):
+    def item(instId, state):
+        family = instId.removesuffix("-SWAP")
+        return {
+            "instId": instId,
+            "instFamily": family,
+            "settleCcy": "USDT",
+            "state": state,
+            "tickSz": "0.1",
+            "ctVal": "0.01",
+        }
+
+    _patch(
+        monkeypatch,
+        "https://www.okx.com/api/v5/public/instruments",
+        {
+            "data": [
+                item("BTC-USDT-SWAP", "live"),
+                item("NEW-USDT-SWAP", "preopen"),
+                item("OLD-USDT-SWAP", "suspend"),
+            ]
+        },
+    )
+    assert [i.symbol for i in fetchInstruments("okx")] == ["BTCUSDT"]
+
+
+def test_binanceOnlyTrading(monkeypatch):
+    def item(symbol, status):
+        return {
+            "symbol": symbol,
+            "status": status,
+            "contractType": "PERPETUAL",
+            "baseAsset": symbol.removesuffix("USDT"),
+            "quoteAsset": "USDT",
+            "filters": [{"filterType": "PRICE_FILTER", "tickSize": "0.1"}],
+        }
+
+    _patch(
+        monkeypatch,
+        "https://fapi.binance.com/fapi/v1/exchangeInfo",
+        {
+            "symbols": [
+                item("BTCUSDT", "TRADING"),
+                item("OLDUSDT", "SETTLING"),
+                item("DEADUSDT", "CLOSE"),
+            ]
+        },
+    )
+    assert [i.symbol for i in fetchInstruments("binance")] == ["BTCUSDT"]
+
+
+def test_bitgetOnlyNormal(monkeypatch):
+    def item(symbol, status):
+        return {
+            "symbol": symbol,
+            "symbolStatus": status,
+            "baseCoin": symbol.removesuffix("USDT"),
+            "quoteCoin": "USDT",
+            "priceEndStep": "1",
+            "pricePlace": "1",
+            "fundInterval": "8",
+        }
+
+    _patch(
+        monkeypatch,
+        "https://api.bitget.com/api/v2/mix/market/contracts",
+        {
+            "data": [
+                item("BTCUSDT", "normal"),
+                item("OLDUSDT", "off"),
+                item("NEWUSDT", "listed"),
+            ]
+        },
+    )
+    assert [i.symbol for i in fetchInstruments("bitget")] == ["BTCUSDT"]
+
+
+def test_bybitOnlyTrading(monkeypatch):
+    def item(symbol, status):
+        return {
+            "symbol": symbol,
+            "status": status,
+            "contractType": "LinearPerpetual",
+            "baseCoin": symbol.removesuffix("USDT"),
+            "quoteCoin": "USDT",
+            "priceFilter": {"tickSize": "0.1"},
+            "fundingInterval": 480,
+        }
+
+    _patch(
+        monkeypatch,
+        None,
+        None,
+        [
+            item("BTCUSDT", "Trading"),
+            item("OLDUSDT", "Closed"),
+            item("NEWUSDT", "PreLaunch"),
+        ],
+    )
+    assert [i.symbol for i in fetchInstruments("bybit")] == ["BTCUSDT"]
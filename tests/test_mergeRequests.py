@@ -0,0 +1,79 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.baseWebsocket import ExchangeWebsocket
+
+
+class _Feed(ExchangeWebsocket):
+    requestOpField = "op"
+    requestArgsField = "args"
+    maxArgsPerRequest = 3
+
+
+def _request(op: str, *args) -> dict:
+    return {"op": op, "args": list(args)}
+
+
+def test_mergeAdjacentSameOp():
+    feed = _Feed("wss://example", False)
+    mergedList = feed._mergeRequests(
+        [_request("subscribe", 1), _request("subscribe", 2, 3)]
+    )
+    assert mergedList == [_request("subscribe", 1, 2, 3)]
+
+
+def test_splitAtLimit():
+    feed = _Feed("wss://example", False)
+    mergedList = feed._mergeRequests(
+        [_request("subscribe", 1, 2), _request("subscribe", 3, 4, 5, 6, 7)]
+    )
+    assert mergedList == [
+        _request("subscribe", 1, 2, 3),
+        _request("subscribe", 4, 5, 6),
+        _request("subscribe", 7),
+    ]
+
+
+def test_keepOrderAcrossOps():
+    feed = _Feed("wss://example", False)
+    login = {"op": "login", "sign": "x"}
+    mergedList = feed._mergeRequests(
+        [
+            _request("subscribe", 1),
+            _request("subscribe", 2),
+            _request("unsubscribe", 1),
+            {"id": 1},
+            _request("subscribe", 3),
+            login,
+        ]
+    )
+    # 不同操作与无法合并的请求不会跨越合并
+    assert mergedList == [
+        _request("subscribe", 1, 2),
+        _request("unsubscribe", 1),
+        {"id": 1},
+        _request("subscribe", 3),
+        login,
+    ]
+
+
+def test_limitFromKwargs():
+    feed = _Feed("wss://example", False, maxArgsPerRequest=1)
+    assert feed._mergeRequests([_request("subscribe", 1, 2)]) == [
+        _request("subscribe", 1),
+        _request("subscribe", 2),
+    ]
+    # 不大于0时按1拆分
+    feed.maxArgsPerRequest = 0
+    assert feed._splitRequest("subscribe", [1, 2]) == [
+        _request("subscribe", 1),
+        _request("subscribe", 2),
+    ]
+    assert feed._splitRequest("subscribe", []) == []
+
+
+def test_noMergeWithoutOpField():
+    feed = ExchangeWebsocket("wss://example", False)
+    requestList = [{"a": 1}, {"a": 2}]
+    assert feed._mergeRequests(requestList) == requestList
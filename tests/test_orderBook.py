@@ -0,0 +1,67 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.orderBook import OrderBook
+
+
+def _okxBook(bids, asks):
+    book = OrderBook("BTC-USDT-SWAP")
+    book.applySnapshot(bids, asks)
+    return book
+
+
+def test_okxChecksum():
+    # okx文档中的示例：3366.1:7:3366.8:9:3366:6:3368:8
+    book = _okxBook(
+        [["3366.1", "7", "0", "3"], ["3366", "6", "3", "4"]],
+        [["3366.8", "9", "10", "3"], ["3368", "8", "3", "4"]],
+    )
+    assert book.checksum() == -1881014294
+
+
+def test_okxChecksumOneSide():
+    # 一侧档位不足时只拼接另一侧：3366.1:7:3366:6
+    book = _okxBook([["3366.1", "7", "0", "3"], ["3366", "6", "3", "4"]], [])
+    assert book.checksum() == -1858900673
+
+
+def test_checksumUsesRawStrings():
+    # 按推送中的原始字符串计算，更新后的档位替换原始字符串
+    book = _okxBook([["3366.1", "7"], ["3366", "6"]], [["3366.8", "9"], ["3368", "8"]])
+    book.applyDelta([["3366.1", "0"], ["3365.5", "2"]], [["3366.8", "9.0"]])
+    other = _okxBook(
+        [["3366", "6"], ["3365.5", "2"]], [["3366.8", "9.0"], ["3368", "8"]]
+    )
+    assert book.checksum() == other.checksum()
+    assert book.bestBid() == (3366.0, 6.0)
+
+
+def test_estimateFill():
+    book = _okxBook([["100", "1"], ["99", "2"]], [["101", "1"], ["102", "3"]])
+    assert book.estimateFill("buy", 2) == (101.5, 2)
+    assert book.estimateFill("sell", 5) == ((100 + 99 * 2) / 3, 3)
+
+
+def test_binanceSpotPartialDepth():
+    import asyncio
+
+    from exchange.binance import Binance
+
+    async def main():
+        feed = Binance("wss://stream.binance.com:9443/ws", False)
+        await feed.subscribe(["btcusdt@depth5@100ms", "ethusdt@depth5"])
+        assert feed.partialDepthDict == {"BTCUSDT": "btcusdt@depth5@100ms"}
+        recvMsg = {
+            "lastUpdateId": 160,
+            "bids": [["0.0024", "10"]],
+            "asks": [["0.0026", "100"]],
+        }
+        assert feed._getRecvTopic(recvMsg) == "btcusdt@depth5@100ms"
+        assert feed._getSequence(recvMsg) == (160, None)
+        await feed._updateOrderBook(recvMsg)
+        book = feed.getOrderBook("BTCUSDT")
+        assert book is not None
+        assert book.updateId == 160
+
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+import glob
+import os
+import sys
+import time
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from exchange.schema import BinanceBookTicker, Tick
+from lib.parquetSink import ParquetSink
+
+TIMESTAMP = 1700000000000
+
+
+def _readTable(rootDir, channel, symbol):
+    (path,) = glob.glob(f"{rootDir}/exchange=*/channel={channel}/*/*/*.parquet")
+    return pq.read_table(path, filters=[("symbol", "=", symbol)])
+
+
+def test_symbolColumnNotDuplicated(tmp_path):
+    sink = ParquetSink(str(tmp_path))
+    sink.start()
+    for symbol in ("BTCUSDT", "ETHUSDT"):
+        tick = Tick("okx", symbol, TIMESTAMP, bidPx=1.0, askPx=2.0)
+        sink.writeRow(
+            "okx", "tick", symbol, tick.fieldNames(), tick.values(), tick.types
+        )
+        record = BinanceBookTicker.fromDict(
+            {"e": "bookTicker", "s": symbol, "b": "1", "a": "2", "T": TIMESTAMP}
+        )
+        sink.writeRow(
+            "binance",
+            "bookTicker",
+            symbol,
+            record.fieldNames(),
+            record.values(),
+            record.types,
+            TIMESTAMP,
+            ("binance_0", time.time()),
+        )
+    sink.close(10)
+    histogram = sink.persistLatency.histogramDict[
+        ("binance", "bookTicker", "binance_0")
+    ]
+    assert histogram.count == 2
+    # 记录中已有symbol字段
+    table = _readTable(tmp_path, "tick", "ETHUSDT")
+    assert table.column_names == list(Tick.fieldNames())
+    assert table.column("symbol").to_pylist() == ["ETHUSDT"]
+    # 记录中没有symbol字段时额外保存在第一列
+    table = _readTable(tmp_path, "bookTicker", "BTCUSDT")
+    assert table.column_names == ["symbol", *BinanceBookTicker.fieldNames()]
+    assert table.column("s").to_pylist() == ["BTCUSDT"]
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from exchange.schema import Tick
+from lib.quoteBoard import QuoteBoard
+
+
+def test_changedOnlyReturnsUpdatedSlots():
+    board = QuoteBoard(f"testQuoteBoard{os.getpid()}", create=True, maxSymbols=4)
+    try:
+        board.update(Tick("okx", "BTCUSDT", 1, bidPx=1.0, askPx=2.0))
+        board.update(Tick("binance", "BTCUSDT", 1, bidPx=1.5, askPx=2.5))
+        seqDict = {}
+        assert len(board.changed(seqDict)) == 2
+        assert board.changed(seqDict) == []
+        board.update(Tick("okx", "BTCUSDT", 2, bidPx=1.1))
+        tickList = board.changed(seqDict)
+        assert [(tick.exchange, tick.timestamp, tick.bidPx) for tick in tickList] == [
+            ("okx", 2, 1.1)
+        ]
+    finally:
+        board.close()
+        board.unlink()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.reconnect import Backoff
+
+
+def test_growthWithoutJitter():
+    backoff = Backoff(baseDelay=0.5, maxDelay=4, factor=2, jitter=False)
+    assert [backoff.nextDelay() for _ in range(6)] == [0.5, 1, 2, 4, 4, 4]
+    backoff.reset()
+    assert backoff.nextDelay() == 0.5
+
+
+def test_longOutageDoesNotOverflow():
+    backoff = Backoff()
+    for _ in range(5000):
+        delay = backoff.nextDelay()
+        assert 0 <= delay <= backoff.maxDelay
+    noJitter = Backoff(jitter=False)
+    for _ in range(5000):
+        delay = noJitter.nextDelay()
+    assert delay == noJitter.maxDelay
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.ringBuffer import RingBuffer
+
+
+async def _drain(buffer: RingBuffer) -> list:
+    itemList = []
+    while len(buffer):
+        itemList.append(await buffer.get())
+    return itemList
+
+
+def test_dropOldestWraparound():
+    async def main():
+        buffer = RingBuffer(3, RingBuffer.DROP_OLDEST)
+        for i in range(7):
+            await buffer.put(i, key="a")
+        assert len(buffer) == 3
+        assert await _drain(buffer) == [4, 5, 6]
+        # 取空后继续写入，顺序不受之前的覆盖影响
+        for i in range(7, 9):
+            await buffer.put(i)
+        assert await _drain(buffer) == [7, 8]
+        return buffer.stats()
+
+    stats = asyncio.run(main())
+    assert stats["put"] == 9
+    assert stats["drop"] == 4
+    assert stats["conflate"] == 0
+
+
+def test_conflateReplacesPendingOfSameKey():
+    async def main():
+        buffer = RingBuffer(3, RingBuffer.CONFLATE)
+        await buffer.put("a1", key="a")
+        await buffer.put("b1", key="b")
+        await buffer.put("c1", key="c")
+        # 已满，同一key尚未处理的消息原地替换，位置不变
+        await buffer.put("b2", key="b")
+        await buffer.put("a2", key="a")
+        assert len(buffer) == 3
+        assert await _drain(buffer) == ["a2", "b2", "c1"]
+        return buffer.stats()
+
+    stats = asyncio.run(main())
+    assert stats["conflate"] == 2
+    assert stats["drop"] == 0
+
+
+def test_conflateDropsOldestForNewKey():
+    async def main():
+        buffer = RingBuffer(2, RingBuffer.CONFLATE)
+        await buffer.put("a1", key="a")
+        await buffer.put("b1", key="b")
+        # 没有可替换的消息时丢弃最早的一条，被丢弃的key不再可替换
+        await buffer.put("c1", key="c")
+        await buffer.put("a2", key="a")
+        assert await _drain(buffer) == ["c1", "a2"]
+        return buffer.stats()
+
+    stats = asyncio.run(main())
+    assert stats["drop"] == 2
+    assert stats["conflate"] == 0
+
+
+def test_conflateAfterGetDoesNotReplaceConsumed():
+    async def main():
+        buffer = RingBuffer(1, RingBuffer.CONFLATE)
+        await buffer.put("a1", key="a")
+        assert await buffer.get() == "a1"
+        await buffer.put("a2", key="a")
+        await buffer.put("a3", key="a")
+        assert await _drain(buffer) == ["a3"]
+
+    asyncio.run(main())
+
+
+def test_blockWaitsForConsumer():
+    async def main():
+        buffer = RingBuffer(2, RingBuffer.BLOCK)
+        await buffer.put(1)
+        await buffer.put(2)
+        putTask = asyncio.create_task(buffer.put(3))
+        await asyncio.sleep(0.01)
+        assert not putTask.done()
+        assert await buffer.get() == 1
+        await asyncio.wait_for(putTask, 1)
+        assert await _drain(buffer) == [2, 3]
+        assert buffer.stats()["drop"] == 0
+
+    asyncio.run(main())
+
+
+def test_unknownPolicy():
+    with pytest.raises(ValueError):
+        RingBuffer(10, "unknown")
+
+
+def test_lossyPolicyRejectedForIncrementalFeed():
+    from exchange.bybit import Bybit
+
+    with pytest.raises(ValueError):
+        Bybit("wss://example", False, recvOverflowPolicy=RingBuffer.CONFLATE)
+    with pytest.raises(ValueError):
+        Bybit("wss://example", False, recvOverflowPolicy=RingBuffer.DROP_OLDEST)
+    Bybit("wss://example", False)
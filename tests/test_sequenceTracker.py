@@ -0,0 +1,114 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.sequenceTracker import (
+    GAP,
+    OUT_OF_ORDER,
+    OUTAGE,
+    SNAPSHOT,
+    GapLedger,
+    SequenceTracker,
+    loadGapLedger,
+)
+
+
+def _feed(tracker: SequenceTracker, topic: str, updates: list) -> list:
+    return [
+        tracker.update(topic, seq, prevSeq, float(now))
+        for now, (seq, prevSeq) in enumerate(updates)
+    ]
+
+
+def test_gapAndOutOfOrder():
+    tracker = SequenceTracker("binance")
+    updates = [
+        (10, None),
+        (12, 10),
+        (15, 13),
+        (15, 13),
+        (14, None),
+        (20, 15),
+        (3, SNAPSHOT),
+        (4, 3),
+    ]
+    assert _feed(tracker, "btcusdt@depth", updates) == [
+        None,
+        None,
+        GAP,
+        None,
+        OUT_OF_ORDER,
+        None,
+        None,
+        None,
+    ]
+    assert (tracker.gapCount, tracker.outOfOrderCount, tracker.duplicateCount) == (
+        1,
+        1,
+        1,
+    )
+    gap, outOfOrder = tracker.ledger.recordList
+    # gap从上一条正常数据到发现异常的数据，received为推送中的前序号
+    assert (gap.kind, gap.start, gap.end, gap.expected, gap.received) == (
+        GAP,
+        1.0,
+        2.0,
+        12,
+        13,
+    )
+    assert (outOfOrder.expected, outOfOrder.received) == (15, 14)
+    assert tracker.stateDict["btcusdt@depth"].lastSeq == 4
+
+
+def test_reset():
+    tracker = SequenceTracker("okx")
+    _feed(tracker, "a", [(5, None)])
+    _feed(tracker, "b", [(5, None)])
+    tracker.reset("a")
+    # 清除后的第一条重新开始跟踪，不记录乱序
+    assert tracker.update("a", 1, None, 10.0) is None
+    assert tracker.update("b", 1, None, 10.0) == OUT_OF_ORDER
+    tracker.reset()
+    assert tracker.stateDict == {}
+
+
+def test_ledgerQueryAndMask():
+    ledger = GapLedger()
+    ledger.record("okx", "a", GAP, 10.0, 12.0, 1, 3)
+    ledger.record("okx", "b", OUT_OF_ORDER, 11.0, 11.5, 5, 4)
+    ledger.record("okx", None, OUTAGE, 11.5, 20.0)
+    ledger.record("binance", "a", GAP, 30.0, 31.0, 1, 3)
+    assert [r.topic for r in ledger.query(exchange="okx", kinds=(GAP, OUTAGE))] == [
+        "a",
+        None,
+    ]
+    assert [r.exchange for r in ledger.query(start=25.0)] == ["binance"]
+    assert [r.kind for r in ledger.query(end=10.5)] == [GAP]
+    assert ledger.stats() == {
+        ("okx", GAP): 1,
+        ("okx", OUT_OF_ORDER): 1,
+        ("okx", OUTAGE): 1,
+        ("binance", GAP): 1,
+    }
+    # 断线按topic查询时也包含，重叠区间合并，乱序默认不包含
+    assert ledger.maskIntervals("okx", "a") == [(10.0, 20.0)]
+    assert ledger.maskIntervals("okx", "b") == [(11.5, 20.0)]
+    assert ledger.maskIntervals(padding=5.0) == [(5.0, 36.0)]
+    assert ledger.maskIntervals(padding=1.0) == [(9.0, 21.0), (29.0, 32.0)]
+
+
+def test_ledgerCsvRoundTrip(tmp_path):
+    path = str(tmp_path / "gap" / "ledger.csv")
+    tracker = SequenceTracker("binance", GapLedger(path=path))
+    _feed(tracker, "t", [(1, None), (3, 2), (2, None)])
+    tracker.ledger.record("binance", None, OUTAGE, 5.0, 6.0)
+    tracker.ledger.record("okx", '{"a":1,"b":2}', OUTAGE, 7.0, 8.0)
+    assert tracker.ledger.sync(5)
+    ledger = loadGapLedger(path)
+    assert [r.values() for r in ledger.recordList] == [
+        ["binance", "t", GAP, 0.0, 1.0, "1", "2"],
+        ["binance", "t", OUT_OF_ORDER, 1.0, 2.0, "3", "2"],
+        ["binance", None, OUTAGE, 5.0, 6.0, None, None],
+        ["okx", '{"a":1,"b":2}', OUTAGE, 7.0, 8.0, None, None],
+    ]
+    assert ledger.maskIntervals(topic="t") == [(0.0, 1.0), (5.0, 6.0)]
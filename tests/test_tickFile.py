@@ -0,0 +1,35 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+from lib.tickFile import TickFileSink, getTickFilePath, readTickFile
+
+DAY_START = 1700006400000  # 2023-11-15 00:00:00 UTC
+
+
+def _bookTicker(i: int):
+    return SimpleNamespace(
+        T=DAY_START + i, E=DAY_START + i, u=i, b=1.0, B=2.0, a=3.0, A=None
+    )
+
+
+def test_unmapKeepsFileAndCapacity(tmp_path):
+    sink = TickFileSink(str(tmp_path), capacity=4, maxMappedFiles=1)
+    for i in range(10):
+        for symbol in ("BTCUSDT", "ETHUSDT"):
+            sink.write("binance", "bookTicker", symbol, _bookTicker(i), DAY_START + i)
+    # 只保持一个映射，被淘汰的文件不关闭也不截断
+    assert len(sink.mappedDict) == 1
+    assert len(sink.writerDict) == 2
+    btcWriter = sink.writerDict[("binance", "bookTicker", "BTCUSDT")][2]
+    assert btcWriter.mm is None
+    assert not btcWriter.file.closed
+    assert btcWriter.capacity == 16
+    sink.close()
+    for symbol in ("BTCUSDT", "ETHUSDT"):
+        path = getTickFilePath(
+            str(tmp_path), "binance", "bookTicker", symbol, "20231115"
+        )
+        data = readTickFile(path)
+        assert list(data["u"]) == list(range(10))
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(__file__) + "/..")
+import lib.baseWebsocket as baseWebsocket
+from lib.baseWebsocket import ExchangeWebsocket
+from lib.watchdog import TopicStat
+
+
+class _Feed(ExchangeWebsocket):
+    requestOpField = "op"
+    requestArgsField = "args"
+
+
+class _Ws:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_topicStatEwma():
+    topicStat = TopicStat(0.0)
+    # 数据不足两条时按推送频率未知处理
+    topicStat.update(1.0)
+    assert topicStat.isStale(12.0, 10, 5, 10)
+    assert not topicStat.isStale(10.0, 10, 5, 10)
+    topicStat.update(2.0)
+    assert topicStat.meanInterval == 1.0
+    topicStat.update(4.0)
+    assert abs(topicStat.meanInterval - (1.0 + topicStat.alpha * 1.0)) < 1e-12
+    # 阈值为max(minStaleInterval, staleFactor * meanInterval)
+    assert not topicStat.isStale(4.0 + 10.4, 10, 5, 90)
+    assert topicStat.isStale(4.0 + 10.6, 10, 5, 90)
+    assert not topicStat.isStale(4.0 + 4.9, 1, 5, 90)
+    # 重新订阅后按最大等待时间判断，收到数据后恢复
+    topicStat.reset(20.0, resubscribed=True)
+    assert not topicStat.isStale(50.0, 10, 5, 90)
+    topicStat.update(51.0)
+    assert not topicStat.resubscribed
+    assert topicStat.meanInterval > 1.05
+
+
+def _runWatchdog(monkeypatch, feed: ExchangeWebsocket, now: float):
+    monkeypatch.setattr(baseWebsocket, "time", SimpleNamespace(time=lambda: now))
+
+    async def main():
+        feed.connectedEvent.set()
+        task = asyncio.create_task(feed.watchRecv())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+def _feed(now: float) -> ExchangeWebsocket:
+    feed = _Feed(
+        "wss://example", False, watchdogInterval=0.01, maxWaitforRecvInterval=90
+    )
+    feed.ws = _Ws()
+    feed.lastRecvTime = now
+    for key in ("a", "b"):
+        feed.subscriptionDict[key] = key
+        feed.topicStatDict[key] = TopicStat(0.0)
+        for t in range(10):
+            feed.topicStatDict[key].update(float(t))
+    return feed
+
+
+def test_staleTopicResubscribed(monkeypatch):
+    feed = _feed(100.0)
+    feed.topicStatDict["b"].update(99.0)
+    _runWatchdog(monkeypatch, feed, 100.0)
+    assert not feed.ws.closed
+    requestList = []
+    while not feed.requestQueue.empty():
+        requestList.append(feed.requestQueue.get_nowait())
+    assert requestList[:2] == [
+        {"op": "unsubscribe", "args": ["a"]},
+        {"op": "subscribe", "args": ["a"]},
+    ]
+    assert feed.topicStatDict["a"].resubscribed
+    assert not feed.topicStatDict["b"].resubscribed
+
+
+def test_allTopicsStaleClosesConnection(monkeypatch):
+    feed = _feed(100.0)
+    _runWatchdog(monkeypatch, feed, 100.0)
+    assert feed.ws.closed
+    assert feed.requestQueue.empty()
+    assert all(stat.resetTime == 100.0 for stat in feed.topicStatDict.values())